@@ -0,0 +1,24 @@
+import timeit
+
+from brik.parse import Parser
+from brik.tokens import Tokenizer
+
+def best(run)-> float:
+    return min(timeit.repeat(run, number=1, repeat=7))
+
+def compare(label: str, source: str):
+    stream = Tokenizer(source).tokenize_stream()
+    recursive = best(lambda: Parser(Tokenizer(source).tokenize_stream()).parse())
+    iterative = best(lambda: Parser(Tokenizer(source).tokenize_stream(), iterative=True).parse())
+    print(f'{label} ({len(stream)} tokens): recursive {recursive:.3f}s, iterative {iterative:.3f}s')
+
+def main():
+    compare('flat', '[putchar [+ 12345 [- x 678]] (1 2 3)] ' * 8000)
+    compare('nested x200', ('[( [f ' * 100 + '1' + '] )]' * 100 + ' ') * 200)
+    depth = 20000
+    deep = '[( ' * depth + '1' + ' )]' * depth
+    iterative = best(lambda: Parser(Tokenizer(deep).tokenize_stream(), iterative=True).parse())
+    print(f'depth {depth}: iterative {iterative:.3f}s, recursive hits the recursion limit')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import timeit
+
+from brik.debug import TraceLevel
+from brik.tokens import Token, Tokenizer, TokenType
+
+class CharTokenizer(Tokenizer):
+    # The character-at-a-time tokenizer that the regex lexer replaced, kept as the baseline and as a test oracle
+    def at_end(self)-> bool:
+        return self.pos >= len(self.source)
+
+    def peek(self)-> str:
+        if self.at_end(): raise Exception('Unexpected end of file')
+        return self.source[self.pos]
+    def next(self)-> str:
+        val = self.peek()
+        self.pos += 1 if val else 0
+        return val
+
+    def skip_whitespace(self):
+        while not self.at_end() and self.peek() in CharTokenizer._whitespace:
+            self.next()
+
+    def tokenize_by_char(self)-> list[Token]:
+        self.v_print('Starting tokenization, source is {} chars', len(self.source))
+        self.skip_whitespace()
+        while not self.at_end():
+            self.start = self.pos
+            self.tokens.append(self.tokenize_next())
+            self.v_print('Tokenized {}-{} as {}', self.start, self.pos, self.tokens[-1], level=TraceLevel.TRACE)
+            self.skip_whitespace()
+        self.v_print('Tokenized {} tokens', len(self.tokens))
+        return self.tokens
+
+    def tokenize_next(self)-> Token:
+        c = self.next()
+        if c is None:
+            raise Exception('Unexpected end of file')
+        elif c in CharTokenizer._symbols:
+            return Token(CharTokenizer._symbols[c], self.start, c)
+        elif c == '"':
+            return self.tokenize_string()
+        elif c == '#':
+            return self.tokenize_keyword()
+        elif c in CharTokenizer._ident_start:
+            return self.tokenize_ident(c)
+        elif c in CharTokenizer._number:
+            return self.tokenize_number(c)
+        else:
+            raise Exception(f'Unrecognized character {c}')
+
+    def tokenize_number(self, num: str)-> Token:
+        while not self.at_end() and self.peek() in CharTokenizer._number:
+            num += self.next()
+        return Token(TokenType.NUMBER, self.start, int(num))
+
+    def tokenize_ident(self, ident: str)-> Token:
+        while not self.at_end() and self.peek() in CharTokenizer._ident:
+            ident += self.next()
+        return Token(TokenType.IDENT, self.start, ident)
+
+    def tokenize_keyword(self)-> Token:
+        ident = ''
+        while not self.at_end() and self.peek() in CharTokenizer._ident:
+            ident += self.next()
+        if ident not in CharTokenizer._keywords:
+            raise Exception(f'Unrecognized keyword: {ident}')
+        return Token(TokenType.KEYWORD, self.start, ident)
+
+    def tokenize_string(self)-> Token:
+        is_escaped = False
+        string = ''
+        while not self.at_end() and (self.peek() != '"' or is_escaped):
+            c = self.next()
+            if c == '\\':
+                is_escaped = True
+                continue
+            elif is_escaped:
+                is_escaped = False
+            string += c
+
+        if self.at_end():
+            raise Exception('Found end of code while tokenizing string')
+
+        self.next()
+        return Token(TokenType.STRING, self.start, string)
+
+def generate_source(size: int)-> str:
+    unit = '''[#def putchar_%d <c:int> [(
+    [#asm "
+        mov %%cx, {c}
+        syscall
+    "]
+)]]
+[putchar_%d [+ 12345 [- x_%d 678]] "some \\"text\\" here"]
+'''
+    parts = []
+    length = 0
+    i = 0
+    while length < size:
+        part = unit % (i, i, i)
+        parts.append(part)
+        length += len(part)
+        i += 1
+    return ''.join(parts)
+
+def main():
+    source = generate_source(1024 * 1024)
+    assert Tokenizer(source).tokenize() == CharTokenizer(source).tokenize_by_char()
+    by_char = min(timeit.repeat(lambda: CharTokenizer(source).tokenize_by_char(), number=1, repeat=3))
+    by_regex = min(timeit.repeat(lambda: Tokenizer(source).tokenize(), number=1, repeat=3))
+    mb = len(source) / (1024 * 1024)
+    print(f'source: {len(source)} chars')
+    print(f'by char: {by_char:.3f}s ({mb / by_char:.2f} MB/s)')
+    print(f'regex:   {by_regex:.3f}s ({mb / by_regex:.2f} MB/s)')
+    print(f'speedup: {by_char / by_regex:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,62 @@
 import os
-from typing import Tuple
+from typing import IO, Iterable, Tuple
 
+from brik.asm.elf import ElfWriter
+from brik.asm.encoder import EncodingError
 from brik.asm.generation import AsmGenerator
-from brik.asm.platform import CompilerPlatform, get_platform
+from brik.asm.platform import CompilerPlatform, PlatformLinux64, get_platform
 from brik.asm.syntax_tree import AsmModule
+from brik.asm.toolchain import BuildJob, Toolchain
 from brik.asm.transpile import Transpiler
-from brik.debug import Debug
+from brik.cache import BuildCache
+from brik.debug import Debug, TraceLevel
+from brik.definitions import CallDefinition
+from brik.optimize.fold import ConstantFolder
+from brik.optimize.reachability import ReachabilityPass
+from brik.optimize.types import TypeInference
 from brik.parse import Parser
 from brik.printer import Printer
 from brik.syntax_tree import Module
-from brik.tokens import Token, Tokenizer
+from brik.tokens import Token, TokenStream, Tokenizer
+
+__version__ = '0.1.0'
 
 class BrikOpts:
     def __init__(self,
                  name: str,
                  platform: CompilerPlatform,
                  out_dir: str = 'bin',
-                 debug: bool = False):
+                 debug: bool | int = False,
+                 iterative_parse: bool = False,
+                 fold_constants: bool = True,
+                 fold_budget: int = 10000,
+                 prune_unreachable: bool = True,
+                 peephole: bool = True,
+                 inline_threshold: int = 8,
+                 inline_always: Iterable[str] = (),
+                 inline_never: Iterable[str] = (),
+                 native: bool = True,
+                 jobs: int | None = None,
+                 cache: bool = False,
+                 cache_size: int = 256 << 20,
+                 cache_stages: Iterable[str] = ('object', 'executable')):
         self.name = name
         self.platform = platform
         self.out_dir = out_dir
         self.debug = debug
+        self.iterative_parse = iterative_parse
+        self.fold_constants = fold_constants
+        self.fold_budget = fold_budget
+        self.prune_unreachable = prune_unreachable
+        self.peephole = peephole
+        self.inline_threshold = inline_threshold
+        self.inline_always = set(inline_always)
+        self.inline_never = set(inline_never)
+        self.native = native
+        self.jobs = jobs
+        self.cache = cache
+        self.cache_size = cache_size
+        self.cache_stages = set(cache_stages)
 
 class Brik(Debug):
     def __init__(self, opts: BrikOpts):
@@ -28,16 +64,27 @@ class Brik(Debug):
         self.platform = get_platform(opts.platform)
         self.name = opts.name
         self.out_dir = opts.out_dir
+        self.iterative_parse = opts.iterative_parse
+        self.fold_constants = opts.fold_constants
+        self.fold_budget = opts.fold_budget
+        self.prune_unreachable = opts.prune_unreachable
+        self.peephole = opts.peephole
+        self.inline_threshold = opts.inline_threshold
+        self.inline_always = opts.inline_always
+        self.inline_never = opts.inline_never
+        self.native = opts.native and isinstance(self.platform, PlatformLinux64)
+        self.toolchain = Toolchain(opts.jobs, opts.debug)
+        self.removed: list[CallDefinition] = []
         self.create_out_dir()
+        self.cache = BuildCache(self.cache_path(), opts.cache_size, opts.debug) if opts.cache else None
+        self.cache_stages = opts.cache_stages
+        self.compiler = BuildCache.source_digest(os.path.dirname(os.path.abspath(__file__)))
+        self.fingerprint = (self.compiler, opts.platform.name, self.fold_constants, self.fold_budget, self.prune_unreachable, self.peephole,
+                            self.inline_threshold, sorted(self.inline_always), sorted(self.inline_never), self.native)
 
     def create_out_dir(self):
-        try:
-            os.mkdir(self.bin_path())
-            os.mkdir(self.asm_path())
-            os.mkdir(self.obj_path())
-            os.mkdir(self.out_path())
-        except FileExistsError:
-            pass
+        for path in [self.bin_path(), self.asm_path(), self.obj_path(), self.out_path()]:
+            os.makedirs(path, exist_ok=True)
     def bin_path(self)-> str:
         return self.out_dir
     def asm_path(self)-> str:
@@ -46,50 +93,163 @@ class Brik(Debug):
         return f'{self.out_dir}/obj'
     def out_path(self)-> str:
         return f'{self.out_dir}/out'
+    def cache_path(self)-> str:
+        return f'{self.out_dir}/cache'
+    def caching(self, stage: str)-> bool:
+        return self.cache is not None and stage in self.cache_stages
 
     def compile(self, source: str)-> str:
         return self.compile_all(source)[-1]
-    def compile_all(self, source: str)-> Tuple[list[Token], Module, AsmModule, str, str, str]:
+    def compile_all(self, source: str)-> Tuple[TokenStream | None, Module | None, AsmModule | None, str | None, str | None, str]:
+        if self.cache is not None:
+            return self.compile_cached(source)
         tokens = self.tokenize(source)
-        self.v_print(tokens)
+        self.v_print(lambda: tokens, level=TraceLevel.DUMP)
         module = self.parse(tokens)
-        p = Printer('  ')
-        p.print(module)
-        self.v_print(str(p))
-        asm_mod = self.transpile(module)
-        p.clear()
-        p.print(asm_mod)
-        self.v_print(str(p))
-        asm_file_path = self.generate_asm(asm_mod)
-        obj_file_path = self.assemble(asm_file_path)
-        out_file_path = self.link(obj_file_path)
+        return (tokens, module, *self.compile_module(module))
+    def compile_stream(self, stream: IO)-> Tuple[Module | None, AsmModule | None, str | None, str | None, str]:
+        if self.cache is not None:
+            source = stream.read()
+            source = source.decode('utf-8') if isinstance(source, bytes) else source
+            return self.compile_cached(Tokenizer.normalize_newlines(source))[1:]
+        tokens = Tokenizer.iter_tokens(stream, debug=self.debug)
+        module = self.parse(tokens)
+        return (module, *self.compile_module(module))
+    def compile_module(self, module: Module)-> Tuple[AsmModule, str | None, str | None, str]:
+        asm_mod = self.lower(module)
+        return (asm_mod, *self.build(asm_mod))
+    def compile_cached(self, source: str)-> Tuple[TokenStream | None, Module | None, AsmModule | None, str | None, str | None, str]:
+        key = BuildCache.key(*self.fingerprint, source)
+        if self.restore_executable(key, self.executable_path()):
+            self.cache.report()
+            return (None, None, None, None, None, self.executable_path())
+        (tokens, module) = (None, None)
+        asm_mod = self.cache.load('asm', key) if self.caching('asm') else None
+        if asm_mod is None:
+            module_key = BuildCache.key(self.compiler, source)
+            module = self.cache.load('module', module_key) if self.caching('module') else None
+            if module is None:
+                tokens = self.tokenize(source)
+                module = self.parse(tokens)
+                if self.caching('module'): self.cache.store('module', module_key, module)
+            asm_mod = self.lower(module)
+            if self.caching('asm'): self.cache.store('asm', key, asm_mod)
+        (asm_file_path, obj_file_path, out_file_path) = self.build(asm_mod)
+        if self.caching('executable'): self.cache.save('executable', key, out_file_path)
+        self.cache.report()
         return (tokens, module, asm_mod, asm_file_path, obj_file_path, out_file_path)
-        
-    def tokenize(self, source: str)-> list[Token]:
+    def compile_many(self, sources: Iterable[Tuple[str, str]])-> list[str]:
+        outputs: list[str | None] = []
+        jobs: list[BuildJob] = []
+        pending: list[int] = []
+        built: list[tuple[str, str]] = []
+        for (name, source) in sources:
+            key = BuildCache.key(*self.fingerprint, source) if self.caching('executable') else None
+            path = self.executable_path(name)
+            if key is not None and self.restore_executable(key, path):
+                outputs.append(path)
+                continue
+            asm_mod = self.lower(self.parse(self.tokenize(source)))
+            path = self.generate_native(asm_mod, name) if self.native else None
+            if path is None:
+                pending.append(len(outputs))
+                jobs.append(BuildJob(self.platform, self.generate_asm(asm_mod, name), self.object_file(name), self.executable_path(name)))
+            if key is not None:
+                built.append((key, self.executable_path(name)))
+            outputs.append(path)
+        for (index, path) in zip(pending, self.toolchain.build(jobs)):
+            outputs[index] = path
+        for (key, path) in built:
+            self.cache.save('executable', key, path)
+        if self.cache is not None:
+            self.cache.report()
+        return outputs
+    def restore_executable(self, key: str, path: str)-> bool:
+        if not self.caching('executable') or not self.cache.restore('executable', key, path):
+            return False
+        os.chmod(path, 0o755)
+        return True
+
+    @staticmethod
+    def dump(obj)-> str:
+        p = Printer('  ')
+        p.print(obj)
+        return str(p)
+
+    def tokenize(self, source: str)-> TokenStream:
         tokenizer = Tokenizer(source, self.debug)
-        return tokenizer.tokenize()
-    def parse(self, tokens: list[Token])-> Module:
-        parser = Parser(tokens, self.debug)
+        return tokenizer.tokenize_stream()
+    def parse(self, tokens: TokenStream | Iterable[Token])-> Module:
+        parser = Parser(tokens, self.debug, self.iterative_parse)
         return parser.parse()
+    def optimize(self, module: Module)-> Module:
+        if self.fold_constants:
+            module = ConstantFolder(self.fold_budget, self.platform.word_size(), self.debug).fold(module)
+        if self.prune_unreachable:
+            pruner = ReachabilityPass(self.debug)
+            module = pruner.prune(module)
+            self.removed = pruner.removed
+        return TypeInference(self.debug).infer(module)
+    def lower(self, module: Module)-> AsmModule:
+        module = self.optimize(module)
+        self.v_print(lambda: Brik.dump(module), level=TraceLevel.DUMP)
+        asm_mod = self.transpile(module)
+        self.v_print(lambda: Brik.dump(asm_mod), level=TraceLevel.DUMP)
+        return asm_mod
+    def build(self, asm_mod: AsmModule, name: str | None = None)-> Tuple[str | None, str | None, str]:
+        if self.native:
+            out_file_path = self.generate_native(asm_mod, name)
+            if out_file_path is not None:
+                return (None, None, out_file_path)
+        asm_file_path = self.generate_asm(asm_mod, name)
+        obj_file_path = self.assemble(asm_file_path, name)
+        out_file_path = self.link(obj_file_path, name)
+        return (asm_file_path, obj_file_path, out_file_path)
     def transpile(self, module: Module)-> AsmModule:
-        transpiler = Transpiler(self.platform, self.debug)
+        for define in module.defines:
+            if isinstance(define, CallDefinition):
+                if define.name in self.inline_never: define.inline = False
+                elif define.name in self.inline_always: define.inline = True
+        transpiler = Transpiler(self.platform, self.debug, self.inline_threshold)
         return transpiler.transpile(module)
 
-    def generate_asm(self, mod: AsmModule)-> str:
-        generator = AsmGenerator(self.platform, self.debug)
-        asm = generator.generate_module(mod)
-        path = f'{self.asm_path()}/{self.name}.asm'
-        with open(path, 'w') as f:
-            f.write(asm)
-            f.flush()
+    def generate_native(self, mod: AsmModule, name: str | None = None)-> str | None:
+        generator = AsmGenerator(self.platform, self.debug, self.peephole)
+        writer = ElfWriter(mod.data)
+        encoder = writer.encoder()
+        path = self.executable_path(name)
+        try:
+            for func in generator.generate_functions(mod):
+                encoder.encode(func)
+            writer.write(encoder, path)
+        except EncodingError as error:
+            self.v_print('Falling back to nasm: {}', error)
+            return None
+        self.v_print('Encoded {} instructions into {}', encoder.count, path)
         return path
-    def assemble(self, asm_file_path: str)-> str:
-        path = f'{self.obj_path()}/{self.name}.o'
-        os.system(f'nasm -f {self.platform.assembler_format()} -o {path} {asm_file_path}')
+    def generate_asm(self, mod: AsmModule, name: str | None = None)-> str:
+        generator = AsmGenerator(self.platform, self.debug, self.peephole)
+        path = f'{self.asm_path()}/{name or self.name}.asm'
+        with open(path, 'w') as f:
+            generator.write_module(mod, f)
         return path
-    def link(self, obj_file_path: str)-> str:
-        path = f'{self.out_path()}/{self.name}.exe'
-        os.system(f'link /SUBSYSTEM:CONSOLE /ENTRY:_start /OUT:{path} {obj_file_path}')
+    def object_file(self, name: str | None = None)-> str:
+        return f'{self.obj_path()}/{name or self.name}.o'
+    def executable_path(self, name: str | None = None)-> str:
+        return f'{self.out_path()}/{name or self.name}{self.platform.executable_suffix()}'
+    def assemble(self, asm_file_path: str, name: str | None = None)-> str:
+        path = self.object_file(name)
+        key = None
+        if self.caching('object'):
+            with open(asm_file_path, 'rb') as f:
+                key = BuildCache.key(self.compiler, self.platform.assembler_format(), f.read())
+            if self.cache.restore('object', key, path):
+                return path
+        self.toolchain.assemble(self.platform, asm_file_path, path)
+        if key is not None:
+            self.cache.save('object', key, path)
         return path
+    def link(self, obj_file_path: str, name: str | None = None)-> str:
+        return self.toolchain.link(self.platform, [obj_file_path], self.executable_path(name))
 
 
@@ -9,9 +9,13 @@ def main():
         epilog=''
     )
 
-    parser.add_argument('-f', '--file')
+    parser.add_argument('-f', '--file', action='append')
     parser.add_argument('-o', '--out', default='bin')
-    parser.add_argument('-v', '--verbose', action='store_true')
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+    parser.add_argument('--nasm', action='store_true', help='always assemble through nasm')
+    parser.add_argument('-j', '--jobs', type=int, help='number of assembler and linker processes to run at once')
+    parser.add_argument('--cache', action='store_true', help='reuse unchanged build outputs from <out>/cache')
+    parser.add_argument('--cache-size', type=int, default=256, help='cache size limit in MiB')
 
     parser.add_argument('-l32', dest='platform', action='store_const', const=CompilerPlatform.LINUX_X86_32)
     parser.add_argument('-l64', dest='platform', action='store_const', const=CompilerPlatform.LINUX_X86_64)
@@ -23,19 +27,28 @@ def main():
         print('No filename provided')
         exit()
     else:
-        proj_name = args.file.split('\\')[-1].split('/')[-1].split('.')[0]
-        with open(args.file, 'r') as f:
-            source = f.read()
-            source = source.replace('\r\n', '\n')
-        print(f'Compiling project {proj_name}')
+        names = [file.split('\\')[-1].split('/')[-1].split('.')[0] for file in args.file]
+        print(f'Compiling project {", ".join(names)}')
         opts = BrikOpts(
-            proj_name,
+            names[0],
             args.platform if args.platform else CompilerPlatform.LINUX_X86_64,
             args.out,
-            args.verbose
+            args.verbose,
+            native=not args.nasm,
+            jobs=args.jobs,
+            cache=args.cache,
+            cache_size=args.cache_size << 20
         )
         compiler = Brik(opts)
-        results = compiler.compile_all(source)
+        if len(args.file) == 1:
+            with open(args.file[0], 'rb') as f:
+                results = compiler.compile_stream(f)
+        else:
+            sources = []
+            for (name, file) in zip(names, args.file):
+                with open(file, encoding='utf-8') as f:
+                    sources.append((name, f.read()))
+            results = compiler.compile_many(sources)
 
 if __name__ == '__main__':
     main()
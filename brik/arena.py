@@ -0,0 +1,248 @@
+from array import array
+from enum import IntEnum
+from typing import Any, Iterable
+
+from brik.definitions import CallDefinition, VarDefinition
+from brik.patterns import Pattern
+from brik.syntax_tree import *
+
+class NodeKind(IntEnum):
+    CALL = 0
+    ASM = 1
+    LIST = 2
+    BLOCK = 3
+    NUMBER = 4
+    STRING = 5
+    REFERENCE = 6
+    STRUCT = 7
+    CALL_DEF = 8
+    VAR_DEF = 9
+
+class AstArena:
+    _kinds = {
+        CallNode: NodeKind.CALL,
+        AsmMacroNode: NodeKind.ASM,
+        ListNode: NodeKind.LIST,
+        BlockNode: NodeKind.BLOCK,
+        NumberNode: NodeKind.NUMBER,
+        StringNode: NodeKind.STRING,
+        ReferenceNode: NodeKind.REFERENCE,
+        StructNode: NodeKind.STRUCT,
+        CallDefinition: NodeKind.CALL_DEF,
+        VarDefinition: NodeKind.VAR_DEF
+    }
+    _int_min = -(1 << 63)
+    _int_max = (1 << 63) - 1
+
+    def __init__(self):
+        self.kinds = array('B')
+        # NUMBER: the value itself, or an index into constants when aux is 1
+        # CALL, ASM, STRING, REFERENCE, CALL_DEF, VAR_DEF: an index into strings
+        self.values = array('q')
+        # BLOCK: how many children are definitions, CALL_DEF: an index into patterns
+        self.aux = array('q')
+        self.first = array('i')
+        self.count = array('i')
+        self.edges = array('i')
+        self.strings: list[str] = []
+        self.string_index: dict[str, int] = {}
+        self.patterns: list[Pattern] = []
+        self.constants: list[int] = []
+        self.root = -1
+        # Built on first use by parent() and scope(), and dropped whenever a node is added
+        self.parents: array | None = None
+        self.scopes: dict[int, BlockNode] = {}
+
+    def __len__(self)-> int:
+        return len(self.kinds)
+
+    @staticmethod
+    def kind_of(node: Structural)-> NodeKind | None:
+        return AstArena._kinds.get(type(node))
+
+    def intern(self, val: str)-> int:
+        index = self.string_index.get(val)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(val)
+            self.string_index[val] = index
+        return index
+
+    def add(self, node: Structural)-> int:
+        kind = AstArena.kind_of(node)
+        if kind is None:
+            raise Exception(f'Could not store node of type {type(node)} in arena')
+        val = 0
+        aux = 0
+        if kind == NodeKind.NUMBER:
+            if AstArena._int_min <= node.value <= AstArena._int_max:
+                val = node.value
+            else:
+                val = len(self.constants)
+                aux = 1
+                self.constants.append(node.value)
+        elif kind == NodeKind.ASM:
+            val = self.intern(node.asm)
+        elif kind == NodeKind.STRING:
+            val = self.intern(node.value)
+        elif kind == NodeKind.BLOCK:
+            aux = len(node.idents)
+        elif kind == NodeKind.CALL_DEF:
+            val = self.intern(node.name)
+            aux = len(self.patterns)
+            self.patterns.append(node.pattern)
+        elif kind in (NodeKind.CALL, NodeKind.REFERENCE, NodeKind.VAR_DEF):
+            val = self.intern(node.name)
+        self.parents = None
+        self.scopes = {}
+        self.kinds.append(kind)
+        self.values.append(val)
+        self.aux.append(aux)
+        self.first.append(0)
+        self.count.append(0)
+        return len(self.kinds) - 1
+
+    @staticmethod
+    def from_module(module: Module)-> 'AstArena':
+        arena = AstArena()
+        arena.root = arena.add(module.entry_point)
+        stack = [(module.entry_point, arena.root)]
+        while stack:
+            node, index = stack.pop()
+            children = node.children()
+            arena.first[index] = len(arena.edges)
+            arena.count[index] = len(children)
+            for child in children:
+                child_index = arena.add(child)
+                arena.edges.append(child_index)
+                stack.append((child, child_index))
+        return arena
+
+    def to_module(self)-> Module:
+        return Module(self.build(range(0, len(self)))[self.root])
+
+    def to_node(self, index: int)-> Any:
+        subtree = [index]
+        stack = [index]
+        while stack:
+            for child in self.children(stack.pop()):
+                subtree.append(child)
+                stack.append(child)
+        nodes = self.build(sorted(subtree))
+        # Blocks whose enclosing block lies outside the subtree hang off a shallow scope for it
+        for i in subtree:
+            if self.kinds[i] == NodeKind.BLOCK and nodes[i].parent is None and (outer := self.enclosing(i)) >= 0:
+                nodes[i].parent = self.scope(outer)
+        return nodes[index]
+
+    def build(self, indices: Iterable[int])-> dict[int, Any]:
+        # Children are always stored after their parent, so building back to front
+        # means every child already exists when its parent is built
+        indices = list(indices)
+        nodes: dict[int, Any] = {}
+        for i in reversed(indices):
+            children = [nodes[c] for c in self.children(i)]
+            kind = self.kinds[i]
+            if kind == NodeKind.CALL: node = CallNode(self.name(i), children)
+            elif kind == NodeKind.ASM: node = AsmMacroNode(self.name(i))
+            elif kind == NodeKind.LIST: node = ListNode(children)
+            elif kind == NodeKind.BLOCK:
+                node = BlockNode(children[self.aux[i]:])
+                node.idents = children[:self.aux[i]]
+            elif kind == NodeKind.NUMBER: node = NumberNode(self.number(i))
+            elif kind == NodeKind.STRING: node = StringNode(self.name(i))
+            elif kind == NodeKind.REFERENCE: node = ReferenceNode(self.name(i))
+            elif kind == NodeKind.STRUCT: node = StructNode()
+            elif kind == NodeKind.CALL_DEF: node = CallDefinition(self.name(i), children[0], self.pattern(i))
+            else: node = VarDefinition(self.name(i), children[0] if children else None)
+            nodes[i] = node
+
+        enclosing: dict[int, int] = {}
+        for i in indices:
+            scope = i if self.kinds[i] == NodeKind.BLOCK else enclosing.get(i, -1)
+            for c in self.children(i):
+                enclosing[c] = scope
+                if self.kinds[c] == NodeKind.BLOCK and scope >= 0:
+                    nodes[c].parent = nodes[scope]
+        return nodes
+
+    def kind(self, index: int)-> NodeKind:
+        return NodeKind(self.kinds[index])
+    def children(self, index: int)-> array:
+        first = self.first[index]
+        return self.edges[first:first + self.count[index]]
+    def idents(self, index: int)-> array:
+        first = self.first[index]
+        return self.edges[first:first + self.aux[index]]
+    def contents(self, index: int)-> array:
+        first = self.first[index]
+        return self.edges[first + self.aux[index]:first + self.count[index]]
+    def name(self, index: int)-> str:
+        return self.strings[self.values[index]]
+    def number(self, index: int)-> int:
+        return self.constants[self.values[index]] if self.aux[index] else self.values[index]
+    def pattern(self, index: int)-> Pattern:
+        return self.patterns[self.aux[index]]
+
+    def parent(self, index: int)-> int:
+        if self.parents is None:
+            self.parents = array('i', [-1]) * len(self)
+            for i in range(0, len(self)):
+                for c in self.children(i):
+                    self.parents[c] = i
+        return self.parents[index]
+    def enclosing(self, index: int)-> int:
+        index = self.parent(index)
+        while index >= 0 and self.kinds[index] != NodeKind.BLOCK:
+            index = self.parent(index)
+        return index
+    def scope(self, block: int)-> BlockNode:
+        # A block node whose definitions and contents stay arena views, so code that walks
+        # up from a rebuilt subtree sees its enclosing scopes without rebuilding them
+        chain = []
+        index = block
+        while index >= 0 and index not in self.scopes:
+            chain.append(index)
+            index = self.enclosing(index)
+        for index in reversed(chain):
+            node = BlockNode([self.view(c) for c in self.contents(index)])
+            node.idents = [self.view(c) for c in self.idents(index)]
+            outer = self.enclosing(index)
+            node.parent = self.scopes[outer] if outer >= 0 else None
+            self.scopes[index] = node
+        return self.scopes[block]
+
+    def view(self, index: int)-> 'ArenaNode':
+        return ArenaDefinition(self, index) if self.kinds[index] == NodeKind.CALL_DEF else ArenaNode(self, index)
+
+class ArenaNode:
+    __slots__ = ('arena', 'index')
+    def __init__(self, arena: AstArena, index: int):
+        self.arena = arena
+        self.index = index
+    @property
+    def kind(self)-> NodeKind:
+        return self.arena.kind(self.index)
+    @property
+    def name(self)-> str:
+        return self.arena.name(self.index)
+    @property
+    def value(self)-> int | str:
+        if self.arena.kinds[self.index] == NodeKind.NUMBER:
+            return self.arena.number(self.index)
+        return self.arena.name(self.index)
+    @property
+    def pattern(self)-> Pattern:
+        return self.arena.pattern(self.index)
+    @property
+    def children(self)-> list['ArenaNode']:
+        return [ArenaNode(self.arena, c) for c in self.arena.children(self.index)]
+    def __repr__(self)-> str:
+        return f'ArenaNode({self.kind.name}, {self.index})'
+
+class ArenaDefinition(ArenaNode):
+    __slots__ = ()
+    inline = None
+    @property
+    def body(self)-> ArenaNode:
+        return ArenaNode(self.arena, self.arena.children(self.index)[0])
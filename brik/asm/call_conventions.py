@@ -1,23 +1,122 @@
 from abc import ABC, abstractmethod
+from typing import Callable
 
-from brik.printer import Printer
-from brik.syntax_tree import CallNode
+from brik.asm.ir import InstructionList, Operand, VReg
+from brik.asm.syntax_tree import AsmExpr, AsmInt, AsmString
 
 class CallConvention(ABC):
+    registers: list[str] = []
+    callee_saved: list[str] = []
+    scratch: list[str] = []
+    shadow_space = 0
+    callee_cleanup = False
+
+    def __init__(self, word_size: int, reg_prefix: str):
+        self.word_size = word_size
+        self.ax = f'{reg_prefix}ax'
+        self.dx = f'{reg_prefix}dx'
+        self.sp = f'{reg_prefix}sp'
+        self.bp = f'{reg_prefix}bp'
+        self.size = 'qword' if word_size == 8 else 'dword'
+
     @abstractmethod
-    def generate_call(self, p: Printer, call: CallNode):
-        pass
-    @abstractmethod
-    def generate_func_open(self, p: Printer):
+    def arg_slot(self, index: int)-> int:
         pass
-    @abstractmethod
-    def generate_func_close(self, p: Printer):
+
+    def register_count(self, arity: int)-> int:
+        return min(arity, len(self.registers))
+
+    def operand_source(self, op: AsmExpr)-> str | None:
+        if isinstance(op, AsmInt): return f'{op.value}d'
+        elif isinstance(op, AsmString): return op.value
+        return None
+
+    def can_tail_call(self, arity: int)-> bool:
+        return self.register_count(arity) == arity
+
+    def generate_call(self, code: InstructionList, target: str, operands: list[AsmExpr], evaluate: Callable[[AsmExpr], None], tail: bool = False):
+        sources: list[Operand | None] = [self.operand_source(op) for op in operands]
+        for i in range(0, len(operands)):
+            if sources[i] is None:
+                evaluate(operands[i])
+                value = code.vreg()
+                code.append('mov', value, self.ax)
+                sources[i] = value
+        register_count = self.register_count(len(operands))
+        for i in range(len(operands) - 1, register_count - 1, -1):
+            if isinstance(sources[i], VReg):
+                code.append('push', sources[i])
+            else:
+                code.append('mov', self.ax, sources[i])
+                code.append('push', self.ax)
+        for i in range(0, register_count):
+            code.append('mov', self.registers[i], sources[i])
+        if tail and self.can_tail_call(len(operands)):
+            code.append('jmp', target)
+            return
+        if self.shadow_space > 0:
+            code.append('sub', self.sp, str(self.shadow_space))
+        code.append('call', target)
+        cleanup = self.shadow_space
+        if not self.callee_cleanup:
+            cleanup += (len(operands) - register_count) * self.word_size
+        if cleanup > 0:
+            code.append('add', self.sp, str(cleanup))
+
+    def frame_words(self, arity: int)-> int:
+        return 0
+    def generate_func_open(self, code: InstructionList, arity: int, locals: int = 0):
+        code.append('push', self.bp)
+        code.append('mov', self.bp, self.sp)
+        words = self.frame_words(arity) + locals
+        if words > 0:
+            code.append('sub', self.sp, str((words * self.word_size + 15) // 16 * 16))
+        self.spill_registers(code, arity)
+    def spill_registers(self, code: InstructionList, arity: int):
         pass
+    def generate_func_close(self, code: InstructionList, arity: int):
+        self.generate_func_teardown(code)
+        self.generate_return(code, arity)
+    def generate_func_teardown(self, code: InstructionList):
+        code.append('mov', self.sp, self.bp)
+        code.append('pop', self.bp)
+    def generate_return(self, code: InstructionList, arity: int):
+        stack_args = arity - self.register_count(arity)
+        if self.callee_cleanup and stack_args > 0:
+            code.append('ret', str(stack_args * self.word_size))
+        else:
+            code.append('ret')
 
 class CdeclCallConvention(CallConvention):
-    def generate_call(self, p: Printer, call: CallNode):
-        
-    pass
+    callee_saved = ['ebx', 'esi', 'edi']
+    scratch = ['ecx']
+
+    def arg_slot(self, index: int)-> int:
+        return 2 + index
+
+class SystemVCallConvention(CallConvention):
+    registers = ['rdi', 'rsi', 'rdx', 'rcx', 'r8', 'r9']
+    callee_saved = ['rbx', 'r12', 'r13', 'r14', 'r15']
+    scratch = ['r10', 'r11']
+
+    def arg_slot(self, index: int)-> int:
+        if index < len(self.registers):
+            return -(index + 1)
+        return 2 + index - len(self.registers)
+    def frame_words(self, arity: int)-> int:
+        return self.register_count(arity)
+    def spill_registers(self, code: InstructionList, arity: int):
+        for i in range(0, self.register_count(arity)):
+            code.append('mov', f'[{self.bp}-{(i + 1) * self.word_size}]', self.registers[i])
 
 class MicrosoftCallConvention(CallConvention):
-    pass
+    registers = ['rcx', 'rdx', 'r8', 'r9']
+    callee_saved = ['rbx', 'r12', 'r13', 'r14', 'r15']
+    scratch = ['r10', 'r11']
+    shadow_space = 32
+
+    def arg_slot(self, index: int)-> int:
+        return 2 + index
+    def spill_registers(self, code: InstructionList, arity: int):
+        for i in range(0, self.register_count(arity)):
+            code.append('mov', f'[{self.bp}+{(2 + i) * self.word_size}]', self.registers[i])
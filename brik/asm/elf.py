@@ -0,0 +1,88 @@
+import os
+import struct
+
+from brik.asm.encoder import EncodingError, X86Encoder
+from brik.asm.syntax_tree import DataSection
+
+class ElfWriter:
+    base = 0x400000
+    page = 0x1000
+
+    def __init__(self, data: DataSection, entry: str = '_start'):
+        self.entry = entry
+        self.rodata = bytearray()
+        self.offsets: dict[str, int] = {}
+        self.constants: dict[str, int] = {}
+        for (name, value) in data.data.items():
+            encoded = value.encode('utf-8')
+            self.offsets[name] = len(self.rodata)
+            self.constants[DataSection.length(name)] = len(encoded)
+            self.rodata += encoded + b'\0'
+
+    def encoder(self)-> X86Encoder:
+        return X86Encoder(self.constants)
+
+    @staticmethod
+    def align(value: int, alignment: int)-> int:
+        return (value + alignment - 1) // alignment * alignment
+
+    def image(self, code: X86Encoder)-> bytes:
+        text_offset = ElfWriter.page
+        text_address = ElfWriter.base + text_offset
+        rodata_offset = ElfWriter.align(text_offset + len(code.code), ElfWriter.page)
+        rodata_address = ElfWriter.base + rodata_offset
+        symbols = {name: rodata_address + offset for (name, offset) in self.offsets.items()}
+        text = code.link(text_address, symbols)
+        if self.entry not in code.labels:
+            raise EncodingError(f'Entry point {self.entry} is not defined')
+
+        strtab = bytearray(b'\0')
+        symtab = bytearray(bytes(24))
+        def symbol(name: str, section: int, value: int, bind: int):
+            symtab.extend(struct.pack('<IBBHQQ', len(strtab), bind << 4, 0, section, value, 0))
+            strtab.extend(name.encode('utf-8') + b'\0')
+        for (name, offset) in code.labels.items():
+            if name != self.entry: symbol(name, 1, text_address + offset, 0)
+        for (name, address) in symbols.items():
+            symbol(name, 2, address, 0)
+        locals = len(symtab) // 24
+        symbol(self.entry, 1, text_address + code.labels[self.entry], 1)
+
+        names = [b'', b'.text', b'.rodata', b'.symtab', b'.strtab', b'.shstrtab']
+        shstrtab = b'\0'.join(names) + b'\0'
+        name_offsets = [shstrtab.index(name + b'\0') if name else 0 for name in names]
+
+        symtab_offset = ElfWriter.align(rodata_offset + len(self.rodata), 8)
+        strtab_offset = symtab_offset + len(symtab)
+        shstrtab_offset = strtab_offset + len(strtab)
+        sections_offset = ElfWriter.align(shstrtab_offset + len(shstrtab), 8)
+
+        segments = [(5, text_offset, text_address, len(text))]
+        if len(self.rodata) > 0:
+            segments.append((4, rodata_offset, rodata_address, len(self.rodata)))
+        header = struct.pack('<4sBBBB8xHHIQQQIHHHHHH', b'\x7fELF', 2, 1, 1, 0,
+            2, 0x3e, 1, text_address + code.labels[self.entry], 64, sections_offset, 0, 64, 56, len(segments), 64, len(names), 5)
+        for (flags, offset, address, size) in segments:
+            header += struct.pack('<IIQQQQQQ', 1, flags, offset, address, address, size, size, ElfWriter.page)
+
+        sections = bytes(64)
+        for (i, (kind, flags, address, offset, size, link, info, alignment, entsize)) in enumerate([
+                (1, 6, text_address, text_offset, len(text), 0, 0, 16, 0),
+                (1, 2, rodata_address, rodata_offset, len(self.rodata), 0, 0, 1, 0),
+                (2, 0, 0, symtab_offset, len(symtab), 4, locals, 8, 24),
+                (3, 0, 0, strtab_offset, len(strtab), 0, 0, 1, 0),
+                (3, 0, 0, shstrtab_offset, len(shstrtab), 0, 0, 1, 0)]):
+            sections += struct.pack('<IIQQQQIIQQ', name_offsets[i + 1], kind, flags, address, offset, size, link, info, alignment, entsize)
+
+        image = bytearray(header)
+        for (offset, chunk) in [(text_offset, text), (rodata_offset, self.rodata), (symtab_offset, symtab),
+                                (strtab_offset, strtab), (shstrtab_offset, shstrtab), (sections_offset, sections)]:
+            image.extend(bytes(offset - len(image)))
+            image.extend(chunk)
+        return bytes(image)
+
+    def write(self, code: X86Encoder, path: str):
+        image = self.image(code)
+        with open(path, 'wb') as f:
+            f.write(image)
+        os.chmod(path, 0o755)
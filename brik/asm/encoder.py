@@ -0,0 +1,545 @@
+import re
+import struct
+
+from brik.asm.ir import Instruction, InstructionList
+
+class EncodingError(Exception):
+    pass
+
+class Register:
+    __slots__ = ('name', 'number', 'size', 'rex', 'high')
+    def __init__(self, name: str, number: int, size: int, rex: bool = False, high: bool = False):
+        self.name = name
+        self.number = number
+        self.size = size
+        self.rex = rex
+        self.high = high
+
+class Memory:
+    __slots__ = ('size', 'base', 'index', 'scale', 'disp', 'label')
+    def __init__(self, size: int | None, base: Register | None, index: Register | None, scale: int, disp: int, label: str | None):
+        self.size = size
+        self.base = base
+        self.index = index
+        self.scale = scale
+        self.disp = disp
+        self.label = label
+
+class Immediate:
+    __slots__ = ('value', 'label')
+    def __init__(self, value: int, label: str | None = None):
+        self.value = value
+        self.label = label
+
+Operand = Register | Memory | Immediate
+
+class Fixup:
+    __slots__ = ('offset', 'kind', 'label', 'addend', 'end')
+    def __init__(self, offset: int, kind: str, label: str, addend: int, end: int):
+        self.offset = offset
+        self.kind = kind
+        self.label = label
+        self.addend = addend
+        self.end = end
+
+def _registers()-> dict[str, Register]:
+    registers = {}
+    legacy = ['ax', 'cx', 'dx', 'bx', 'sp', 'bp', 'si', 'di']
+    for (number, name) in enumerate(legacy):
+        registers[f'r{name}'] = Register(f'r{name}', number, 64)
+        registers[f'e{name}'] = Register(f'e{name}', number, 32)
+        registers[name] = Register(name, number, 16)
+        if name[1] == 'x':
+            registers[f'{name[0]}l'] = Register(f'{name[0]}l', number, 8)
+            registers[f'{name[0]}h'] = Register(f'{name[0]}h', number + 4, 8, high=True)
+        else:
+            registers[f'{name}l'] = Register(f'{name}l', number, 8, rex=True)
+    for number in range(8, 16):
+        registers[f'r{number}'] = Register(f'r{number}', number, 64)
+        registers[f'r{number}d'] = Register(f'r{number}d', number, 32)
+        registers[f'r{number}w'] = Register(f'r{number}w', number, 16)
+        registers[f'r{number}b'] = Register(f'r{number}b', number, 8)
+    return registers
+
+class X86Encoder:
+    registers = _registers()
+    sizes = {'byte': 8, 'word': 16, 'dword': 32, 'qword': 64}
+    scales = {1: 0, 2: 1, 4: 2, 8: 3}
+    arithmetic = {'add': 0, 'or': 1, 'adc': 2, 'sbb': 3, 'and': 4, 'sub': 5, 'xor': 6, 'cmp': 7}
+    unary = {'not': 2, 'neg': 3, 'mul': 4, 'div': 6, 'idiv': 7}
+    shifts = {'rol': 0, 'ror': 1, 'shl': 4, 'sal': 4, 'shr': 5, 'sar': 7}
+    conditions = {
+        'o': 0, 'no': 1, 'b': 2, 'c': 2, 'nae': 2, 'ae': 3, 'nb': 3, 'nc': 3, 'e': 4, 'z': 4, 'ne': 5, 'nz': 5,
+        'be': 6, 'na': 6, 'a': 7, 'nbe': 7, 's': 8, 'ns': 9, 'p': 10, 'pe': 10, 'np': 11, 'po': 11,
+        'l': 12, 'nge': 12, 'ge': 13, 'nl': 13, 'le': 14, 'ng': 14, 'g': 15, 'nle': 15,
+    }
+    fixed = {'ret': b'\xc3', 'leave': b'\xc9', 'nop': b'\x90', 'syscall': b'\x0f\x05', 'hlt': b'\xf4', 'cqo': b'\x48\x99', 'cdq': b'\x99'}
+    _symbol = re.compile(r'^[A-Za-z_.?$][\w.?$@#~]*$')
+    _label = re.compile(r'^([A-Za-z_.?][\w.?$@#~]*):(.*)$')
+    _sized = re.compile(r'^(byte|word|dword|qword)\s+(.*)$', re.IGNORECASE)
+
+    def __init__(self, constants: dict[str, int] | None = None):
+        self.code = bytearray()
+        self.labels: dict[str, int] = {}
+        self.fixups: list[Fixup] = []
+        self.constants = constants if constants is not None else {}
+        self.count = 0
+
+    def encode(self, code: InstructionList):
+        for inst in code.instructions:
+            if inst.raw:
+                self.encode_line(inst.op)
+            elif inst.is_label():
+                self.label(inst.op[:-1])
+            else:
+                self.encode_instruction(inst.op, [str(op) for op in inst.operands], str(inst))
+
+    def encode_line(self, line: str):
+        text = X86Encoder.strip_comment(line).strip()
+        match = X86Encoder._label.match(text)
+        if match is not None:
+            self.label(match.group(1))
+            text = match.group(2).strip()
+        if len(text) > 0:
+            inst = Instruction.parse(text)
+            self.encode_instruction(inst.op, [str(op) for op in inst.operands], line)
+
+    @staticmethod
+    def strip_comment(line: str)-> str:
+        quote = None
+        for (i, c) in enumerate(line):
+            if quote is not None:
+                if c == quote: quote = None
+            elif c == '"' or c == "'":
+                quote = c
+            elif c == ';':
+                return line[:i]
+        return line
+
+    def label(self, name: str):
+        if name in self.labels:
+            raise EncodingError(f'Label {name} is defined twice')
+        self.labels[name] = len(self.code)
+
+    def encode_instruction(self, op: str, operands: list[str], line: str):
+        op = op.lower()
+        try:
+            parsed = [self.operand(text) for text in operands]
+            self.dispatch(op, parsed)
+        except EncodingError as error:
+            raise EncodingError(f'Cannot encode "{line.strip()}": {error}') from None
+        except TypeError:
+            raise EncodingError(f'Cannot encode "{line.strip()}": wrong number of operands') from None
+        self.count += 1
+
+    def dispatch(self, op: str, operands: list[Operand]):
+        if op in X86Encoder.fixed and len(operands) == 0: self.emit(X86Encoder.fixed[op])
+        elif op == 'ret': self.emit(b'\xc2' + self.imm(self.constant(operands[0]), 2))
+        elif op == 'int': self.emit(b'\xcd' + self.imm(self.constant(operands[0]), 1))
+        elif op == 'mov': self.mov(*operands)
+        elif op in X86Encoder.arithmetic: self.arith(X86Encoder.arithmetic[op], *operands)
+        elif op == 'test': self.test(*operands)
+        elif op == 'push': self.push(*operands)
+        elif op == 'pop': self.pop(*operands)
+        elif op == 'lea': self.lea(*operands)
+        elif op == 'imul': self.imul(*operands)
+        elif op in X86Encoder.unary: self.group3(X86Encoder.unary[op], *operands)
+        elif op == 'inc' or op == 'dec': self.group5(0 if op == 'inc' else 1, *operands)
+        elif op in X86Encoder.shifts: self.shift(X86Encoder.shifts[op], *operands)
+        elif op == 'movzx' or op == 'movsx': self.extend(0xb6 if op == 'movzx' else 0xbe, *operands)
+        elif op == 'movsxd': self.movsxd(*operands)
+        elif op == 'xchg': self.xchg(*operands)
+        elif op == 'call' or op == 'jmp': self.branch(op, *operands)
+        elif op.startswith('j') and op[1:] in X86Encoder.conditions: self.jcc(X86Encoder.conditions[op[1:]], *operands)
+        elif op.startswith('set') and op[3:] in X86Encoder.conditions: self.setcc(X86Encoder.conditions[op[3:]], *operands)
+        elif op.startswith('cmov') and op[4:] in X86Encoder.conditions: self.cmov(X86Encoder.conditions[op[4:]], *operands)
+        else: raise EncodingError(f'unsupported instruction {op}')
+
+    def operand(self, text: str)-> Operand:
+        text = text.strip()
+        size = None
+        match = X86Encoder._sized.match(text)
+        if match is not None:
+            size = X86Encoder.sizes[match.group(1).lower()]
+            text = match.group(2).strip()
+        if text.startswith('[') and text.endswith(']'):
+            return self.memory(text[1:-1], size)
+        reg = X86Encoder.registers.get(text.lower())
+        if reg is not None:
+            if size is not None and size != reg.size:
+                raise EncodingError(f'operand size does not match {text}')
+            return reg
+        return self.immediate(text)
+
+    def immediate(self, text: str)-> Immediate:
+        value = X86Encoder.number(text)
+        if value is not None:
+            return Immediate(value)
+        if text in self.constants:
+            return Immediate(self.constants[text])
+        if X86Encoder._symbol.match(text) is not None:
+            return Immediate(0, text)
+        raise EncodingError(f'unsupported operand {text}')
+
+    @staticmethod
+    def number(text: str)-> int | None:
+        if len(text) >= 3 and text[0] == text[-1] and text[0] in '\'"`':
+            return int.from_bytes(text[1:-1].encode('utf-8'), 'little')
+        sign = 1
+        if text[:1] in '+-':
+            sign = -1 if text[0] == '-' else 1
+            text = text[1:].strip()
+        digits = text.lower().replace('_', '')
+        if len(digits) == 0 or not digits[0].isdigit():
+            return None
+        try:
+            if digits.startswith('0x'): return sign * int(digits[2:], 16)
+            if digits.startswith('0b'): return sign * int(digits[2:], 2)
+            if digits.endswith('h'): return sign * int(digits[:-1], 16)
+            if digits.endswith('b'): return sign * int(digits[:-1], 2)
+            if digits.endswith('d'): return sign * int(digits[:-1], 10)
+            return sign * int(digits, 10)
+        except ValueError:
+            return None
+
+    def memory(self, text: str, size: int | None)-> Memory:
+        text = text.strip()
+        if text.lower().startswith('rel '):
+            text = text[4:]
+        (base, index, scale, disp, label) = (None, None, 1, 0, None)
+        for (sign, term) in re.findall(r'([+-]?)\s*([^+-]+)', text):
+            term = term.strip()
+            if '*' in term:
+                (left, right) = [part.strip() for part in term.split('*', 1)]
+                (reg, factor) = (left, right) if left.lower() in X86Encoder.registers else (right, left)
+                if index is not None or sign == '-':
+                    raise EncodingError(f'unsupported address [{text}]')
+                index = self.address_register(reg)
+                scale = X86Encoder.number(factor)
+            elif term.lower() in X86Encoder.registers:
+                if sign == '-':
+                    raise EncodingError(f'unsupported address [{text}]')
+                if base is None: base = self.address_register(term)
+                elif index is None: index = self.address_register(term)
+                else: raise EncodingError(f'unsupported address [{text}]')
+            else:
+                value = self.immediate(term)
+                if value.label is not None:
+                    if label is not None or sign == '-':
+                        raise EncodingError(f'unsupported address [{text}]')
+                    label = value.label
+                else:
+                    disp += -value.value if sign == '-' else value.value
+        if scale not in X86Encoder.scales or (index is not None and index.number == 4):
+            raise EncodingError(f'unsupported address [{text}]')
+        return Memory(size, base, index, scale, disp, label)
+
+    @staticmethod
+    def address_register(name: str)-> Register:
+        reg = X86Encoder.registers[name.lower()]
+        if reg.size != 64:
+            raise EncodingError(f'unsupported address register {name}')
+        return reg
+
+    def constant(self, operand: Operand)-> Immediate:
+        if not isinstance(operand, Immediate) or operand.label is not None:
+            raise EncodingError('expected a constant')
+        return operand
+
+    def imm(self, operand: Immediate, width: int, fixups: list[tuple[int, str, str, int]] | None = None, position: int = 0)-> bytes:
+        if operand.label is not None:
+            if fixups is None or width < 4:
+                raise EncodingError(f'symbol {operand.label} cannot be used here')
+            fixups.append((position, 'abs64' if width == 8 else 'abs32', operand.label, operand.value))
+            return bytes(width)
+        value = operand.value
+        if not -(1 << (width * 8 - 1)) <= value < (1 << (width * 8)):
+            raise EncodingError(f'immediate {value} does not fit in {width * 8} bits')
+        return (value & ((1 << (width * 8)) - 1)).to_bytes(width, 'little')
+
+    @staticmethod
+    def fits8(operand: Immediate)-> bool:
+        return operand.label is None and -128 <= operand.value < 128
+
+    def emit(self, data: bytes, fixups: list[tuple[int, str, str, int]] = []):
+        start = len(self.code)
+        self.code += data
+        for (position, kind, label, addend) in fixups:
+            self.fixups.append(Fixup(start + position, kind, label, addend, len(self.code)))
+
+    def emit_rm(self, opcode: bytes, reg: int, rm: Register | Memory, size: int, regs: list[Register] = [], imm: Immediate | None = None, width: int = 0, wide: bool = True):
+        if size == 16:
+            raise EncodingError('16-bit operands are not supported')
+        rex = 0x48 if size == 64 and wide else 0
+        if reg & 8: rex |= 0x44
+        fixups: list[tuple[int, str, str, int]] = []
+        if isinstance(rm, Register):
+            regs = regs + [rm]
+            if rm.number & 8: rex |= 0x41
+            body = bytes([0xc0 | (reg & 7) << 3 | rm.number & 7])
+        else:
+            (body, bits, label) = X86Encoder.address(reg, rm)
+            rex |= bits
+            if label is not None:
+                fixups.append((len(body) - 4, 'rel32', label, rm.disp))
+        if any(r.rex for r in regs): rex |= 0x40
+        if rex != 0 and any(r.high for r in regs):
+            raise EncodingError('high byte registers cannot be used with REX prefixes')
+        prefix = bytes([rex]) if rex != 0 else b''
+        head = len(prefix) + len(opcode)
+        fixups = [(position + head, kind, label, addend) for (position, kind, label, addend) in fixups]
+        tail = b''
+        if imm is not None:
+            tail = self.imm(imm, width, fixups, head + len(body))
+        self.emit(prefix + opcode + body + tail, fixups)
+
+    @staticmethod
+    def address(reg: int, mem: Memory)-> tuple[bytes, int, str | None]:
+        reg = (reg & 7) << 3
+        if mem.label is not None and mem.base is None and mem.index is None:
+            return (bytes([reg | 5]) + bytes(4), 0, mem.label)
+        if mem.label is not None:
+            raise EncodingError('symbols cannot be combined with address registers')
+        rex = 0
+        disp = mem.disp
+        if not -(1 << 31) <= disp < (1 << 31):
+            raise EncodingError(f'displacement {disp} does not fit in 32 bits')
+        if mem.base is None:
+            index = 4
+            if mem.index is not None:
+                index = mem.index.number & 7
+                if mem.index.number & 8: rex |= 0x42
+            scale = X86Encoder.scales[mem.scale]
+            return (bytes([reg | 4, scale << 6 | index << 3 | 5]) + struct.pack('<i', disp), rex, None)
+        base = mem.base.number
+        if base & 8: rex |= 0x41
+        if disp == 0 and base & 7 != 5: (mod, tail) = (0, b'')
+        elif -128 <= disp < 128: (mod, tail) = (1, struct.pack('<b', disp))
+        else: (mod, tail) = (2, struct.pack('<i', disp))
+        if mem.index is None and base & 7 != 4:
+            return (bytes([mod << 6 | reg | base & 7]) + tail, rex, None)
+        index = 4
+        if mem.index is not None:
+            index = mem.index.number & 7
+            if mem.index.number & 8: rex |= 0x42
+        scale = X86Encoder.scales[mem.scale]
+        return (bytes([mod << 6 | reg | 4, scale << 6 | index << 3 | base & 7]) + tail, rex, None)
+
+    @staticmethod
+    def size(*operands: Operand)-> int:
+        sizes = {op.size for op in operands if not isinstance(op, Immediate) and op.size is not None}
+        if len(sizes) == 0:
+            raise EncodingError('operand size is ambiguous')
+        if len(sizes) > 1:
+            raise EncodingError('operand sizes do not match')
+        return sizes.pop()
+
+    def mov(self, dest: Operand, source: Operand):
+        if isinstance(dest, Immediate):
+            raise EncodingError('cannot move into an immediate')
+        if isinstance(source, Register):
+            size = X86Encoder.size(dest, source)
+            self.emit_rm(b'\x88' if size == 8 else b'\x89', source.number, dest, size, [source])
+        elif isinstance(source, Memory):
+            if not isinstance(dest, Register):
+                raise EncodingError('memory to memory moves are not supported')
+            size = X86Encoder.size(dest, source)
+            self.emit_rm(b'\x8a' if size == 8 else b'\x8b', dest.number, source, size, [dest])
+        elif isinstance(dest, Register):
+            self.mov_immediate(dest, source)
+        else:
+            size = X86Encoder.size(dest)
+            if size == 8: self.emit_rm(b'\xc6', 0, dest, size, imm=source, width=1)
+            else: self.emit_rm(b'\xc7', 0, dest, size, imm=source, width=4)
+
+    def mov_immediate(self, dest: Register, source: Immediate):
+        rex = 0x41 if dest.number & 8 else (0x40 if dest.rex else 0)
+        opcode = 0xb8 + (dest.number & 7)
+        if dest.size == 8:
+            if rex != 0 and dest.high:
+                raise EncodingError('high byte registers cannot be used with REX prefixes')
+            self.emit(bytes([rex] if rex else []) + bytes([0xb0 + (dest.number & 7)]) + self.imm(source, 1))
+        elif dest.size == 16:
+            raise EncodingError('16-bit operands are not supported')
+        elif dest.size == 32 or (source.label is None and 0 <= source.value < (1 << 32)):
+            fixups: list[tuple[int, str, str, int]] = []
+            head = bytes([rex] if rex else []) + bytes([opcode])
+            self.emit(head + self.imm(source, 4, fixups, len(head)), fixups)
+        elif source.label is None and -(1 << 31) <= source.value < 0:
+            self.emit_rm(b'\xc7', 0, dest, 64, imm=source, width=4)
+        else:
+            fixups = []
+            head = bytes([rex | 0x48, opcode])
+            self.emit(head + self.imm(source, 8, fixups, len(head)), fixups)
+
+    def arith(self, ext: int, dest: Operand, source: Operand):
+        if isinstance(source, Immediate):
+            if isinstance(dest, Immediate):
+                raise EncodingError('destination cannot be an immediate')
+            size = X86Encoder.size(dest)
+            if size == 8: self.emit_rm(b'\x80', ext, dest, size, imm=source, width=1)
+            elif X86Encoder.fits8(source): self.emit_rm(b'\x83', ext, dest, size, imm=source, width=1)
+            else: self.emit_rm(b'\x81', ext, dest, size, imm=source, width=4)
+        elif isinstance(source, Register):
+            size = X86Encoder.size(dest, source)
+            self.emit_rm(bytes([ext * 8 + (0 if size == 8 else 1)]), source.number, dest, size, [source])
+        elif isinstance(dest, Register):
+            size = X86Encoder.size(dest, source)
+            self.emit_rm(bytes([ext * 8 + (2 if size == 8 else 3)]), dest.number, source, size, [dest])
+        else:
+            raise EncodingError('memory to memory operations are not supported')
+
+    def test(self, dest: Operand, source: Operand):
+        if isinstance(dest, Register) and isinstance(source, Memory):
+            (dest, source) = (source, dest)
+        if isinstance(source, Immediate) and not isinstance(dest, Immediate):
+            size = X86Encoder.size(dest)
+            self.emit_rm(b'\xf6' if size == 8 else b'\xf7', 0, dest, size, imm=source, width=1 if size == 8 else 4)
+        elif isinstance(source, Register) and not isinstance(dest, Immediate):
+            size = X86Encoder.size(dest, source)
+            self.emit_rm(b'\x84' if size == 8 else b'\x85', source.number, dest, size, [source])
+        else:
+            raise EncodingError('unsupported operands')
+
+    def push(self, source: Operand):
+        if isinstance(source, Register):
+            if source.size != 64:
+                raise EncodingError('only 64-bit registers can be pushed')
+            self.emit((b'\x41' if source.number & 8 else b'') + bytes([0x50 + (source.number & 7)]))
+        elif isinstance(source, Memory):
+            if source.size not in (None, 64):
+                raise EncodingError('only 64-bit values can be pushed')
+            self.emit_rm(b'\xff', 6, source, 64, wide=False)
+        elif X86Encoder.fits8(source):
+            self.emit(b'\x6a' + self.imm(source, 1))
+        else:
+            fixups: list[tuple[int, str, str, int]] = []
+            self.emit(b'\x68' + self.imm(source, 4, fixups, 1), fixups)
+
+    def pop(self, dest: Operand):
+        if isinstance(dest, Register):
+            if dest.size != 64:
+                raise EncodingError('only 64-bit registers can be popped')
+            self.emit((b'\x41' if dest.number & 8 else b'') + bytes([0x58 + (dest.number & 7)]))
+        elif isinstance(dest, Memory):
+            if dest.size not in (None, 64):
+                raise EncodingError('only 64-bit values can be popped')
+            self.emit_rm(b'\x8f', 0, dest, 64, wide=False)
+        else:
+            raise EncodingError('cannot pop into an immediate')
+
+    def lea(self, dest: Operand, source: Operand):
+        if not isinstance(dest, Register) or not isinstance(source, Memory):
+            raise EncodingError('lea needs a register and an address')
+        self.emit_rm(b'\x8d', dest.number, source, dest.size, [dest])
+
+    def imul(self, *operands: Operand):
+        if len(operands) == 1:
+            self.group3(5, operands[0])
+            return
+        dest = operands[0]
+        if not isinstance(dest, Register) or dest.size == 8:
+            raise EncodingError('imul needs a register destination')
+        if len(operands) == 2 and isinstance(operands[1], Immediate):
+            operands = (dest, dest, operands[1])
+        if len(operands) == 2:
+            X86Encoder.size(dest, operands[1])
+            self.emit_rm(b'\x0f\xaf', dest.number, operands[1], dest.size, [dest])
+        else:
+            (source, factor) = operands[1:]
+            if isinstance(source, Immediate) or not isinstance(factor, Immediate):
+                raise EncodingError('unsupported operands')
+            X86Encoder.size(dest, source)
+            if X86Encoder.fits8(factor): self.emit_rm(b'\x6b', dest.number, source, dest.size, [dest], factor, 1)
+            else: self.emit_rm(b'\x69', dest.number, source, dest.size, [dest], factor, 4)
+
+    def group3(self, ext: int, operand: Operand):
+        if isinstance(operand, Immediate):
+            raise EncodingError('operand cannot be an immediate')
+        size = X86Encoder.size(operand)
+        self.emit_rm(b'\xf6' if size == 8 else b'\xf7', ext, operand, size)
+
+    def group5(self, ext: int, operand: Operand):
+        if isinstance(operand, Immediate):
+            raise EncodingError('operand cannot be an immediate')
+        size = X86Encoder.size(operand)
+        self.emit_rm(b'\xfe' if size == 8 else b'\xff', ext, operand, size)
+
+    def shift(self, ext: int, dest: Operand, count: Operand):
+        if isinstance(dest, Immediate):
+            raise EncodingError('destination cannot be an immediate')
+        size = X86Encoder.size(dest)
+        byte = size == 8
+        if isinstance(count, Register) and count.name == 'cl':
+            self.emit_rm(b'\xd2' if byte else b'\xd3', ext, dest, size)
+        elif isinstance(count, Immediate) and count.label is None and count.value == 1:
+            self.emit_rm(b'\xd0' if byte else b'\xd1', ext, dest, size)
+        elif isinstance(count, Immediate):
+            self.emit_rm(b'\xc0' if byte else b'\xc1', ext, dest, size, imm=count, width=1)
+        else:
+            raise EncodingError('shift counts must be cl or an immediate')
+
+    def extend(self, opcode: int, dest: Operand, source: Operand):
+        if not isinstance(dest, Register) or isinstance(source, Immediate) or source.size not in (8, 16):
+            raise EncodingError('unsupported operands')
+        regs = [source] if isinstance(source, Register) else []
+        self.emit_rm(bytes([0x0f, opcode + (1 if source.size == 16 else 0)]), dest.number, source, dest.size, regs + [dest])
+
+    def movsxd(self, dest: Operand, source: Operand):
+        if not isinstance(dest, Register) or dest.size != 64 or isinstance(source, Immediate) or source.size not in (None, 32):
+            raise EncodingError('unsupported operands')
+        self.emit_rm(b'\x63', dest.number, source, 64)
+
+    def xchg(self, dest: Operand, source: Operand):
+        if isinstance(dest, Register) and isinstance(source, Memory):
+            (dest, source) = (source, dest)
+        if not isinstance(source, Register) or isinstance(dest, Immediate):
+            raise EncodingError('unsupported operands')
+        size = X86Encoder.size(dest, source)
+        self.emit_rm(b'\x86' if size == 8 else b'\x87', source.number, dest, size, [source])
+
+    def branch(self, op: str, target: Operand):
+        if isinstance(target, Immediate):
+            if target.label is None:
+                raise EncodingError('branches to absolute addresses are not supported')
+            self.emit((b'\xe8' if op == 'call' else b'\xe9') + bytes(4), [(1, 'rel32', target.label, target.value)])
+        else:
+            self.emit_rm(b'\xff', 2 if op == 'call' else 4, target, target.size or 64, wide=False)
+
+    def jcc(self, condition: int, target: Operand):
+        if not isinstance(target, Immediate) or target.label is None:
+            raise EncodingError('conditional jumps need a label')
+        self.emit(bytes([0x0f, 0x80 + condition]) + bytes(4), [(2, 'rel32', target.label, target.value)])
+
+    def setcc(self, condition: int, dest: Operand):
+        if isinstance(dest, Immediate) or (dest.size or 8) != 8:
+            raise EncodingError('set needs a byte destination')
+        self.emit_rm(bytes([0x0f, 0x90 + condition]), 0, dest, 8)
+
+    def cmov(self, condition: int, dest: Operand, source: Operand):
+        if not isinstance(dest, Register) or isinstance(source, Immediate):
+            raise EncodingError('unsupported operands')
+        self.emit_rm(bytes([0x0f, 0x40 + condition]), dest.number, source, X86Encoder.size(dest, source), [dest])
+
+    def link(self, address: int, symbols: dict[str, int])-> bytes:
+        code = bytearray(self.code)
+        for fixup in self.fixups:
+            if fixup.label in self.labels:
+                target = address + self.labels[fixup.label]
+            elif fixup.label in symbols:
+                target = symbols[fixup.label]
+            else:
+                raise EncodingError(f'Undefined symbol {fixup.label}')
+            target += fixup.addend
+            if fixup.kind == 'rel32':
+                value = target - (address + fixup.end)
+                if not -(1 << 31) <= value < (1 << 31):
+                    raise EncodingError(f'Symbol {fixup.label} is out of range')
+                code[fixup.offset:fixup.offset + 4] = struct.pack('<i', value)
+            elif fixup.kind == 'abs32':
+                if not -(1 << 31) <= target < (1 << 31):
+                    raise EncodingError(f'Symbol {fixup.label} is out of range')
+                code[fixup.offset:fixup.offset + 4] = struct.pack('<i', target)
+            else:
+                code[fixup.offset:fixup.offset + 8] = struct.pack('<Q', target)
+        return bytes(code)
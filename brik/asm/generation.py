@@ -1,8 +1,9 @@
-import math
-import re
-from typing import Self
+from typing import IO
 
+from brik.asm.ir import InstructionList
+from brik.asm.peephole import PeepholeOptimizer
 from brik.asm.platform import Platform
+from brik.asm.regalloc import LinearScanAllocator
 from brik.asm.syntax_tree import *
 from brik.datatypes import *
 from brik.debug import Debug
@@ -10,61 +11,182 @@ from brik.definitions import *
 from brik.printer import Printer
 
 class AsmGenerator(Debug):
-    def __init__(self, platform: Platform, debug: bool = False):
+    _commutative = {'add', 'imul', 'and', 'or', 'xor'}
+
+    def __init__(self, platform: Platform, debug: bool = False, peephole: bool = True):
         super().__init__(debug)
         self.platform = platform
+        self.convention = platform.call_convention()
+        self.allocator = LinearScanAllocator(self.convention.callee_saved, self.convention.scratch)
+        self.peephole = PeepholeOptimizer(self.convention, debug=debug) if peephole else None
         self.known_idents = []
         self.text = Printer('  ')
+        self.code = InstructionList()
+        self.functions: list[InstructionList] | None = None
 
     def generate_module(self, mod: AsmModule)-> str:
         self.generate_header()
-        for (block, _) in mod.text:
-            self.generate_block(block)
+        for (block, define) in mod.text:
+            self.generate_block(block, AsmModule.arity(define))
+        self.report()
         return str(mod.data) + '\n' + str(self.text)
 
+    def write_module(self, mod: AsmModule, stream: IO[str]):
+        stream.write(str(mod.data) + '\n')
+        self.text = Printer('  ', stream)
+        self.generate_header()
+        for (block, define) in mod.text:
+            self.generate_block(block, AsmModule.arity(define))
+        self.report()
+        self.text.flush()
+
+    def generate_functions(self, mod: AsmModule)-> list[InstructionList]:
+        self.functions = []
+        entry = InstructionList('_start')
+        self.generate_entry(entry)
+        self.functions.append(entry)
+        for (block, define) in mod.text:
+            self.generate_block(block, AsmModule.arity(define))
+        self.report()
+        (functions, self.functions) = (self.functions, None)
+        return functions
+
     def generate_header(self):
         self.text.append_ln('section .text')
         self.text.append_ln('global _start')
         self.text.append_ln()
-        self.text.append_ln('_start:')
-        self.text.right()
-        self.text.append_ln('call main')
-        self.platform.make_exit(self.text, self.platform.ax)
+        self.generate_entry(self.text)
         self.text.append_ln()
 
+    def generate_entry(self, printer: Printer | InstructionList):
+        printer.append_ln('_start:')
+        printer.right()
+        printer.append_ln('call main')
+        self.platform.make_exit(printer, self.platform.ax)
+
     def generate_node(self, node: AsmNode):
         if isinstance(node, AsmBlock): self.generate_block(node)
         elif isinstance(node, AsmCall): self.generate_call(node)
+        elif isinstance(node, AsmInline): self.generate_inline(node)
+        elif isinstance(node, AsmIntrinsic): self.generate_intrinsic(node)
         elif isinstance(node, AsmLiteral): self.generate_asm(node)
         elif isinstance(node, AsmInt): self.generate_int(node)
         elif isinstance(node, AsmString): self.generate_string(node)
 
-    def generate_block(self, body: AsmBlock):
-        self.text.left()
-        label = self.sanitize_label(body.label)
-        self.text.append_ln(f'{label}:')
-        self.text.right()
-        self.platform.make_stack_frame(self.text)
-        for node in body.contents:
-            self.generate_node(node)
-        self.platform.end_stack_frame(self.text)
-        self.text.append_ln('ret')
-
-    def generate_call(self, call: AsmCall):
-        for op in call.operands:
-            self.generate_node(op)
-            self.text.append_ln(f'push {self.platform.ax}')
+    def generate_block(self, body: AsmBlock, arity: int = 0):
+        outer = self.code
+        self.code = InstructionList(self.sanitize_label(body.label))
+        for (i, node) in enumerate(body.contents):
+            if i == len(body.contents) - 1 and isinstance(node, AsmCall): self.generate_call(node, True)
+            else: self.generate_node(node)
+        self.emit_function(self.code, arity, body.locals)
+        self.code = outer
+
+    def emit_function(self, body: InstructionList, arity: int, locals: int = 0):
+        allocation = self.allocator.allocate(body)
+        convention = self.convention
+        instructions = body.instructions
+        tail = instructions[-1] if len(instructions) > 0 and instructions[-1].is_tail_call() else None
+        if tail is not None:
+            instructions = instructions[:-1]
+        func = InstructionList(body.label)
+        func.append_ln(f'{body.label}:')
+        base = convention.frame_words(arity) + locals
+        if self.is_leaf(body, locals + allocation.slot_count()):
+            func.instructions.extend(instructions)
+        else:
+            saves = allocation.save_slots(base, convention.word_size, convention.size, convention.bp)
+            convention.generate_func_open(func, arity, locals + allocation.slot_count())
+            for (reg, slot) in saves:
+                func.append('mov', slot, reg)
+            func.instructions.extend(instructions)
+            for (reg, slot) in saves:
+                func.append('mov', reg, slot)
+            convention.generate_func_teardown(func)
+        if tail is not None:
+            func.instructions.append(tail)
+        else:
+            convention.generate_return(func, arity)
+        func = func.lower(allocation.mapping(base, convention.word_size, convention.size, convention.bp))
+        if self.peephole is not None:
+            self.peephole.optimize(func)
+        if self.functions is not None:
+            self.functions.append(func)
+        else:
+            func.emit(self.text)
+
+    def is_leaf(self, body: InstructionList, slots: int)-> bool:
+        if slots > 0:
+            return False
+        frame = {'call', self.convention.bp, self.convention.sp}
+        for inst in body.instructions:
+            if inst.op == 'call' or (inst.raw and not frame.isdisjoint(inst.words())):
+                return False
+        return True
+
+    def report(self):
+        if self.peephole is not None:
+            self.peephole.report()
+
+    def generate_call(self, call: AsmCall, tail: bool = False):
         target = self.sanitize_label(call.target)
-        self.text.append_ln(f'call {target}')
+        self.convention.generate_call(self.code, target, call.operands, self.generate_node, tail)
+
+    def generate_inline(self, node: AsmInline):
+        for (slot, value) in node.bindings:
+            if isinstance(value, AsmInt) and -(1 << 31) <= value.value < (1 << 31):
+                source = f'{value.value}d'
+            else:
+                self.generate_node(value)
+                source = self.platform.ax
+            self.code.append('mov', f'{self.convention.size} {slot}', source)
+        for child in node.contents:
+            self.generate_node(child)
+
+    def generate_intrinsic(self, node: AsmIntrinsic):
+        (left, right) = node.operands
+        ax = self.platform.ax
+        op = AsmIntrinsic.operators[node.operator]
+        if op in AsmGenerator._commutative and self.immediate(left) is not None:
+            (left, right) = (right, left)
+        self.generate_node(left)
+        source = self.immediate(right)
+        if source is not None and op == 'idiv':
+            divisor = self.code.vreg()
+            self.code.append('mov', divisor, source)
+            source = divisor
+        elif source is None:
+            lhs = self.code.vreg()
+            self.code.append('mov', lhs, ax)
+            self.generate_node(right)
+            source = self.code.vreg()
+            self.code.append('mov', source, ax)
+            self.code.append('mov', ax, lhs)
+        if op == 'idiv':
+            self.code.append('cqo' if self.convention.word_size == 8 else 'cdq')
+            self.code.append('idiv', source)
+            if node.operator == '%':
+                self.code.append('mov', ax, self.platform.dx)
+        elif op == 'imul' and isinstance(source, str):
+            self.code.append('imul', ax, ax, source)
+        else:
+            self.code.append(op, ax, source)
+
+    @staticmethod
+    def immediate(node: AsmNode)-> str | None:
+        if isinstance(node, AsmInt) and -(1 << 31) <= node.value < (1 << 31):
+            return f'{node.value}d'
+        return None
 
     def generate_int(self, num: AsmInt):
-        self.text.append_ln(f'mov {self.platform.ax}, {num.value}d')
+        self.code.append('mov', self.platform.ax, f'{num.value}d')
 
     def generate_string(self, string: AsmString):
-        self.text.append_ln(f'mov {self.platform.ax}, {string.value}')
+        self.code.append('mov', self.platform.ax, string.value)
 
     def generate_asm(self, node: AsmLiteral):
-        self.text.append_ln(node.asm)
+        self.code.append_raw(node.asm)
 
-    def sanitize_label(self, label: str)-> str:
+    @staticmethod
+    def sanitize_label(label: str)-> str:
         return label.replace('+', 'add').replace('-', 'sub').replace('*', 'mul').replace('/', 'div').replace('|', 'pipe').replace('%', 'cent').replace('^', 'caret').replace('&', 'amp')
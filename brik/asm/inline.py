@@ -0,0 +1,131 @@
+from typing import Any, Callable
+
+from brik.arena import ArenaDefinition, AstArena, NodeKind
+from brik.asm.platform import Platform
+from brik.asm.regalloc import LinearScanAllocator
+from brik.asm.syntax_tree import AsmIntrinsic
+from brik.asm.template import AsmTemplate, HoleKind
+from brik.debug import Debug, TraceLevel
+from brik.definitions import CallDefinition
+from brik.syntax_tree import *
+
+class InlineBody:
+    # Reads a definition body the same way whether it is a node tree or an arena entry
+    def __init__(self, define: CallDefinition | ArenaDefinition):
+        if isinstance(define, ArenaDefinition):
+            arena = define.arena
+            block = arena.children(define.index)[0]
+            self.idents = len(arena.idents(block))
+            self.contents: list[Any] = list(arena.contents(block))
+            self.kind: Callable[[Any], NodeKind | None] = lambda index: arena.kinds[index]
+            self.text: Callable[[Any], str] = arena.name
+            self.operands: Callable[[Any], list] = arena.children
+        else:
+            self.idents = len(define.body.idents)
+            self.contents = define.body.contents
+            self.kind = AstArena.kind_of
+            self.text = lambda node: node.asm if isinstance(node, AsmMacroNode) else node.name
+            self.operands = lambda node: node.operands
+
+class InlinePolicy(Debug):
+    _control = {'call', 'ret', 'leave', 'enter'}
+
+    def __init__(self, platform: Platform, threshold: int = 8, debug: bool | int = False, max_depth: int = 32):
+        super().__init__(debug)
+        convention = platform.call_convention()
+        self.platform = platform
+        self.threshold = threshold
+        # Inlined bodies are transpiled recursively, so a chain of small callees stops being inlined at this depth
+        self.max_depth = max_depth
+        self.depth = 0
+        self.frame = LinearScanAllocator.aliases(convention.bp) | LinearScanAllocator.aliases(convention.sp) | InlinePolicy._control
+        self.arguments: set[str] = set()
+        for reg in convention.registers:
+            self.arguments |= LinearScanAllocator.aliases(reg)
+        self.decisions: dict[int, bool] = {}
+        self.bodies: dict[int, InlineBody] = {}
+        self.inlined = 0
+
+    def body(self, define: CallDefinition | ArenaDefinition)-> InlineBody:
+        body = self.bodies.get(id(define))
+        if body is None:
+            body = InlineBody(define)
+            self.bodies[id(define)] = body
+        return body
+
+    def should_inline(self, define: CallDefinition | ArenaDefinition, lookup: Callable[[str, int], CallDefinition | ArenaDefinition | None])-> bool:
+        if define.inline is False or self.depth >= self.max_depth:
+            return False
+        decision = self.decisions.get(id(define))
+        if decision is None:
+            # The cost check is local, so it runs before the walk through every callee
+            decision = define.inline is True or self.cost(define) <= self.threshold
+            decision = decision and self.is_safe(define) and not self.is_recursive(define, lookup)
+            self.decisions[id(define)] = decision
+            if decision:
+                self.v_print('Inlining {}', define.name, level=TraceLevel.TRACE)
+        if decision:
+            self.inlined += 1
+        return decision
+
+    def is_safe(self, define: CallDefinition | ArenaDefinition)-> bool:
+        body = self.body(define)
+        if body.idents > 0:
+            return False
+        templates = [AsmTemplate.compile(body.text(node)) for node in body.contents if body.kind(node) == NodeKind.ASM]
+        references = {ident for template in templates for ident in template.references}
+        forbidden = self.frame
+        if any(ident not in references for (ident, _) in define.pattern.args):
+            forbidden = forbidden | self.arguments
+        for node in body.contents:
+            kind = body.kind(node)
+            if kind == NodeKind.ASM:
+                template = AsmTemplate.compile(body.text(node))
+                for (_, kind, name) in template.holes:
+                    if kind == HoleKind.REGISTER and self.platform.register(name) in forbidden:
+                        return False
+                for part in template.parts:
+                    if ':' in part or not forbidden.isdisjoint(AsmTemplate.words(part)):
+                        return False
+            elif kind not in (NodeKind.CALL, NodeKind.NUMBER, NodeKind.STRING):
+                return False
+        return True
+
+    def is_recursive(self, define: CallDefinition | ArenaDefinition, lookup: Callable[[str, int], CallDefinition | ArenaDefinition | None])-> bool:
+        seen: set[int] = set()
+        body = self.body(define)
+        stack: list[tuple[InlineBody, Any]] = [(body, node) for node in body.contents]
+        while stack:
+            (body, node) = stack.pop()
+            if body.kind(node) != NodeKind.CALL:
+                continue
+            name = body.text(node)
+            operands = body.operands(node)
+            stack.extend((body, op) for op in operands)
+            callee = lookup(name, len(operands))
+            if callee is None and name in AsmIntrinsic.operators and len(operands) == 2:
+                continue
+            if callee is None or callee is define:
+                return True
+            if id(callee) not in seen:
+                seen.add(id(callee))
+                callee_body = self.body(callee)
+                stack.extend((callee_body, op) for op in callee_body.contents)
+        return False
+
+    def cost(self, define: CallDefinition | ArenaDefinition)-> int:
+        cost = 0
+        body = self.body(define)
+        stack: list[Any] = list(body.contents)
+        while stack:
+            node = stack.pop()
+            kind = body.kind(node)
+            if kind == NodeKind.ASM:
+                cost += len([line for line in body.text(node).split('\n') if len(line.strip()) > 0])
+            elif kind == NodeKind.CALL:
+                operands = body.operands(node)
+                cost += 1 + len(operands)
+                stack.extend(operands)
+            else:
+                cost += 1
+        return cost
@@ -0,0 +1,105 @@
+import re
+from typing import Iterator
+
+from brik.printer import Printer
+
+class VReg:
+    __slots__ = ('index',)
+    def __init__(self, index: int):
+        self.index = index
+    def __str__(self)-> str:
+        return f'%v{self.index}'
+    def __repr__(self)-> str:
+        return str(self)
+
+Operand = str | VReg
+
+class Instruction:
+    __slots__ = ('op', 'operands', 'raw')
+    _word = re.compile(r'[a-z0-9_]+')
+    def __init__(self, op: str, operands: list[Operand] | None = None, raw: bool = False):
+        self.op = op
+        self.operands = operands if operands is not None else []
+        self.raw = raw
+
+    @staticmethod
+    def parse(line: str)-> 'Instruction':
+        line = line.strip()
+        parts = line.split(None, 1)
+        if len(parts) == 1:
+            return Instruction(parts[0])
+        return Instruction(parts[0], [op.strip() for op in parts[1].split(',')])
+
+    def is_label(self)-> bool:
+        return self.op.endswith(':')
+    def is_tail_call(self)-> bool:
+        return not self.raw and self.op == 'jmp'
+    def words(self)-> set[str]:
+        return set(Instruction._word.findall(str(self).lower()))
+    def vregs(self)-> Iterator[VReg]:
+        for op in self.operands:
+            if isinstance(op, VReg):
+                yield op
+
+    def render(self, mapping: dict[int, str] | None = None)-> str:
+        if len(self.operands) == 0:
+            return self.op
+        if mapping is None:
+            operands = [str(op) for op in self.operands]
+        else:
+            operands = [mapping[op.index] if isinstance(op, VReg) else op for op in self.operands]
+        return f'{self.op} {", ".join(operands)}'
+    def __str__(self)-> str:
+        return self.render()
+    def __repr__(self)-> str:
+        return str(self)
+
+class InstructionList:
+    def __init__(self, label: str = ''):
+        self.label = label
+        self.instructions: list[Instruction] = []
+        self.vreg_count = 0
+
+    def vreg(self)-> VReg:
+        reg = VReg(self.vreg_count)
+        self.vreg_count += 1
+        return reg
+
+    def append(self, op: str, *operands: Operand):
+        self.instructions.append(Instruction(op, list(operands)))
+    def append_raw(self, asm: str):
+        for line in asm.split('\n'):
+            if len(line.strip()) > 0:
+                self.instructions.append(Instruction(line.strip(), raw=True))
+    def append_ln(self, line: str = ''):
+        for part in line.split('\n'):
+            if len(part.strip()) > 0:
+                self.instructions.append(Instruction.parse(part))
+    def right(self):
+        pass
+    def left(self):
+        pass
+
+    def lower(self, mapping: dict[int, str])-> 'InstructionList':
+        lowered = InstructionList(self.label)
+        for inst in self.instructions:
+            if inst.raw or len(inst.operands) == 0:
+                lowered.instructions.append(inst)
+            else:
+                operands = [mapping[op.index] if isinstance(op, VReg) else op for op in inst.operands]
+                lowered.instructions.append(Instruction(inst.op, operands))
+        return lowered
+
+    def emit(self, printer: Printer, mapping: dict[int, str] | None = None):
+        for inst in self.instructions:
+            if inst.is_label():
+                printer.left()
+                printer.append_ln(inst.op)
+                printer.right()
+            else:
+                printer.append_ln(inst.render(mapping))
+
+    def __len__(self)-> int:
+        return len(self.instructions)
+    def __str__(self)-> str:
+        return '\n'.join([str(inst) for inst in self.instructions])
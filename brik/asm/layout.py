@@ -0,0 +1,54 @@
+from typing import Iterable
+
+from brik.asm.platform import Platform
+from brik.patterns import Pattern
+
+class StackLayout:
+    def __init__(self, name: str, slots: dict[str, int], platform: Platform):
+        self.name = name
+        self.slots = slots
+        self.references: set[str] = set()
+        self.base = 0
+        self.used = 0
+        self.locals = 0
+        word_size = platform.word_size()
+        self.operands: dict[str, str] = {}
+        for (ident, slot) in slots.items():
+            offset = slot * word_size
+            sign = '-' if offset < 0 else '+'
+            self.operands[ident] = f'[{platform.bp}{sign}{abs(offset)}]'
+
+    @staticmethod
+    def resolve(name: str, pattern: Pattern | None, references: Iterable[str], platform: Platform)-> 'StackLayout':
+        slots = {}
+        if pattern is not None:
+            convention = platform.call_convention()
+            for (i, (ident, _)) in enumerate(pattern.args):
+                slots[ident] = convention.arg_slot(i)
+        layout = StackLayout(name, slots, platform)
+        layout.base = platform.call_convention().frame_words(len(slots))
+        for ident in references:
+            layout.bind(ident)
+        return layout
+
+    def bind(self, ident: str):
+        if ident not in self.slots:
+            raise Exception(f'Ident {ident} does not exist')
+        self.references.add(ident)
+
+    def allocate(self)-> int:
+        self.used += 1
+        self.locals = max(self.locals, self.used)
+        return -(self.base + self.used)
+    def release(self, count: int):
+        self.used -= count
+
+    def __getitem__(self, ident: str)-> int:
+        if ident not in self.slots:
+            raise Exception(f'Ident {ident} does not exist')
+        return self.slots[ident]
+    def operand(self, ident: str)-> str:
+        operand = self.operands.get(ident)
+        if operand is None:
+            raise Exception(f'Ident {ident} does not exist')
+        return operand
@@ -0,0 +1,160 @@
+import re
+from typing import Callable, Tuple
+
+from brik.asm.call_conventions import CallConvention
+from brik.asm.ir import Instruction, InstructionList
+from brik.asm.regalloc import LinearScanAllocator
+from brik.debug import Debug
+
+Match = Tuple[int, list[Instruction]]
+Rule = Callable[['PeepholeOptimizer', list[Instruction], int], Match | None]
+
+class PeepholeOptimizer(Debug):
+    _register = re.compile(r'^(r[0-9]+[dwb]?|[re]?[abcd]x|[abcd][lh]|[re]?[sd]il?|[re]?[sb]pl?)$')
+    _word = re.compile(r'[a-z0-9]+')
+    _writes = {'mov', 'lea', 'movzx', 'movsx', 'movsxd', 'pop'}
+    _reads = {'push', 'add', 'sub', 'and', 'or', 'xor', 'cmp', 'test'}
+    window = 8
+
+    def __init__(self, convention: CallConvention, rules: dict[str, Rule] | None = None, debug: bool | int = False):
+        super().__init__(debug)
+        self.convention = convention
+        self.rules = rules if rules is not None else dict(PeepholeOptimizer.default_rules)
+        self.hits = {name: 0 for name in self.rules}
+
+    def optimize(self, code: InstructionList)-> InstructionList:
+        insts = code.instructions
+        changed = True
+        while changed:
+            changed = False
+            i = 0
+            while i < len(insts):
+                for (name, rule) in self.rules.items():
+                    match = rule(self, insts, i)
+                    if match is not None:
+                        (count, replacement) = match
+                        insts[i:i + count] = replacement
+                        self.hits[name] += 1
+                        changed = True
+                        break
+                else:
+                    i += 1
+        return code
+
+    @staticmethod
+    def is_register(operand: str)-> bool:
+        return PeepholeOptimizer._register.match(operand) is not None
+    @staticmethod
+    def is_memory(operand: str)-> bool:
+        return '[' in operand
+    @staticmethod
+    def mentions(operand: str, aliases: set[str])-> bool:
+        return not aliases.isdisjoint(PeepholeOptimizer._word.findall(operand.lower()))
+    @staticmethod
+    def immediate(operand: str)-> int | None:
+        digits = operand[:-1] if operand.endswith('d') else operand
+        try:
+            return int(digits)
+        except ValueError:
+            return None
+
+    def is_dead(self, insts: list[Instruction], start: int, reg: str)-> bool:
+        aliases = LinearScanAllocator.aliases(reg)
+        for inst in insts[start:]:
+            if inst.raw or inst.is_label():
+                return False
+            elif inst.op == 'call' or inst.op == 'jmp':
+                return reg == self.convention.ax or reg in self.convention.scratch
+            elif inst.op == 'ret':
+                return reg in self.convention.scratch
+            elif inst.op in PeepholeOptimizer._writes and len(inst.operands) > 0:
+                dest = inst.operands[0]
+                if any(PeepholeOptimizer.mentions(op, aliases) for op in inst.operands[1:]):
+                    return False
+                if PeepholeOptimizer.is_memory(dest) and PeepholeOptimizer.mentions(dest, aliases):
+                    return False
+                if dest == reg:
+                    return True
+            elif inst.op == 'cqo' or inst.op == 'cdq':
+                if PeepholeOptimizer.mentions(self.convention.ax, aliases): return False
+                if reg == self.convention.dx: return True
+            elif inst.op == 'idiv':
+                if any(PeepholeOptimizer.mentions(op, aliases) for op in [self.convention.ax, self.convention.dx, *inst.operands]): return False
+            elif inst.op in PeepholeOptimizer._reads:
+                if any(PeepholeOptimizer.mentions(op, aliases) for op in inst.operands):
+                    return False
+            else:
+                return False
+        return False
+
+    def self_move(self, insts: list[Instruction], i: int)-> Match | None:
+        inst = insts[i]
+        if not inst.raw and inst.op == 'mov' and len(inst.operands) == 2 and inst.operands[0] == inst.operands[1]:
+            return (1, [])
+        return None
+
+    def push_pop(self, insts: list[Instruction], i: int)-> Match | None:
+        if i + 1 >= len(insts): return None
+        (push, pop) = insts[i:i + 2]
+        if push.raw or pop.raw or push.op != 'push' or pop.op != 'pop': return None
+        (source, dest) = (push.operands[0], pop.operands[0])
+        if source == dest:
+            return (2, [])
+        if PeepholeOptimizer.is_register(source) or PeepholeOptimizer.is_register(dest):
+            return (2, [Instruction('mov', [dest, source])])
+        return None
+
+    def push_literal(self, insts: list[Instruction], i: int)-> Match | None:
+        if i + 1 >= len(insts): return None
+        (mov, push) = insts[i:i + 2]
+        if mov.raw or push.raw or mov.op != 'mov' or push.op != 'push': return None
+        (dest, source) = mov.operands
+        if push.operands[0] != dest or not PeepholeOptimizer.is_register(dest): return None
+        value = PeepholeOptimizer.immediate(source)
+        if value is None or value < -(1 << 31) or value >= (1 << 31): return None
+        if not self.is_dead(insts, i + 2, dest): return None
+        return (2, [Instruction('push', [source])])
+
+    def move_chain(self, insts: list[Instruction], i: int)-> Match | None:
+        first = insts[i]
+        if first.raw or first.op != 'mov': return None
+        (temp, source) = first.operands
+        if not PeepholeOptimizer.is_register(temp): return None
+        if not PeepholeOptimizer.is_register(source) and PeepholeOptimizer.immediate(source) is None: return None
+        temp_aliases = LinearScanAllocator.aliases(temp)
+        source_aliases = LinearScanAllocator.aliases(source) if PeepholeOptimizer.is_register(source) else set()
+        for j in range(i + 1, min(i + 1 + PeepholeOptimizer.window, len(insts))):
+            inst = insts[j]
+            if inst.raw or inst.op != 'mov': return None
+            (dest, value) = inst.operands
+            if PeepholeOptimizer.mentions(dest, temp_aliases): return None
+            if value == temp:
+                if PeepholeOptimizer.is_memory(dest) and not PeepholeOptimizer.is_register(source): return None
+                if not self.is_dead(insts, j + 1, temp): return None
+                moved = [] if dest == source else [Instruction('mov', [dest, source])]
+                return (j - i + 1, insts[i + 1:j] + moved)
+            if PeepholeOptimizer.mentions(value, temp_aliases) or PeepholeOptimizer.mentions(dest, source_aliases): return None
+        return None
+
+    def empty_frame(self, insts: list[Instruction], i: int)-> Match | None:
+        (bp, sp) = (self.convention.bp, self.convention.sp)
+        prologue = [f'push {bp}', f'mov {bp}, {sp}']
+        epilogue = [f'mov {sp}, {bp}', f'pop {bp}']
+        lines = [None if inst.raw else str(inst) for inst in insts[i:i + 5]]
+        if lines[:4] == prologue + epilogue:
+            return (4, [])
+        if len(lines) == 5 and lines[:2] == prologue and lines[2] is not None and lines[2].startswith(f'sub {sp}, ') and lines[3:] == epilogue:
+            return (5, [])
+        return None
+
+    def report(self):
+        hits = ', '.join([f'{name}: {count}' for (name, count) in self.hits.items() if count > 0])
+        self.v_print('Peephole rewrites: {}', hits if len(hits) > 0 else 'none')
+
+    default_rules: dict[str, Rule] = {
+        'self_move': self_move,
+        'push_pop': push_pop,
+        'push_literal': push_literal,
+        'move_chain': move_chain,
+        'empty_frame': empty_frame,
+    }
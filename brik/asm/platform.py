@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from enum import Enum
 from typing import Self
 
+from brik.asm.call_conventions import CallConvention, CdeclCallConvention, MicrosoftCallConvention, SystemVCallConvention
 from brik.printer import Printer
 
 class Syscall(Enum):
@@ -35,6 +36,21 @@ class Platform(ABC):
     @abstractmethod
     def assembler_format(self)-> str:
         pass
+    @abstractmethod
+    def call_convention(self)-> CallConvention:
+        pass
+    @abstractmethod
+    def rodata_section(self)-> str:
+        pass
+    @abstractmethod
+    def executable_suffix(self)-> str:
+        pass
+    @abstractmethod
+    def linker_command(self, obj_paths: list[str], out_path: str)-> list[str]:
+        pass
+
+    def assembler_command(self, asm_path: str, obj_path: str)-> list[str]:
+        return ['nasm', '-f', self.assembler_format(), '-o', obj_path, asm_path]
 
     @abstractmethod
     def make_syscall(self, printer: Printer, syscall: Syscall, *data):
@@ -75,7 +91,13 @@ def get_platform(platform: CompilerPlatform)-> Platform:
         raise Exception('Could not recognize platform')
 
 class PlatformLinux(Platform):
-    pass
+    def rodata_section(self)-> str:
+        return '.rodata'
+    def executable_suffix(self)-> str:
+        return ''
+    def linker_command(self, obj_paths: list[str], out_path: str)-> list[str]:
+        emulation = ['-m', 'elf_i386'] if self.word_size() == 4 else []
+        return ['ld', *emulation, '-e', '_start', '-o', out_path, *obj_paths]
 
 class PlatformLinux32(PlatformLinux):
     def word_size(self)-> int:
@@ -84,6 +106,8 @@ class PlatformLinux32(PlatformLinux):
         return 'e'
     def assembler_format(self)-> str:
         return 'elf32'
+    def call_convention(self)-> CallConvention:
+        return CdeclCallConvention(self.word_size(), self.reg_prefix())
 
     def make_syscall(self, printer: Printer, syscall: Syscall, *data):
         if syscall == Syscall.EXIT:
@@ -99,6 +123,8 @@ class PlatformLinux64(PlatformLinux):
         return 'r'
     def assembler_format(self)-> str:
         return 'elf64'
+    def call_convention(self)-> CallConvention:
+        return SystemVCallConvention(self.word_size(), self.reg_prefix())
 
     def make_syscall(self, printer: Printer, syscall: Syscall, *data):
         if syscall == Syscall.EXIT:
@@ -108,7 +134,12 @@ class PlatformLinux64(PlatformLinux):
         printer.append_ln('syscall')
 
 class PlatformWin(Platform):
-    pass
+    def rodata_section(self)-> str:
+        return '.rdata'
+    def executable_suffix(self)-> str:
+        return '.exe'
+    def linker_command(self, obj_paths: list[str], out_path: str)-> list[str]:
+        return ['link', '/SUBSYSTEM:CONSOLE', '/ENTRY:_start', f'/OUT:{out_path}', *obj_paths]
 
 class PlatformWin32(PlatformWin):
     def word_size(self)-> int:
@@ -117,6 +148,8 @@ class PlatformWin32(PlatformWin):
         return 'e'
     def assembler_format(self)-> str:
         return 'win32'
+    def call_convention(self)-> CallConvention:
+        return CdeclCallConvention(self.word_size(), self.reg_prefix())
 
     def make_syscall(self, printer: Printer, syscall: Syscall, *data):
         if syscall == Syscall.EXIT:
@@ -132,6 +165,8 @@ class PlatformWin64(PlatformWin):
         return 'r'
     def assembler_format(self)-> str:
         return 'win64'
+    def call_convention(self)-> CallConvention:
+        return MicrosoftCallConvention(self.word_size(), self.reg_prefix())
 
     def make_syscall(self, printer: Printer, syscall: Syscall, *data):
         if syscall == Syscall.EXIT:
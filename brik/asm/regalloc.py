@@ -0,0 +1,122 @@
+import re
+from bisect import bisect_right
+
+from brik.asm.ir import InstructionList
+
+class Interval:
+    __slots__ = ('vreg', 'start', 'end', 'across_call', 'across_asm', 'location')
+    def __init__(self, vreg: int, start: int):
+        self.vreg = vreg
+        self.start = start
+        self.end = start
+        self.across_call = False
+        self.across_asm = False
+        self.location: str | int | None = None
+
+class Allocation:
+    def __init__(self, intervals: list[Interval], saved: list[str], spill_count: int):
+        self.intervals = intervals
+        self.saved = saved
+        self.spill_count = spill_count
+
+    def slot_count(self)-> int:
+        return len(self.saved) + self.spill_count
+    def save_slots(self, base: int, word_size: int, size: str, bp: str)-> list[tuple[str, str]]:
+        return [(reg, f'{size} [{bp}-{(base + i + 1) * word_size}]') for (i, reg) in enumerate(self.saved)]
+    def mapping(self, base: int, word_size: int, size: str, bp: str)-> dict[int, str]:
+        mapping = {}
+        for interval in self.intervals:
+            if isinstance(interval.location, str):
+                mapping[interval.vreg] = interval.location
+            else:
+                mapping[interval.vreg] = f'{size} [{bp}-{(base + len(self.saved) + interval.location + 1) * word_size}]'
+        return mapping
+
+class LinearScanAllocator:
+    _word = re.compile(r'[a-z0-9]+')
+
+    def __init__(self, callee_saved: list[str], scratch: list[str]):
+        self.callee_saved = callee_saved
+        self.scratch = scratch
+
+    @staticmethod
+    def aliases(reg: str)-> set[str]:
+        if reg[1:].isdigit():
+            return {reg, f'{reg}d', f'{reg}w', f'{reg}b'}
+        base = reg[1:]
+        low = f'{base[0]}l' if base[1] == 'x' else f'{base}l'
+        aliases = {f'r{base}', f'e{base}', base, low}
+        if base[1] == 'x': aliases.add(f'{base[0]}h')
+        return aliases
+
+    def clobbered(self, code: InstructionList)-> set[str]:
+        words = set()
+        for inst in code.instructions:
+            if inst.raw: words.update(LinearScanAllocator._word.findall(inst.op.lower()))
+        return {reg for reg in self.callee_saved if not words.isdisjoint(LinearScanAllocator.aliases(reg))}
+
+    def intervals(self, code: InstructionList)-> list[Interval]:
+        intervals: dict[int, Interval] = {}
+        calls = []
+        asm = []
+        for (i, inst) in enumerate(code.instructions):
+            if inst.raw: asm.append(i)
+            elif inst.op == 'call': calls.append(i)
+            for reg in inst.vregs():
+                if reg.index in intervals: intervals[reg.index].end = i
+                else: intervals[reg.index] = Interval(reg.index, i)
+        for interval in intervals.values():
+            interval.across_call = LinearScanAllocator.crosses(calls, interval)
+            interval.across_asm = LinearScanAllocator.crosses(asm, interval)
+        return sorted(intervals.values(), key=lambda interval: interval.start)
+
+    @staticmethod
+    def crosses(points: list[int], interval: Interval)-> bool:
+        index = bisect_right(points, interval.start)
+        return index < len(points) and points[index] < interval.end
+
+    def allocate(self, code: InstructionList)-> Allocation:
+        intervals = self.intervals(code)
+        free = self.scratch + self.callee_saved
+        free_slots: list[tuple[int, int]] = []
+        active: list[Interval] = []
+        used: set[str] = set()
+        spill_count = 0
+
+        def spill(interval: Interval):
+            nonlocal spill_count
+            reusable = [i for (i, (_, end)) in enumerate(free_slots) if end <= interval.start]
+            if reusable:
+                interval.location = free_slots.pop(reusable[-1])[0]
+            else:
+                interval.location = spill_count
+                spill_count += 1
+
+        for interval in intervals:
+            for done in [a for a in active if a.end <= interval.start]:
+                active.remove(done)
+                if isinstance(done.location, str): free.append(done.location)
+                else: free_slots.append((done.location, done.end))
+            if interval.across_asm:
+                spill(interval)
+            else:
+                allowed = self.callee_saved if interval.across_call else self.scratch + self.callee_saved
+                reg = next((r for r in allowed if r in free), None)
+                if reg is not None:
+                    free.remove(reg)
+                else:
+                    victims = [a for a in active if isinstance(a.location, str) and a.location in allowed and a.end > interval.end]
+                    if victims:
+                        victim = max(victims, key=lambda a: a.end)
+                        reg = victim.location
+                        spill(victim)
+                if reg is None:
+                    spill(interval)
+                else:
+                    interval.location = reg
+                    used.add(reg)
+            active.append(interval)
+
+        used.update(self.clobbered(code))
+        saved = [reg for reg in self.callee_saved if reg in used]
+        return Allocation(intervals, saved, spill_count)
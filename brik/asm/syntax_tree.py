@@ -6,22 +6,49 @@ from brik.definitions import CallDefinition
 from brik.printer import Printer
 
 class DataSection:
-    def __init__(self):
-        self.data = {}
+    def __init__(self, section: str = '.rodata'):
+        self.section = section
+        self.data: dict[str, str] = {}
+        self.index: dict[str, str] = {}
         self.counter = 1
-        pass
     def __str__(self)-> str:
         p = Printer('  ')
-        p.append_ln('section .data')
+        p.append_ln(f'section {self.section}')
         for name in self.data:
-            p.append_ln(f'{name}:\tdb "{self.data[name]}",10')
+            encoded = self.data[name].encode('utf-8')
+            p.append_ln(f'{name}:\tdb {DataSection.escape(encoded)}')
+            p.append_ln(f'{DataSection.length(name)}\tequ {len(encoded)}')
         return str(p)
 
+    @staticmethod
+    def escape(encoded: bytes)-> str:
+        parts = []
+        run = ''
+        for byte in encoded:
+            if 0x20 <= byte < 0x7f and byte != 0x22:
+                run += chr(byte)
+                continue
+            if len(run) > 0:
+                parts.append(f'"{run}"')
+                run = ''
+            parts.append(str(byte))
+        if len(run) > 0:
+            parts.append(f'"{run}"')
+        parts.append('0')
+        return ','.join(parts)
+    @staticmethod
+    def length(name: str)-> str:
+        return f'{name}_len'
+
     def add(self, name: str, val: str):
         self.data[name] = val
+        self.index.setdefault(val, name)
     def add_autoname(self, val: str)-> str:
-        name = f'auto_str_{self.counter}'
-        self.add(name, val)
+        name = self.index.get(val)
+        if name is None:
+            name = f'auto_str_{self.counter}'
+            self.counter += 1
+            self.add(name, val)
         return name
 
 class AsmNode(ABC):
@@ -62,10 +89,11 @@ class AsmString(AsmExpr):
         printer.append(f'"{self.value}"')
 
 class AsmBlock(AsmExpr):
-    def __init__(self, name: str, contents: list[AsmNode]):
+    def __init__(self, name: str, contents: list[AsmNode], locals: int = 0):
         super().__init__(DataType.UNKNOWN if len(contents) < 1 else contents[-1].data_type())
         self.label = name
         self.contents = contents
+        self.locals = locals
     def __pretty_print__(self, printer: Printer):
         printer.append_ln(f'{self.label}:')
         printer.right()
@@ -86,16 +114,76 @@ class AsmCall(AsmExpr):
                 printer.append(' ')
         printer.append_ln(')')
 
+class AsmIntrinsic(AsmExpr):
+    operators = {'+': 'add', '-': 'sub', '*': 'imul', '/': 'idiv', '%': 'idiv', '^': 'xor', '&': 'and', '|': 'or'}
+
+    def __init__(self, operator: str, operands: list[AsmExpr]):
+        super().__init__(DataType.INT)
+        self.operator = operator
+        self.operands = operands
+    def __pretty_print__(self, printer: Printer):
+        printer.append(f'Intrinsic {self.operator} (')
+        for i in range(0, len(self.operands)):
+            printer.print(self.operands[i])
+            if i < len(self.operands) - 1:
+                printer.append(' ')
+        printer.append_ln(')')
+
+class AsmInline(AsmExpr):
+    def __init__(self, name: str, bindings: list[Tuple[str, AsmExpr]], contents: list[AsmNode]):
+        super().__init__(DataType.UNKNOWN if len(contents) < 1 else contents[-1].data_type())
+        self.name = name
+        self.bindings = bindings
+        self.contents = contents
+    def __pretty_print__(self, printer: Printer):
+        printer.append_ln(f'Inline {self.name}:')
+        printer.right()
+        for (slot, value) in self.bindings:
+            printer.append(f'{slot} = ')
+            printer.print(value)
+            printer.append_ln()
+        for child in self.contents:
+            printer.print(child)
+        printer.left()
+
 class AsmModule:
-    def __init__(self):
-        self.data = DataSection()
-        self.text: list[Tuple[AsmBlock, CallDefinition]] = []
-    def get_block(self, label: str)-> Tuple[AsmBlock, CallDefinition] | None:
-        for block in self.text:
-            if block[0].label == label: return block
-        return None
+    def __init__(self, section: str = '.rodata'):
+        self.data = DataSection(section)
+        self.text: list[Tuple[AsmBlock | None, CallDefinition]] = []
+        self.symbols: dict[str, int] = {}
+        self.arities: dict[Tuple[str, int], int] = {}
+        self.labels: list[str] = []
+
+    @staticmethod
+    def arity(define: CallDefinition)-> int:
+        return 0 if define.pattern is None else len(define.pattern.args)
+
+    def declare(self, define: CallDefinition)-> int:
+        arity = AsmModule.arity(define)
+        if (define.name, arity) in self.arities:
+            raise Exception(f'Callable with name {define.name} and {arity} operands is defined more than once')
+        index = len(self.text)
+        self.text.append((None, define))
+        # Overloads share a name, so every definition after the first gets its arity in the label
+        self.labels.append(define.name if define.name not in self.symbols else f'{define.name}@{arity}')
+        self.symbols.setdefault(define.name, index)
+        self.arities[(define.name, arity)] = index
+        return index
+    def lookup(self, label: str, arity: int | None = None)-> int | None:
+        if arity is not None and (index := self.arities.get((label, arity))) is not None:
+            return index
+        return self.symbols.get(label)
+    def get_block(self, label: str, arity: int | None = None)-> Tuple[AsmBlock | None, CallDefinition] | None:
+        index = self.lookup(label, arity)
+        return None if index is None else self.text[index]
+    def label(self, label: str, arity: int | None = None)-> str | None:
+        index = self.lookup(label, arity)
+        return None if index is None else self.labels[index]
+    def define_block(self, index: int, block: AsmBlock):
+        block.label = self.labels[index]
+        self.text[index] = (block, self.text[index][1])
     def add_block(self, block: AsmBlock, define: CallDefinition):
-        self.text.append((block, define))
+        self.define_block(self.declare(define), block)
     def __pretty_print__(self, printer: Printer):
         printer.append_ln(str(self.data))
         for block in self.text:
@@ -0,0 +1,59 @@
+import re
+from enum import Enum
+from typing import Tuple
+
+from brik.asm.layout import StackLayout
+from brik.asm.platform import Platform
+
+class HoleKind(Enum):
+    REGISTER = 0
+    REFERENCE = 1
+
+class AsmTemplate:
+    _hole_re = re.compile(r'%([a-z]{2})|\{([a-z_+\-*^%&|/][0-9a-z_+\-*^%&|/]*)\}')
+    _word_re = re.compile(r'[a-z0-9_]+')
+    _cache: dict[str, 'AsmTemplate'] = {}
+
+    def __init__(self, source: str):
+        self.source = source
+        self.parts: list[str] = []
+        self.holes: list[Tuple[int, HoleKind, str]] = []
+        self.references: list[str] = []
+        text = '\n'.join([line for line in [line.strip() for line in source.split('\n')] if len(line) > 0])
+        pos = 0
+        for match in AsmTemplate._hole_re.finditer(text):
+            self.parts.append(text[pos:match.start()])
+            if match.group(1) is not None:
+                self.holes.append((len(self.parts), HoleKind.REGISTER, match.group(1)))
+            else:
+                self.holes.append((len(self.parts), HoleKind.REFERENCE, match.group(2)))
+                self.references.append(match.group(2))
+            self.parts.append('')
+            pos = match.end()
+        self.parts.append(text[pos:])
+
+    @staticmethod
+    def words(text: str)-> set[str]:
+        return set(AsmTemplate._word_re.findall(text.lower()))
+
+    @staticmethod
+    def compile(source: str)-> 'AsmTemplate':
+        template = AsmTemplate._cache.get(source)
+        if template is None:
+            template = AsmTemplate(source)
+            AsmTemplate._cache[source] = template
+        return template
+
+    def instantiate(self, platform: Platform, layout: StackLayout)-> str:
+        if len(self.holes) == 0:
+            return self.parts[0]
+        parts = self.parts.copy()
+        for (index, kind, name) in self.holes:
+            if kind == HoleKind.REGISTER:
+                reg = platform.register(name)
+                if reg is None:
+                    raise Exception(f'Could not get register from name {name} in {self.source}')
+                parts[index] = reg
+            else:
+                parts[index] = layout.operand(name)
+        return ''.join(parts)
@@ -0,0 +1,64 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from brik.asm.platform import Platform
+from brik.debug import Debug, TraceLevel
+
+class ToolchainError(Exception):
+    def __init__(self, command: list[str], returncode: int | None, output: str):
+        status = 'could not be started' if returncode is None else f'failed with exit code {returncode}'
+        super().__init__(f'{command[0]} {status}' + (f':\n{output}' if len(output) > 0 else ''))
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+
+class BuildJob:
+    def __init__(self, platform: Platform, asm_path: str, obj_path: str, out_path: str):
+        self.platform = platform
+        self.asm_path = asm_path
+        self.obj_path = obj_path
+        self.out_path = out_path
+
+class Toolchain(Debug):
+    def __init__(self, jobs: int | None = None, debug: bool | int = False):
+        super().__init__(debug)
+        self.jobs = max(1, jobs if jobs is not None else os.cpu_count() or 1)
+        self.diagnostics: list[str] = []
+
+    def run(self, command: list[str])-> str:
+        self.v_print(lambda: ' '.join(command), level=TraceLevel.TRACE)
+        try:
+            result = subprocess.run(command, capture_output=True, text=True)
+        except OSError as error:
+            raise ToolchainError(command, None, str(error)) from None
+        output = (result.stdout + result.stderr).strip()
+        if result.returncode != 0:
+            raise ToolchainError(command, result.returncode, output)
+        if len(output) > 0:
+            self.diagnostics.append(output)
+            self.v_print(output)
+        return output
+
+    def assemble(self, platform: Platform, asm_path: str, obj_path: str)-> str:
+        self.run(platform.assembler_command(asm_path, obj_path))
+        return obj_path
+    def link(self, platform: Platform, obj_paths: list[str], out_path: str)-> str:
+        self.run(platform.linker_command(obj_paths, out_path))
+        return out_path
+
+    def build_one(self, job: BuildJob)-> str:
+        self.assemble(job.platform, job.asm_path, job.obj_path)
+        return self.link(job.platform, [job.obj_path], job.out_path)
+
+    def build(self, jobs: list[BuildJob])-> list[str]:
+        if self.jobs == 1 or len(jobs) <= 1:
+            return [self.build_one(job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(self.build_one, job) for job in jobs]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        for error in errors[1:]:
+            self.v_print('{}', error)
+        if len(errors) > 0:
+            raise errors[0]
+        return [future.result() for future in futures]
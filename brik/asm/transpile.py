@@ -1,52 +1,77 @@
-import re
+from typing import Callable, Iterable, Iterator
 
+from brik.arena import ArenaDefinition, AstArena, NodeKind
+from brik.asm.inline import InlinePolicy
+from brik.asm.layout import StackLayout
 from brik.asm.platform import Platform
 from brik.asm.syntax_tree import *
-from brik.debug import Debug
+from brik.asm.template import AsmTemplate
+from brik.debug import Debug, TraceLevel
 from brik.definitions import CallDefinition
 from brik.patterns import Pattern
 from brik.syntax_tree import *
 
-class StackFrame:
-    def __init__(self, parent: Self | None = None):
-        self.parent = parent
-        self.contents = {}
-        self.offset = 2
-    def __getitem__(self, name: str)-> int:
-        if name in self.contents:
-            return self.contents[name]
-        elif self.parent:
-            return self.parent[name]
-        else:
-            raise Exception(f'Ident {name} does not exist')
-    def push(self, name: str, val: int | None = None):
-        if val is None:
-            val = self.offset
-            self.offset += 1
-        if name not in self.contents and self.parent is not None and self.parent.contains(name):
-            self.parent.push(name, val)
-        else:
-            self.contents[name] = val
-    def push_pattern(self, pattern: Pattern):
-        for (name, _) in pattern.args:
-            self.push(name)
-
-    def contains(self, name: str)-> bool:
-        return name in self.contents or (self.parent is not None and self.parent.contains(name))
-
 class Transpiler(Debug):
-    def __init__(self, platform: Platform, debug: bool = False):
+    def __init__(self, platform: Platform, debug: bool = False, inline_threshold: int = 0):
         super().__init__(debug)
         self.platform = platform
-        self.stack_frame = StackFrame(None)
+        self.layouts: dict[str, StackLayout] = {}
+        self.layout = StackLayout('', {}, platform)
+        self.frame = self.layout
+        self.inliner = InlinePolicy(platform, inline_threshold, debug)
+        self.inline_defines: dict[int, CallDefinition] = {}
+        self.pending: dict[int, Tuple[Callable[[], AsmBlock], Callable[[], Iterable[Tuple[str, int]]]]] = {}
 
     def transpile(self, module: Module)-> AsmModule:
-        self.asm_mod = AsmModule()
+        self.asm_mod = AsmModule(self.platform.rodata_section())
         for define in [d for d in module.defines if isinstance(d, CallDefinition)]:
-            self.asm_mod.add_block(self.transpile_define(define), define)
+            self.declare(define, lambda define=define: self.transpile_define(define), lambda define=define: self.calls(define.body.contents))
         define = CallDefinition('main', module.entry_point)
-        self.asm_mod.add_block(self.transpile_define(define), define)
+        self.declare(define, lambda: self.transpile_define(define), lambda: self.calls(define.body.contents))
+        mod = self.transpile_declared()
+        if self.inliner.inlined > 0:
+            self.v_print('Inlined {} calls', self.inliner.inlined)
+        return mod
+
+    def declare(self, define: CallDefinition, transpile: Callable[[], AsmBlock], calls: Callable[[], Iterable[Tuple[str, int]]]):
+        self.pending[self.asm_mod.declare(define)] = (transpile, calls)
+    def transpile_declared(self)-> AsmModule:
+        for index in self.transpile_order():
+            self.asm_mod.define_block(index, self.pending.pop(index)[0]())
         return self.asm_mod
+    def transpile_order(self)-> list[int]:
+        # Callees are transpiled before their callers so a call can take the callee's type.
+        # A callee that is still open further up the walk is part of a cycle and stays UNKNOWN
+        order = []
+        done: dict[int, bool] = {}
+        for root in range(0, len(self.asm_mod.text)):
+            if root in done:
+                continue
+            done[root] = False
+            stack = [(root, self.callees(root))]
+            while stack:
+                (index, callees) = stack[-1]
+                callee = next(callees, None)
+                if callee is None:
+                    stack.pop()
+                    done[index] = True
+                    order.append(index)
+                elif callee not in done:
+                    done[callee] = False
+                    stack.append((callee, self.callees(callee)))
+        return order
+    def callees(self, index: int)-> Iterator[int]:
+        for (name, arity) in self.pending[index][1]():
+            callee = self.asm_mod.lookup(name, arity)
+            if callee is not None:
+                yield callee
+    def calls(self, nodes: list[Node])-> Iterator[Tuple[str, int]]:
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, CallNode):
+                yield (node.name, len(node.operands))
+                stack.extend(reversed(node.operands))
 
     def transpile_node(self, node: Node)-> AsmNode | None:
         if isinstance(node, CallNode): return self.transpile_call(node)
@@ -57,16 +82,21 @@ class Transpiler(Debug):
         else: raise Exception(f'Could not transpile node of type {type(node)}')
 
     def transpile_define(self, define: CallDefinition)-> AsmBlock:
-        self.stack_frame = StackFrame(self.stack_frame)
-        self.stack_frame.push_pattern(define.pattern)
+        asm = [node.asm for node in define.body.contents if isinstance(node, AsmMacroNode)]
+        self.enter_layout(define.name, define.pattern, asm)
         nodes = [self.transpile_node(node) for node in define.body.contents]
-        if self.stack_frame.parent is not None:
-            self.stack_frame = self.stack_frame.parent
         return AsmBlock(
             define.name,
-            [node for node in nodes if node is not None]
+            [node for node in nodes if node is not None],
+            self.frame.locals
         )
 
+    def enter_layout(self, name: str, pattern: Pattern | None, asm: list[str]):
+        references = [ident for source in asm for ident in AsmTemplate.compile(source).references]
+        self.layout = StackLayout.resolve(name, pattern, references, self.platform)
+        self.layouts.setdefault(name, self.layout)
+        self.frame = self.layout
+
     def transpile_expr(self, node: Node)-> AsmExpr:
         if isinstance(node, CallNode): return self.transpile_call(node)
         elif isinstance(node, NumberNode): return self.transpile_number(node)
@@ -77,47 +107,121 @@ class Transpiler(Debug):
     def transpile_string(self, node: StringNode)-> AsmString:
         name = self.asm_mod.data.add_autoname(node.value)
         return AsmString(name)
-    def transpile_call(self, node: CallNode)-> AsmCall:
-        target = self.asm_mod.get_block(node.name)
-        if not target:
-            raise Exception(f'Callable with name {node.name} not found')
-        exprs = []
-        if len(node.operands):
-            exprs = [self.transpile_expr(op) for op in node.operands]
-            if not self.check_pattern(target[1].pattern, exprs):
-                raise Exception(f'Callable with name {node.name} does not match operands provided')
-        return AsmCall(node.name, target[0].data_type(), exprs)
+    def transpile_call(self, node: CallNode)-> AsmCall | AsmInline | AsmIntrinsic:
+        if self.is_intrinsic(node.name, len(node.operands)):
+            return self.make_intrinsic(node.name, [self.transpile_expr(op) for op in node.operands])
+        target = self.find_callable(node.name, len(node.operands))
+        if self.inliner.should_inline(target[1], self.find_define):
+            return self.transpile_inline(node, self.inline_define(target[1]))
+        exprs = [self.transpile_expr(op) for op in node.operands]
+        return self.make_call(node.name, target, exprs)
+    def transpile_inline(self, node: CallNode, define: CallDefinition)-> AsmInline:
+        slots = {ident: self.frame.allocate() for (ident, _) in define.pattern.args}
+        exprs = [self.transpile_expr(op) for op in node.operands]
+        if len(exprs) and not self.check_pattern(define.pattern, exprs):
+            raise Exception(f'Callable with name {node.name} does not match operands provided')
+        layout = self.layout
+        self.layout = StackLayout(define.name, slots, self.platform)
+        self.inliner.depth += 1
+        nodes = [self.transpile_node(child) for child in define.body.contents]
+        self.inliner.depth -= 1
+        bindings = [(self.layout.operand(ident), expr) for ((ident, _), expr) in zip(define.pattern.args, exprs)]
+        self.layout = layout
+        self.frame.release(len(slots))
+        return AsmInline(define.name, bindings, [child for child in nodes if child is not None])
+    def inline_define(self, define: CallDefinition | ArenaDefinition)-> CallDefinition:
+        # Arena definitions are only rebuilt as nodes once a call site actually inlines them
+        if not isinstance(define, ArenaDefinition):
+            return define
+        converted = self.inline_defines.get(id(define))
+        if converted is None:
+            converted = define.arena.to_node(define.index)
+            self.inline_defines[id(define)] = converted
+        return converted
+    def find_define(self, name: str, arity: int)-> CallDefinition | None:
+        index = self.asm_mod.lookup(name, arity)
+        return None if index is None else self.asm_mod.text[index][1]
+    def find_callable(self, name: str, arity: int | None = None)-> Tuple[AsmBlock | None, CallDefinition]:
+        index = self.asm_mod.lookup(name, arity)
+        if index is None:
+            raise Exception(f'Callable with name {name} not found')
+        return self.asm_mod.text[index]
+    def is_intrinsic(self, name: str, arity: int)-> bool:
+        return name in AsmIntrinsic.operators and arity == 2 and self.asm_mod.lookup(name) is None
+    def make_intrinsic(self, name: str, exprs: list[AsmExpr])-> AsmIntrinsic:
+        for expr in exprs:
+            if expr.data_type() is not DataType.INT and expr.data_type() is not DataType.UNKNOWN:
+                raise Exception(f'Operator {name} expects int operands')
+        return AsmIntrinsic(name, exprs)
+    def make_call(self, name: str, target: Tuple[AsmBlock | None, CallDefinition], exprs: list[AsmExpr])-> AsmCall:
+        if len(exprs) and not self.check_pattern(target[1].pattern, exprs):
+            raise Exception(f'Callable with name {name} does not match operands provided')
+        return AsmCall(self.asm_mod.label(name, len(exprs)), DataType.UNKNOWN if target[0] is None else target[0].data_type(), exprs)
 
-    _asm_re_register = re.compile(r'%([a-z]{2})')
-    _asm_re_reference = re.compile(r'\{([a-z_+\-*^%&|/][0-9a-z_+\-*^%&|/]*)\}')
     def transpile_asm(self, node: AsmMacroNode)-> AsmLiteral:
-        self.v_print(f'Generating Asm Node')
-        asm = ''
-        for line in node.asm.split('\n'):
-            line = line.strip()
-            if len(line) == 0:
-                continue
-            if matches := Transpiler._asm_re_register.finditer(line):
-                for match in matches:
-                    self.v_print(f'Handling register ref from "{line}"')
-                    idnt = match.expand('\\1')
-                    self.v_print(f'Matched on {idnt}')
-                    reg = self.platform.register(idnt)
-                    if reg is None:
-                        raise Exception(f'Could not get register from name {idnt} in {node.asm}')
-                    line = f'{line[:match.start()]}{reg}{line[match.end():]}'
-            if matches := Transpiler._asm_re_reference.finditer(line):
-                for match in matches:
-                    offset = self.stack_frame[match.expand('\\1')] * self.platform.word_size()
-                    sign = '-' if offset < 0 else '+'
-                    line = f'{line[:match.start()]}[{self.platform.bp}{sign}{abs(offset)}]{line[match.end():]}'
-            if len(asm) > 0: asm += '\n'
-            asm += line
-        return AsmLiteral(asm)
+        return self.transpile_asm_source(node.asm)
+    def transpile_asm_source(self, source: str)-> AsmLiteral:
+        self.v_print('Generating Asm Node', level=TraceLevel.TRACE)
+        return AsmLiteral(AsmTemplate.compile(source).instantiate(self.platform, self.layout))
+
+    def transpile_arena(self, arena: AstArena)-> AsmModule:
+        self.asm_mod = AsmModule(self.platform.rodata_section())
+        for index in arena.idents(arena.root):
+            if arena.kinds[index] == NodeKind.CALL_DEF:
+                define = ArenaDefinition(arena, index)
+                body = arena.children(index)[0]
+                self.declare(define, lambda define=define, body=body: self.transpile_arena_define(arena, define.name, define.pattern, body), lambda body=body: self.arena_calls(arena, body))
+        define = CallDefinition('main', BlockNode([]))
+        self.declare(define, lambda: self.transpile_arena_define(arena, define.name, define.pattern, arena.root), lambda: self.arena_calls(arena, arena.root))
+        return self.transpile_declared()
+
+    def arena_calls(self, arena: AstArena, body: int)-> Iterator[Tuple[str, int]]:
+        stack = list(reversed(arena.contents(body)))
+        while stack:
+            index = stack.pop()
+            if arena.kinds[index] == NodeKind.CALL:
+                operands = arena.children(index)
+                yield (arena.name(index), len(operands))
+                stack.extend(reversed(operands))
+
+    def transpile_arena_define(self, arena: AstArena, name: str, pattern: Pattern, body: int)-> AsmBlock:
+        asm = [arena.name(index) for index in arena.contents(body) if arena.kinds[index] == NodeKind.ASM]
+        self.enter_layout(name, pattern, asm)
+        nodes = [self.transpile_arena_node(arena, index) for index in arena.contents(body)]
+        return AsmBlock(
+            name,
+            [node for node in nodes if node is not None],
+            self.frame.locals
+        )
+
+    def transpile_arena_node(self, arena: AstArena, index: int)-> AsmNode | None:
+        kind = arena.kinds[index]
+        if kind == NodeKind.CALL: return self.transpile_arena_call(arena, index)
+        elif kind == NodeKind.ASM: return self.transpile_asm_source(arena.name(index))
+        elif kind == NodeKind.NUMBER: return AsmInt(arena.number(index))
+        elif kind == NodeKind.STRING: return AsmString(self.asm_mod.data.add_autoname(arena.name(index)))
+        elif kind == NodeKind.REFERENCE: return None
+        else: raise Exception(f'Could not transpile node of type {arena.kind(index).name}')
+    def transpile_arena_expr(self, arena: AstArena, index: int)-> AsmExpr:
+        kind = arena.kinds[index]
+        if kind == NodeKind.CALL: return self.transpile_arena_call(arena, index)
+        elif kind == NodeKind.NUMBER: return AsmInt(arena.number(index))
+        elif kind == NodeKind.STRING: return AsmString(self.asm_mod.data.add_autoname(arena.name(index)))
+        else: raise Exception('Could not transpile expression')
+    def transpile_arena_call(self, arena: AstArena, index: int)-> AsmCall | AsmInline | AsmIntrinsic:
+        name = arena.name(index)
+        operands = arena.children(index)
+        if self.is_intrinsic(name, len(operands)):
+            return self.make_intrinsic(name, [self.transpile_arena_expr(arena, op) for op in operands])
+        target = self.find_callable(name, len(operands))
+        if self.inliner.should_inline(target[1], self.find_define):
+            return self.transpile_inline(arena.to_node(index), self.inline_define(target[1]))
+        exprs = [self.transpile_arena_expr(arena, op) for op in operands]
+        return self.make_call(name, target, exprs)
 
     def check_pattern(self, pattern: Pattern, operands: list[AsmExpr])-> bool:
         if len(pattern.args) != len(operands): return False
         for i in range(0, len(operands)):
-            if pattern.args[i][1] != operands[i].datatype:
+            if pattern.args[i][1] is not operands[i].datatype:
                 return False
         return True
\ No newline at end of file
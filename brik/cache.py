@@ -0,0 +1,124 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+
+from brik.debug import Debug
+
+class BuildCache(Debug):
+    stages = ('module', 'asm', 'object', 'executable')
+    _digests: dict[str, str] = {}
+
+    def __init__(self, root: str, max_bytes: int = 256 << 20, debug: bool | int = False):
+        super().__init__(debug)
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = {stage: 0 for stage in BuildCache.stages}
+        self.misses = {stage: 0 for stage in BuildCache.stages}
+        self.evictions = 0
+        for stage in BuildCache.stages:
+            os.makedirs(os.path.join(root, stage), exist_ok=True)
+        self.size = sum(size for (_, size, _) in self.entries())
+
+    @staticmethod
+    def key(*parts: object)-> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else repr(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @staticmethod
+    def source_digest(root: str)-> str:
+        # Hashes every Python source under root, so entries written by any other version of the compiler miss
+        digest = BuildCache._digests.get(root)
+        if digest is None:
+            paths = sorted(os.path.relpath(os.path.join(parent, name), root) for (parent, _, names) in os.walk(root) for name in names if name.endswith('.py'))
+            parts: list[object] = []
+            for path in paths:
+                with open(os.path.join(root, path), 'rb') as f:
+                    parts.extend([path.replace(os.sep, '/'), f.read()])
+            digest = BuildCache.key(*parts)
+            BuildCache._digests[root] = digest
+        return digest
+
+    def path(self, stage: str, key: str)-> str:
+        return os.path.join(self.root, stage, key)
+
+    def get(self, stage: str, key: str)-> bytes | None:
+        path = self.path(stage, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses[stage] += 1
+            return None
+        self.hits[stage] += 1
+        return data
+
+    def put(self, stage: str, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self.path(stage, key)
+        (fd, temp) = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp, path)
+        self.size += len(data) - previous
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def load(self, stage: str, key: str)-> object | None:
+        data = self.get(stage, key)
+        return pickle.loads(data) if data is not None else None
+    def store(self, stage: str, key: str, value: object):
+        try:
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except (RecursionError, pickle.PicklingError, TypeError, AttributeError) as error:
+            self.v_print('Not caching {}: {}', stage, error)
+            return
+        self.put(stage, key, data)
+
+    def restore(self, stage: str, key: str, path: str)-> bool:
+        source = self.path(stage, key)
+        try:
+            shutil.copyfile(source, path)
+            os.utime(source)
+        except FileNotFoundError:
+            self.misses[stage] += 1
+            return False
+        self.hits[stage] += 1
+        return True
+    def save(self, stage: str, key: str, path: str):
+        with open(path, 'rb') as f:
+            self.put(stage, key, f.read())
+
+    def entries(self)-> list[tuple[float, int, str]]:
+        entries = []
+        for stage in BuildCache.stages:
+            with os.scandir(os.path.join(self.root, stage)) as it:
+                for entry in it:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = sorted(self.entries())
+        self.size = sum(size for (_, size, _) in entries)
+        for (_, size, path) in entries:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+            self.evictions += 1
+
+    def report(self):
+        stats = ', '.join([f'{stage}: {self.hits[stage]}/{self.hits[stage] + self.misses[stage]}' for stage in BuildCache.stages if self.hits[stage] + self.misses[stage] > 0])
+        self.v_print('Cache hits: {}{}', stats if len(stats) > 0 else 'none', f', {self.evictions} evicted' if self.evictions > 0 else '')
@@ -13,8 +13,26 @@ class PrimitiveType(Enum):
     STRING = 8
 
 class DataType:
-    def __init__(self, data_type: PrimitiveType):
-        self.type = data_type
+    _interned: dict[tuple, 'DataType'] = {}
+
+    def __new__(cls, data_type: PrimitiveType):
+        return DataType.intern(cls, (data_type,), type=data_type)
+
+    @staticmethod
+    def intern(cls: type, key: tuple, **fields)-> 'DataType':
+        key = (cls, *key)
+        datatype = DataType._interned.get(key)
+        if datatype is None:
+            datatype = object.__new__(cls)
+            datatype.__dict__.update(fields)
+            datatype.key = key
+            DataType._interned[key] = datatype
+        return datatype
+    def __reduce__(self):
+        return (type(self), self.key[1:])
+    def __repr__(self)-> str:
+        return self.type.name.lower()
+
     UNKNOWN: Self
     VOID: Self
     USER_DEF: Self
@@ -25,13 +43,15 @@ class DataType:
     INT: Self
     STRING: Self
 class CompoundType(DataType):
-    def __init__(self, outer_type: PrimitiveType, *inner_types: DataType):
-        super().__init__(outer_type)
-        self.inner_types = list(inner_types)
+    def __new__(cls, outer_type: PrimitiveType, *inner_types: DataType):
+        return DataType.intern(cls, (outer_type, *inner_types), type=outer_type, inner_types=inner_types)
+    def __repr__(self)-> str:
+        return f'{self.type.name.lower()}<{", ".join([repr(inner) for inner in self.inner_types])}>'
 class UserDefinedType(DataType):
-    def __init__(self, name: str):
-        super().__init__(PrimitiveType.USER_DEF)
-        self.name = name
+    def __new__(cls, name: str):
+        return DataType.intern(cls, (name,), type=PrimitiveType.USER_DEF, name=name)
+    def __repr__(self)-> str:
+        return self.name
 
 for tp in PrimitiveType:
     setattr(DataType, tp.name, DataType(tp))
@@ -1,6 +1,19 @@
+from enum import IntEnum
+from typing import Callable
+
+class TraceLevel(IntEnum):
+    OFF = 0
+    INFO = 1
+    DUMP = 2
+    TRACE = 3
+
 class Debug:
-    def __init__(self, debug=False):
-        self.debug = debug
-    def v_print(self, msg):
-        if self.debug:
-            print(msg)
+    def __init__(self, debug: bool | int = False):
+        self.debug = TraceLevel(min(int(debug), TraceLevel.TRACE))
+    def tracing(self, level: TraceLevel = TraceLevel.INFO)-> bool:
+        return self.debug >= level
+    def v_print(self, msg: str | Callable[[], object], *args, level: TraceLevel = TraceLevel.INFO):
+        if self.debug < level: return
+        if callable(msg): msg = msg()
+        elif len(args) > 0: msg = msg.format(*args)
+        print(msg)
@@ -2,9 +2,9 @@ from abc import ABC, abstractmethod
 
 from brik.datatypes import *
 from brik.patterns import Pattern
-from brik.syntax_tree import BlockNode, Node
+from brik.syntax_tree import BlockNode, Node, Structural
 
-class Definition(ABC):
+class Definition(Structural, ABC):
     def __init__(self, name: str):
         self.name = name
     def data_type(self)-> DataType:
@@ -21,11 +21,16 @@ class CallDefinition(Definition):
         super().__init__(name)
         self.body = contents
         self.pattern = pattern
+        self.inline: bool | None = None
     def __pretty_print__(self, printer):
         printer.append(f'Define {self.name} as ')
         printer.print(self.body)
     def definition_type(self)-> DataType:
         return DataType.CALL
+    def structure(self)-> tuple:
+        return (self.name, self.pattern)
+    def children(self)-> list[Node]:
+        return [self.body]
 
 class VarDefinition(Definition):
     def __init__(self, name: str, value: Node | None):
@@ -42,3 +47,7 @@ class VarDefinition(Definition):
             printer.append_ln()
     def definition_type(self)-> DataType:
         return self.value.data_type() if self.value else DataType.UNKNOWN
+    def structure(self)-> tuple:
+        return (self.name, self.value is None)
+    def children(self)-> list[Node]:
+        return [self.value] if self.value is not None else []
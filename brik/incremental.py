@@ -0,0 +1,115 @@
+from bisect import bisect_left, bisect_right
+
+from brik.debug import Debug
+from brik.definitions import Definition
+from brik.parse import Parser
+from brik.syntax_tree import BlockNode, Module, Node
+from brik.tokens import Tokenizer, TokenStream, TokenType
+
+class Segment:
+    __slots__ = ('start', 'node', 'idents')
+    def __init__(self, start: int, node: Node, idents: list[Definition]):
+        self.start = start
+        self.node = node
+        self.idents = idents
+
+class IncrementalParser(Debug):
+    def __init__(self, source: str, debug: bool = False, iterative: bool = False, verify: bool = False):
+        super().__init__(debug)
+        self.iterative = iterative
+        self.verify = verify
+        self.reused = 0
+        self.reparsed = 0
+        self.mismatches = 0
+        self.source = source
+        self.module = self.parse_full(source)
+
+    def parse_full(self, source: str)-> Module:
+        stream = Tokenizer(source, self.debug).tokenize_stream()
+        parser = Parser(stream, self.debug, self.iterative)
+        parser.wrap_in_block()
+        explicit = not stream.wrapped
+        parser.skip(TokenType.LEFT_BRACKET, 'Tried to parse block but did not find bracket')
+        parser.skip(TokenType.LEFT_PAREN, 'Tried to parse block but did not find paren')
+        entry = BlockNode(parent=None)
+        parser.current_block = entry
+        segments = self.parse_segments(parser, stream, 0, entry)
+        parser.close_block(entry, [segment.node for segment in segments])
+        # Nothing is kept until the whole source has parsed, so a failed reparse leaves the last good state
+        self.entry = entry
+        self.segments = segments
+        self.explicit = explicit
+        self.inner_end = stream.pos_at(len(stream) - 2) if explicit else len(source)
+        # A source like [( a )] [( b )] only parses its first block, so it can't be split into segments
+        self.reusable = parser.pos == len(stream)
+        self.reused = 0
+        self.reparsed = len(self.segments)
+        return Module(self.entry)
+
+    def parse_segments(self, parser: Parser, stream: TokenStream, offset: int, entry: BlockNode)-> list[Segment]:
+        parse_next = parser.parse_next_iterative if self.iterative else parser.parse_next
+        segments = []
+        while not parser.at_end() and not parser.next_is(TokenType.RIGHT_PAREN):
+            idents = len(entry.idents)
+            start = stream.pos_at(parser.pos)
+            node = parse_next()
+            segments.append(Segment(offset + start, node, entry.idents[idents:]))
+        return segments
+
+    def edit(self, start: int, end: int, text: str)-> Module:
+        source = self.source[:start] + text + self.source[end:]
+        module = self.parse_edit(start, end, source, len(text) - (end - start))
+        if module is None:
+            self.v_print('Edit {}-{} needs a full reparse', start, end)
+            module = self.parse_full(source)
+        elif self.verify:
+            expected = Parser(Tokenizer(source).tokenize_stream(), iterative=self.iterative).parse()
+            if expected.entry_point != module.entry_point:
+                self.v_print('Incremental reparse of {}-{} did not match a full reparse', start, end)
+                self.mismatches += 1
+                module = self.parse_full(source)
+        self.source = source
+        self.module = module
+        return module
+
+    def parse_edit(self, start: int, end: int, source: str, delta: int)-> Module | None:
+        segments = self.segments
+        if not self.reusable or len(segments) == 0:
+            return None
+        if start < segments[0].start or end >= self.inner_end:
+            return None
+        starts = [segment.start for segment in segments]
+        # Segments whose span touches the edit, including neighbours whose tokens could merge across it
+        first = max(bisect_left(starts, start) - 1, 0)
+        last = bisect_right(starts, end) - 1
+        if not self.explicit and (first == 0 or last == len(segments) - 1):
+            return None
+
+        region_start = segments[first].start
+        region_end = (segments[last + 1].start if last + 1 < len(segments) else self.inner_end) + delta
+        idents = self.entry.idents
+        self.entry.idents = []
+        try:
+            tokenizer = Tokenizer(source[region_start:region_end], self.debug)
+            stream = tokenizer.tokenize_stream()
+            parser = Parser(stream, self.debug, self.iterative)
+            parser.current_block = self.entry
+            replaced = self.parse_segments(parser, stream, region_start, self.entry)
+            if not parser.at_end():
+                raise Exception('Edited region does not close its top level items')
+        except Exception as e:
+            self.v_print('Could not reparse edited region: {}', e)
+            self.entry.idents = idents
+            return None
+
+        for segment in segments[last + 1:]:
+            segment.start += delta
+        self.segments = segments[:first] + replaced + segments[last + 1:]
+        self.inner_end += delta
+        self.entry.idents = [definition for segment in self.segments for definition in segment.idents]
+        self.entry.contents = [segment.node for segment in self.segments]
+        self.entry.invalidate()
+        self.reused = len(segments) - (last - first + 1)
+        self.reparsed = len(replaced)
+        self.v_print('Reparsed {} top level items, reused {}', self.reparsed, self.reused)
+        return Module(self.entry)
@@ -0,0 +1,159 @@
+from typing import Callable, Tuple
+
+from brik.datatypes import DataType
+from brik.debug import Debug
+from brik.definitions import CallDefinition, VarDefinition
+from brik.syntax_tree import *
+
+def _divide(a: int, b: int)-> int | None:
+    if b == 0: return None
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+def _remainder(a: int, b: int)-> int | None:
+    quotient = _divide(a, b)
+    return None if quotient is None else a - b * quotient
+
+class ConstantFolder(Debug):
+    operators: dict[str, Callable[[int, int], int | None]] = {
+        '+': lambda a, b: a + b,
+        '-': lambda a, b: a - b,
+        '*': lambda a, b: a * b,
+        '/': _divide,
+        '%': _remainder,
+        '^': lambda a, b: a ^ b,
+        '&': lambda a, b: a & b,
+        '|': lambda a, b: a | b,
+    }
+
+    def __init__(self, budget: int = 10000, word_size: int = 8, debug: bool | int = False, max_depth: int = 200):
+        super().__init__(debug)
+        self.budget = budget
+        # Evaluation recurses through evaluate and apply, so nesting is capped well below Python's recursion limit
+        self.max_depth = max_depth
+        self.min_int = -(1 << (word_size * 8 - 1))
+        self.max_int = (1 << (word_size * 8 - 1)) - 1
+        self.folded = 0
+        self.exhausted = 0
+
+    def fold(self, module: Module)-> Module:
+        self.defines: dict[str, CallDefinition] = {}
+        for define in module.defines:
+            if isinstance(define, CallDefinition):
+                self.defines.setdefault(define.name, define)
+        self.builtins = {name: op for (name, op) in ConstantFolder.operators.items() if name not in self.defines}
+        self.purity: dict[str, bool] = {}
+        values: dict[int, int | str] = {}
+        visited = []
+        stack: list[Tuple[Structural, bool]] = [(module.entry_point, False)]
+        while stack:
+            node, done = stack.pop()
+            if not done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+                continue
+            visited.append(node)
+            self.replace_children(node, values)
+            if isinstance(node, CallNode):
+                value = self.fold_call(node)
+                if value is not None:
+                    values[id(node)] = value
+        if self.folded > 0:
+            for node in visited:
+                node.invalidate()
+        self.v_print('Folded {} constant calls, {} ran out of budget', self.folded, self.exhausted)
+        return module
+
+    def replace_children(self, node: Structural, values: dict[int, int | str]):
+        if isinstance(node, CallNode):
+            node.operands = [self.literal(child, values) for child in node.operands]
+        elif isinstance(node, ListNode):
+            node.contents = [self.literal(child, values) for child in node.contents]
+        elif isinstance(node, VarDefinition) and node.value is not None:
+            node.value = self.literal(node.value, values)
+    def literal(self, node: Node, values: dict[int, int | str])-> Node:
+        if not isinstance(node, CallNode) or id(node) not in values:
+            return node
+        self.folded += 1
+        value = values[id(node)]
+        return NumberNode(value) if isinstance(value, int) else StringNode(value)
+
+    def fold_call(self, node: CallNode)-> int | str | None:
+        operands = []
+        for op in node.operands:
+            if isinstance(op, NumberNode) or isinstance(op, StringNode): operands.append(op.value)
+            else: return None
+        self.steps = 0
+        self.depth = 0
+        self.out_of_budget = False
+        result = self.apply(node.name, operands)
+        if self.out_of_budget:
+            self.exhausted += 1
+        return result
+
+    def apply(self, name: str, operands: list[int | str])-> int | str | None:
+        self.steps += 1
+        if self.steps > self.budget:
+            self.out_of_budget = True
+            return None
+        if name in self.builtins:
+            if len(operands) != 2 or not isinstance(operands[0], int) or not isinstance(operands[1], int):
+                return None
+            result = self.builtins[name](operands[0], operands[1])
+            if result is None or result < self.min_int or result > self.max_int:
+                return None
+            return result
+        define = self.defines.get(name)
+        if define is None or not self.is_pure(define):
+            return None
+        env = {}
+        if len(operands) > 0:
+            if len(operands) != len(define.pattern.args):
+                return None
+            for ((arg, datatype), value) in zip(define.pattern.args, operands):
+                if datatype is not (DataType.INT if isinstance(value, int) else DataType.STRING):
+                    return None
+                env[arg] = value
+        result = None
+        for node in define.body.contents:
+            result = self.evaluate(node, env)
+            if result is None:
+                return None
+        return result
+
+    def evaluate(self, node: Node, env: dict[str, int | str])-> int | str | None:
+        if isinstance(node, NumberNode) or isinstance(node, StringNode):
+            return node.value
+        elif isinstance(node, ReferenceNode):
+            return env.get(node.name)
+        elif isinstance(node, CallNode):
+            if self.depth >= self.max_depth:
+                self.out_of_budget = True
+                return None
+            self.depth += 1
+            operands = []
+            for op in node.operands:
+                value = self.evaluate(op, env)
+                if value is None: break
+                operands.append(value)
+            result = self.apply(node.name, operands) if len(operands) == len(node.operands) else None
+            self.depth -= 1
+            return result
+        return None
+
+    def is_pure(self, define: CallDefinition)-> bool:
+        if define.name in self.purity:
+            return self.purity[define.name]
+        self.purity[define.name] = True
+        pure = len(define.body.idents) == 0
+        stack: list[Node] = list(define.body.contents)
+        while pure and stack:
+            node = stack.pop()
+            if isinstance(node, CallNode):
+                if node.name not in self.builtins:
+                    callee = self.defines.get(node.name)
+                    pure = callee is not None and self.is_pure(callee)
+                stack.extend(node.operands)
+            elif not (isinstance(node, NumberNode) or isinstance(node, StringNode) or isinstance(node, ReferenceNode)):
+                pure = False
+        self.purity[define.name] = pure
+        return pure
@@ -0,0 +1,46 @@
+import re
+
+from brik.asm.generation import AsmGenerator
+from brik.debug import Debug
+from brik.definitions import CallDefinition
+from brik.syntax_tree import *
+
+class ReachabilityPass(Debug):
+    _asm_word = re.compile(r'[A-Za-z_.$?@][0-9A-Za-z_.$?@]*')
+
+    def __init__(self, debug: bool | int = False):
+        super().__init__(debug)
+        self.removed: list[CallDefinition] = []
+
+    def prune(self, module: Module)-> Module:
+        callables: dict[str, list[CallDefinition]] = {}
+        labels: dict[str, set[str]] = {}
+        for define in module.defines:
+            if isinstance(define, CallDefinition):
+                callables.setdefault(define.name, []).append(define)
+                labels.setdefault(AsmGenerator.sanitize_label(define.name), set()).add(define.name)
+        reached: set[str] = set()
+        stack: list[Node] = list(module.entry_point.contents)
+        while stack:
+            node = stack.pop()
+            names = []
+            if isinstance(node, CallNode):
+                names.append(node.name)
+                names.extend(op.name for op in node.operands if isinstance(op, ReferenceNode))
+            elif isinstance(node, AsmMacroNode):
+                for word in ReachabilityPass._asm_word.findall(node.asm):
+                    names.extend(labels.get(word, ()))
+            for name in names:
+                if name in reached or name not in callables: continue
+                reached.add(name)
+                for define in callables[name]:
+                    stack.extend(define.body.contents)
+            if isinstance(node, CallNode):
+                stack.extend(node.operands)
+            elif isinstance(node, ListNode):
+                stack.extend(node.contents)
+        self.removed = [d for d in module.defines if isinstance(d, CallDefinition) and d.name not in reached]
+        module.defines = [d for d in module.defines if not isinstance(d, CallDefinition) or d.name in reached]
+        if len(self.removed) > 0:
+            self.v_print('Removed {} unreachable definitions: {}', len(self.removed), ', '.join([d.name for d in self.removed]))
+        return module
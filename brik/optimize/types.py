@@ -0,0 +1,23 @@
+from typing import Tuple
+
+from brik.debug import Debug
+from brik.syntax_tree import *
+
+class TypeInference(Debug):
+    def __init__(self, debug: bool | int = False):
+        super().__init__(debug)
+        self.inferred = 0
+
+    def infer(self, module: Module)-> Module:
+        stack: list[Tuple[Structural, bool]] = [(module.entry_point, False)]
+        while stack:
+            node, done = stack.pop()
+            if not done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children())
+                continue
+            if isinstance(node, Node) and node._type is None:
+                node.data_type()
+                self.inferred += 1
+        self.v_print('Inferred types for {} nodes', self.inferred)
+        return module
@@ -1,76 +1,273 @@
+from typing import Any, Iterable
+
 from brik.syntax_tree import *
 from brik.datatypes import DataType
-from brik.debug import Debug
+from brik.debug import Debug, TraceLevel
 from brik.definitions import *
 from brik.patterns import Pattern
-from brik.tokens import Token, TokenType
+from brik.tokens import Token, TokenStream, TokenType
 
 class ParseException(Exception):
     pass
 
+class TokenFeed:
+    '''Pulls tokens from an iterator on demand, only keeping the tokens around the read position'''
+    def __init__(self, source: Iterable[Token]):
+        self.source = iter(source)
+        self.window: list[Token] = []
+        self.base = 0
+
+    def available(self, index: int)-> bool:
+        while index - self.base >= len(self.window):
+            token = next(self.source, None)
+            if token is None:
+                return False
+            self.window.append(token)
+        return True
+    def release(self, index: int):
+        drop = index - self.base
+        if drop >= 1024:
+            del self.window[:drop]
+            self.base = index
+
+    def __getitem__(self, index: int)-> Token:
+        if index < self.base or not self.available(index):
+            raise IndexError(f'Token {index} is not available')
+        return self.window[index - self.base]
+    def type_at(self, index: int)-> TokenType:
+        return self[index].type
+    def value_at(self, index: int)-> Any:
+        return self[index].value
+
+class BlockFrame:
+    __slots__ = ('block_node', 'contents')
+    def __init__(self, block_node: BlockNode):
+        self.block_node = block_node
+        self.contents = []
+    def accept(self, node: Node):
+        if node is not None:
+            self.contents.append(node)
+    def resume(self, parser: 'Parser')-> Node | None:
+        if not parser.at_end() and not parser.next_is(TokenType.RIGHT_PAREN):
+            return None
+        return parser.close_block(self.block_node, self.contents)
+
+class CallFrame:
+    __slots__ = ('name', 'operands')
+    def __init__(self, name: str):
+        self.name = name
+        self.operands = []
+    def accept(self, node: Node):
+        self.operands.append(node)
+    def resume(self, parser: 'Parser')-> Node | None:
+        if not parser.at_end() and not parser.next_is(TokenType.RIGHT_BRACKET):
+            return None
+        return parser.close_call(self.name, self.operands)
+
+class ListFrame:
+    __slots__ = ('contents',)
+    def __init__(self):
+        self.contents = []
+    def accept(self, node: Node):
+        self.contents.append(node)
+    def resume(self, parser: 'Parser')-> Node | None:
+        if not parser.at_end() and not parser.next_is(TokenType.RIGHT_PAREN):
+            return None
+        return parser.close_list(self.contents)
+
+class DefinitionFrame:
+    __slots__ = ('name', 'pattern', 'value')
+    def __init__(self, name: str, pattern: Pattern | None):
+        self.name = name
+        self.pattern = pattern
+        self.value = None
+    def accept(self, node: Node):
+        self.value = node
+    def resume(self, parser: 'Parser')-> Node | None:
+        if self.value is None:
+            return None
+        return parser.close_definition(self.name, self.pattern, self.value)
+
 class Parser(Debug):
-    def __init__(self, tokens, debug=False):
+    def __init__(self, tokens: TokenStream | list[Token] | Iterable[Token], debug=False, iterative=False):
         super().__init__(debug)
-        self.tokens = tokens
+        self.iterative = iterative
+        if isinstance(tokens, TokenStream):
+            self.tokens = tokens
+        elif isinstance(tokens, list):
+            self.tokens = TokenStream.from_tokens(tokens)
+        else:
+            self.tokens = TokenFeed(tokens)
+        self.streaming = isinstance(self.tokens, TokenFeed)
         self.pos = 0
         self.current_block = None
 
     def at_end(self)-> bool:
-        return self.pos >= len(self.tokens)
+        return not self.tokens.available(self.pos)
 
     def peek(self, offset: int=0)-> Token:
         if self.at_end(): raise Exception('Unexpected end of tokens')
         return self.tokens[self.pos+offset]
+    def peek_type(self, offset: int=0)-> TokenType:
+        try:
+            return self.tokens.type_at(self.pos+offset)
+        except IndexError:
+            raise Exception('Unexpected end of tokens')
+    def next_value(self)-> Any:
+        val = self.tokens.value_at(self.pos)
+        self.advance()
+        return val
     def next(self)-> Token:
         val = self.peek()
-        self.pos += 1
+        self.advance()
         return val
+    def advance(self):
+        self.pos += 1
+        if self.streaming:
+            # parse_call may step back over the bracket it just consumed
+            self.tokens.release(self.pos - 1)
 
     def expect(self, tok_type: TokenType, err_msg: str)-> Token:
         if self.next_is(tok_type):
             return self.next()
         else:
             raise ParseException(err_msg)
+    def skip(self, tok_type: TokenType, err_msg: str):
+        if self.next_is(tok_type):
+            self.advance()
+        else:
+            raise ParseException(err_msg)
     def next_is(self, tok_type: TokenType)-> bool:
-        t = self.peek()
-        return t is not None and t.type == tok_type
+        try:
+            return self.tokens.type_at(self.pos) == tok_type
+        except IndexError:
+            return False
 
     def wrap_in_block(self):
-        if len(self.tokens) < 4 or not (self.tokens[0].type == TokenType.LEFT_BRACKET and self.tokens[1].type == TokenType.LEFT_PAREN and self.tokens[-1].type == TokenType.RIGHT_BRACKET and self.tokens[-2].type == TokenType.RIGHT_PAREN):
-            self.tokens.insert(0, Token(TokenType.LEFT_BRACKET, -1, '['))
-            self.tokens.insert(1, Token(TokenType.LEFT_PAREN, -1, '('))
-            self.tokens.append(Token(TokenType.RIGHT_PAREN, -1, ')'))
-            self.tokens.append(Token(TokenType.RIGHT_BRACKET, -1, ']'))
+        t = self.tokens
+        end = len(t)
+        if end < 4 or not (t.type_at(0) == TokenType.LEFT_BRACKET and t.type_at(1) == TokenType.LEFT_PAREN and t.type_at(end-1) == TokenType.RIGHT_BRACKET and t.type_at(end-2) == TokenType.RIGHT_PAREN):
+            t.wrap()
 
     def parse(self)-> Module:
-        self.v_print(f'Starting parsing, {len(self.tokens)} tokens to parse')
+        if self.streaming:
+            return self.parse_stream()
+        self.v_print('Starting parsing, {} tokens to parse', len(self.tokens))
         self.wrap_in_block()
-        entry = self.parse_block()
+        entry = self.parse_next_iterative() if self.iterative else self.parse_block()
         return Module(entry)
 
+    def parse_stream(self)-> Module:
+        self.v_print('Starting parsing from token stream')
+        entry = None
+        parse_next = self.parse_next_iterative if self.iterative else self.parse_next
+        if self.next_is(TokenType.LEFT_BRACKET) and self.tokens.available(self.pos + 1) and self.peek_type(1) == TokenType.LEFT_PAREN:
+            entry = parse_next()
+            if self.at_end():
+                return Module(entry)
+        # The end of the stream is not known up front, so anything that is not a single
+        # top level block gets wrapped in the implicit [( ... )] block as it is read
+        block_node = BlockNode(parent=None)
+        contents = []
+        if entry is not None:
+            entry.parent = block_node
+            contents.append(entry)
+        self.current_block = block_node
+        while not self.at_end():
+            next_node = parse_next()
+            if next_node is not None:
+                contents.append(next_node)
+        block_node.contents = contents
+        self.current_block = None
+        return Module(block_node)
+
+    def parse_next_iterative(self)-> Node:
+        stack = []
+        node = self.open_next(stack)
+        while True:
+            if node is not None:
+                if not stack:
+                    return node
+                stack[-1].accept(node)
+            node = stack[-1].resume(self)
+            if node is not None:
+                stack.pop()
+            else:
+                node = self.open_next(stack)
+
+    def open_next(self, stack: list)-> Node | None:
+        t = self.peek_type()
+        if t == TokenType.LEFT_BRACKET:
+            if self.peek_type(1) == TokenType.LEFT_PAREN:
+                stack.append(self.open_block())
+                return None
+            self.v_print('Parsing call at {}', self.pos, level=TraceLevel.TRACE)
+            self.skip(TokenType.LEFT_BRACKET, 'Tried to parse call but did not find bracket')
+            if self.next_is(TokenType.LEFT_PAREN):
+                self.pos -= 1
+                stack.append(self.open_block())
+                return None
+            if self.next_is(TokenType.KEYWORD):
+                name_tok = self.next()
+                if name_tok.value == 'def':
+                    return self.open_definition(stack, name_tok)
+                elif name_tok.value == 'asm':
+                    return self.parse_asm(name_tok)
+                else:
+                    raise Exception(f'Unrecognized keyword {name_tok.value}')
+            name_tok = self.expect(TokenType.IDENT, f'Could not parse call name')
+            self.v_print('Parsing operands for call to {}', name_tok.value, level=TraceLevel.TRACE)
+            stack.append(CallFrame(name_tok.value))
+            return None
+        elif t == TokenType.LEFT_PAREN:
+            self.v_print('Parsing list at {}', self.pos, level=TraceLevel.TRACE)
+            self.skip(TokenType.LEFT_PAREN, 'Tried to parse list but did not find paren')
+            stack.append(ListFrame())
+            return None
+        return self.parse_next()
+
+    def open_block(self)-> BlockFrame:
+        self.v_print('Parsing block at {}', self.pos, level=TraceLevel.TRACE)
+        self.skip(TokenType.LEFT_BRACKET, 'Tried to parse block but did not find bracket')
+        self.skip(TokenType.LEFT_PAREN, 'Tried to parse block but did not find paren')
+        block_node = BlockNode(parent=self.current_block)
+        self.current_block = block_node
+        return BlockFrame(block_node)
+
+    def open_definition(self, stack: list, name_tok: Token)-> Node | None:
+        if name_tok.type != TokenType.KEYWORD or name_tok.value != 'def':
+            raise ParseException('Unexpected definition error')
+        def_name_tok = self.expect(TokenType.IDENT, 'Could not find definition name')
+        next_type = self.peek_type()
+        if next_type == TokenType.RIGHT_BRACKET:
+            return self.close_definition(def_name_tok.value, None, None)
+        pattern = self.parse_pattern() if next_type == TokenType.PATTERN_START else None
+        stack.append(DefinitionFrame(def_name_tok.value, pattern))
+        return None
+
     def parse_next(self)-> Node:
-        t = self.peek()
-        if t.type == TokenType.LEFT_BRACKET:
-            if self.peek(1).type == TokenType.LEFT_PAREN:
+        t = self.peek_type()
+        if t == TokenType.LEFT_BRACKET:
+            if self.peek_type(1) == TokenType.LEFT_PAREN:
                 return self.parse_block()
             else:
                 return self.parse_call()
         #elif t.type == TokenType.LEFT_BRACE:
         #    return self.parse_struct()
-        elif t.type == TokenType.LEFT_PAREN:
+        elif t == TokenType.LEFT_PAREN:
             return self.parse_list()
-        elif t.type == TokenType.NUMBER:
-            return NumberNode(self.next().value)
-        elif t.type == TokenType.STRING:
-            return StringNode(self.next().value)
-        elif t.type == TokenType.IDENT:
-            return ReferenceNode(self.next().value)
+        elif t == TokenType.NUMBER:
+            return NumberNode(self.next_value())
+        elif t == TokenType.STRING:
+            return StringNode(self.next_value())
+        elif t == TokenType.IDENT:
+            return ReferenceNode(self.next_value())
         else:
-            raise ParseException(f'Cant parse from {t}')
+            raise ParseException(f'Cant parse from {self.peek()}')
 
     def parse_call(self)-> Node:
-        self.v_print(f'Parsing call at {self.pos}')
-        self.expect(TokenType.LEFT_BRACKET, 'Tried to parse call but did not find bracket')
+        self.v_print('Parsing call at {}', self.pos, level=TraceLevel.TRACE)
+        self.skip(TokenType.LEFT_BRACKET, 'Tried to parse call but did not find bracket')
         if self.next_is(TokenType.LEFT_PAREN):
             self.pos -= 1
             return self.parse_block()
@@ -86,31 +283,37 @@ class Parser(Debug):
 
         name_tok = self.expect(TokenType.IDENT, f'Could not parse call name')
 
-        self.v_print(f'Parsing operands for call to {name_tok.value}')
+        self.v_print('Parsing operands for call to {}', name_tok.value, level=TraceLevel.TRACE)
         operands = []
         while not self.at_end() and not self.next_is(TokenType.RIGHT_BRACKET):
             operands.append(self.parse_next())
 
-        self.expect(TokenType.RIGHT_BRACKET, f'Could not find closing bracket for call to {name_tok.value}')
+        return self.close_call(name_tok.value, operands)
+
+    def close_call(self, name: str, operands: list[Node])-> CallNode:
+        self.skip(TokenType.RIGHT_BRACKET, f'Could not find closing bracket for call to {name}')
 
-        self.v_print(f'Parsed call to {name_tok.value} with {len(operands)} operands')
-        return CallNode(name_tok.value, operands)
+        self.v_print('Parsed call to {} with {} operands', name, len(operands), level=TraceLevel.TRACE)
+        return CallNode(name, operands)
 
     def parse_list(self)-> ListNode:
-        self.v_print(f'Parsing list at {self.pos}')
-        self.expect(TokenType.LEFT_PAREN, 'Tried to parse list but did not find paren')
+        self.v_print('Parsing list at {}', self.pos, level=TraceLevel.TRACE)
+        self.skip(TokenType.LEFT_PAREN, 'Tried to parse list but did not find paren')
 
         contents = []
         while not self.at_end() and not self.next_is(TokenType.RIGHT_PAREN):
             contents.append(self.parse_next())
 
-        self.expect(TokenType.RIGHT_PAREN, 'Could not find closing paren for list')
+        return self.close_list(contents)
 
-        self.v_print(f'Parsed list with {len(contents)} contents')
+    def close_list(self, contents: list[Node])-> ListNode:
+        self.skip(TokenType.RIGHT_PAREN, 'Could not find closing paren for list')
+
+        self.v_print('Parsed list with {} contents', len(contents), level=TraceLevel.TRACE)
         return ListNode(contents)
 
     def parse_pattern(self)-> Pattern:
-        self.expect(TokenType.PATTERN_START, 'Could not start pattern')
+        self.skip(TokenType.PATTERN_START, 'Could not start pattern')
         args = []
         while not self.at_end() and not self.next_is(TokenType.PATTERN_END):
             arg_name = self.expect(TokenType.IDENT, 'Could not read pattern')
@@ -123,13 +326,13 @@ class Parser(Debug):
             if not datatype:
                 datatype = DataType.UNKNOWN
             args.append((arg_name.value, datatype))
-        self.expect(TokenType.PATTERN_END, 'Could not end pattern')
+        self.skip(TokenType.PATTERN_END, 'Could not end pattern')
         return Pattern(args)
 
     def parse_block(self)-> BlockNode:
-        self.v_print(f'Parsing block at {self.pos}')
-        self.expect(TokenType.LEFT_BRACKET, 'Tried to parse block but did not find bracket')
-        self.expect(TokenType.LEFT_PAREN, 'Tried to parse block but did not find paren')
+        self.v_print('Parsing block at {}', self.pos, level=TraceLevel.TRACE)
+        self.skip(TokenType.LEFT_BRACKET, 'Tried to parse block but did not find bracket')
+        self.skip(TokenType.LEFT_PAREN, 'Tried to parse block but did not find paren')
 
         block_node = BlockNode(parent=self.current_block)
         self.current_block = block_node
@@ -139,14 +342,18 @@ class Parser(Debug):
             next_node = self.parse_next()
             if next_node is not None:
                 contents.append(next_node)
+
+        return self.close_block(block_node, contents)
+
+    def close_block(self, block_node: BlockNode, contents: list[Node])-> BlockNode:
         block_node.contents = contents
 
-        self.expect(TokenType.RIGHT_PAREN, 'Could not find closing paren for code block')
-        self.expect(TokenType.RIGHT_BRACKET, 'Could not find closing bracket for code block')
+        self.skip(TokenType.RIGHT_PAREN, 'Could not find closing paren for code block')
+        self.skip(TokenType.RIGHT_BRACKET, 'Could not find closing bracket for code block')
 
         self.current_block = block_node.parent
 
-        self.v_print(f'Parsed code block with {len(block_node.contents)} calls and {len(block_node.idents)} definitions')
+        self.v_print('Parsed code block with {} calls and {} definitions', len(block_node.contents), len(block_node.idents), level=TraceLevel.TRACE)
         return block_node
 
     def parse_definition(self, name_tok: Token)-> ReferenceNode:
@@ -155,34 +362,38 @@ class Parser(Debug):
 
         def_name_tok = self.expect(TokenType.IDENT, 'Could not find definition name')
         next_tok = self.peek()
+        pattern = None
         def_val = None
         if next_tok.type == TokenType.PATTERN_START:
-            def_val = self.parse_pattern()
+            pattern = self.parse_pattern()
+            def_val = self.parse_next()
         elif next_tok.type != TokenType.RIGHT_BRACKET:
             def_val = self.parse_next()
 
-        if def_val is None:
-            self.v_print(f'Parsed definition of variable {def_name_tok.value}')
-            definition = VarDefinition(def_name_tok.value, def_val)
-        elif isinstance(def_val, BlockNode):
-            self.v_print(f'Parsed definition of callable {def_name_tok.value}')
-            definition = CallDefinition(def_name_tok.value, def_val)
-        elif isinstance(def_val, Pattern):
-            block = self.parse_next()
-            if not isinstance(block, BlockNode):
+        return self.close_definition(def_name_tok.value, pattern, def_val)
+
+    def close_definition(self, name: str, pattern: Pattern | None, def_val: Node | None)-> ReferenceNode:
+        if pattern is not None:
+            if not isinstance(def_val, BlockNode):
                 raise Exception('Unreachable')
-            self.v_print(f'Parsed definition of callable {def_name_tok.value} with pattern')
-            definition = CallDefinition(def_name_tok.value, block, def_val)
+            self.v_print('Parsed definition of callable {} with pattern', name, level=TraceLevel.TRACE)
+            definition = CallDefinition(name, def_val, pattern)
+        elif def_val is None:
+            self.v_print('Parsed definition of variable {}', name, level=TraceLevel.TRACE)
+            definition = VarDefinition(name, def_val)
+        elif isinstance(def_val, BlockNode):
+            self.v_print('Parsed definition of callable {}', name, level=TraceLevel.TRACE)
+            definition = CallDefinition(name, def_val)
         else:
-            self.v_print(f'Parsed definition of variable {def_name_tok.value} with value {def_val}')
-            definition = VarDefinition(def_name_tok.value, def_val)
+            self.v_print('Parsed definition of variable {} with value {}', name, def_val, level=TraceLevel.TRACE)
+            definition = VarDefinition(name, def_val)
 
-        self.expect(TokenType.RIGHT_BRACKET, 'Could not find closing bracket for definition')
+        self.skip(TokenType.RIGHT_BRACKET, 'Could not find closing bracket for definition')
 
         if self.current_block is None:
             raise ParseException('Cannot parse definition outside of block')
         self.current_block.idents.append(definition)
-        self.v_print(f'Added definition to current block, block now has {len(self.current_block.idents)} definitions')
+        self.v_print('Added definition to current block, block now has {} definitions', len(self.current_block.idents), level=TraceLevel.TRACE)
         return ReferenceNode(definition.name)
 
     def parse_asm(self, name_tok: Token)-> AsmMacroNode:
@@ -190,7 +401,7 @@ class Parser(Debug):
             raise ParseException('Unexpected asm error')
 
         contents = self.expect(TokenType.STRING, f'#asm builtin must take a string')
-        self.expect(TokenType.RIGHT_BRACKET, 'Could not find closing bracket for call')
+        self.skip(TokenType.RIGHT_BRACKET, 'Could not find closing bracket for call')
 
         asm: str = contents.value
         asm_lines = asm.split('\n')
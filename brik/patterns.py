@@ -6,4 +6,7 @@ class Pattern:
         self.args = args
     def __str__(self)-> str:
         return f'<{' '.join([f'{name}:{datatype.type.name.lower()}' for (name, datatype) in self.args])}>'
-
+    def __eq__(self, other)-> bool:
+        return isinstance(other, Pattern) and self.args == other.args
+    def __hash__(self)-> int:
+        return hash(tuple(self.args))
@@ -1,14 +1,18 @@
-import re
+from typing import IO
 
 class Printer:
-    def __init__(self, indent_style='\t'):
+    def __init__(self, indent_style='\t', stream: IO[str] | None = None, buffer_size: int = 1 << 16):
+        self.stream = stream
+        self.buffer_size = buffer_size
         self.clear()
         self.indent_style = indent_style
 
     def get_indent(self)-> str:
         return self.indent_style * self.indent
     def clear(self):
-        self.content = ''
+        self.chunks: list[str] = []
+        self.size = 0
+        self.line_start = True
         self.indent = 0
 
     def right(self):
@@ -16,18 +20,32 @@ class Printer:
     def left(self):
         self.indent -= 1
 
+    def _write(self, text: str):
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.stream is not None and self.size >= self.buffer_size:
+            self.flush()
+    def flush(self):
+        if self.stream is None: return
+        self.stream.write(''.join(self.chunks))
+        self.chunks = []
+        self.size = 0
+
     def _append(self, msg: str):
-        if msg == '\n': self.content += msg
-        elif Printer._whitespace_regex.match(msg) is not None and (len(self.content) == 0 or self.content[-1] == '\n'):
-            return
-        elif len(self.content) > 0 and self.content[-1] != '\n': self.content += msg
-        else: self.content += f'{self.get_indent()}{msg}'
+        if len(msg) == 0: return
+        if msg == '\n': self._write(msg)
+        elif self.line_start and len(msg.strip(Printer._whitespace)) == 0: return
+        elif not self.line_start: self._write(msg)
+        else: self._write(f'{self.get_indent()}{msg}')
+        self.line_start = msg[-1] == '\n'
 
-    _whitespace_regex = re.compile('^[ \t\r\n]*$')
+    _whitespace = ' \t\r\n'
     def append(self, msg: str = ''):
+        if '\n' not in msg:
+            self._append(msg)
+            return
         lines = msg.split('\n')
         line_count = len(lines)
-        if line_count == 0: return
         for i in range(0, line_count):
             msg = f'{lines[i]}\n' if i < line_count - 1 else lines[i]
             self._append(msg)
@@ -36,13 +54,18 @@ class Printer:
         self.append(f'{msg}\n')
 
     def print(self, obj):
-        if '__pretty_print__' in dir(obj):
+        if hasattr(obj, '__pretty_print__'):
             obj.__pretty_print__(self)
         else:
             self.append(str(obj))
 
+    @property
+    def content(self)-> str:
+        if len(self.chunks) > 1:
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0] if self.chunks else ''
+
     def __str__(self)-> str:
         return self.content
     def __repr__(self)-> str:
         return str(self)
-    
@@ -4,19 +4,87 @@ from typing import Self
 from brik.datatypes import *
 from brik.printer import Printer
 
-class Node(ABC):
+class Structural:
+    # Trees are compared and hashed with explicit stacks so deeply nested modules don't hit the recursion limit.
+    # Hashes are cached, so call invalidate() on any node whose fields or children change after it was hashed.
+    # Nodes don't know their parents, so invalidate() starts a new generation and every hash cached before it,
+    # including those of the node's ancestors, is recomputed before it is trusted again.
+    _hash: int | None = None
+    _hashed_in = 0
+    _generation = 0
+
+    def structure(self)-> tuple:
+        return ()
+    def children(self)-> list[Self]:
+        return []
+    def invalidate(self):
+        self._hash = None
+        Structural._generation += 1
+    def _fresh_hash(self)-> int | None:
+        return self._hash if self._hashed_in == Structural._generation else None
+
+    def __eq__(self, other):
+        if not isinstance(other, Structural):
+            return NotImplemented
+        pairs = [(self, other)]
+        while pairs:
+            a, b = pairs.pop()
+            if a is b:
+                continue
+            if type(a) is not type(b):
+                return False
+            hash_a = a._fresh_hash()
+            hash_b = b._fresh_hash()
+            if hash_a is not None and hash_b is not None and hash_a != hash_b:
+                return False
+            if a.structure() != b.structure():
+                return False
+            children_a = a.children()
+            children_b = b.children()
+            if len(children_a) != len(children_b):
+                return False
+            pairs.extend(zip(children_a, children_b))
+        return True
+
+    def __hash__(self)-> int:
+        if self._fresh_hash() is None:
+            stack = [self]
+            while stack:
+                node = stack[-1]
+                pending = [child for child in node.children() if child._fresh_hash() is None]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                node._hash = hash((type(node).__name__, node.structure(), tuple(child._hash for child in node.children())))
+                node._hashed_in = Structural._generation
+        return self._hash
+
+class Node(Structural, ABC):
+    _type: DataType | None = None
+
     @abstractmethod
     def __pretty_print__(self, printer: Printer):
         pass
-    @abstractmethod
     def data_type(self)-> DataType:
+        if self._type is None:
+            stack = [self]
+            while stack:
+                node = stack[-1]
+                pending = [child for child in node.children() if isinstance(child, Node) and child._type is None]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                if node._type is None:
+                    node._type = node.infer_type()
+        return self._type
+    @abstractmethod
+    def infer_type(self)-> DataType:
         return DataType.UNKNOWN
-    def __eq__(self, other: Self):
-        p_a = Printer('')
-        p_a.print(self)
-        p_b = Printer('')
-        p_b.print(other)
-        return str(p_a) == str(p_b)
+    def invalidate(self):
+        super().invalidate()
+        self._type = None
 
 class CallNode(Node):
     def __init__(self, name: str, operands: list[Node] = []):
@@ -31,8 +99,12 @@ class CallNode(Node):
                 printer.print(op)
             printer.left()
         printer.append_ln(']')
-    def data_type(self)-> DataType:
-        return super().data_type()
+    def infer_type(self)-> DataType:
+        return super().infer_type()
+    def structure(self)-> tuple:
+        return (self.name,)
+    def children(self)-> list[Node]:
+        return self.operands
 
 class AsmMacroNode(Node):
     def __init__(self, asm: str):
@@ -43,8 +115,10 @@ class AsmMacroNode(Node):
         printer.append_ln(self.asm)
         printer.left()
         printer.append_ln(']')
-    def data_type(self)-> DataType:
+    def infer_type(self)-> DataType:
         return DataType.VOID
+    def structure(self)-> tuple:
+        return (self.asm,)
 
 class ListNode(Node):
     def __init__(self, contents: list[Node] = []):
@@ -56,9 +130,11 @@ class ListNode(Node):
             printer.print(node)
         printer.left()
         printer.append_ln(')')
-    def data_type(self)-> DataType:
+    def infer_type(self)-> DataType:
         inner_type: DataType = self.contents[-1].data_type() if len(self.contents) > 0 else DataType.VOID
         return CompoundType(PrimitiveType.LIST, inner_type)
+    def children(self)-> list[Node]:
+        return self.contents
 
 class BlockNode(ListNode):
     def __init__(self, contents: list[Node] = [], parent: Self | None = None):
@@ -76,16 +152,33 @@ class BlockNode(ListNode):
             printer.print(node)
         printer.left()
         printer.append_ln(')]')
-    def data_type(self):
+    def infer_type(self):
         return self.contents[-1].data_type() if len(self.contents) > 0 else DataType.VOID
     def get_idents(self):
         return self.idents + (self.parent.idents if self.parent is not None else [])
+    def structure(self)-> tuple:
+        return (len(self.idents),)
+    def children(self)-> list:
+        return self.idents + self.contents
 
 class Module:
     def __init__(self, entry_point: BlockNode):
         self.entry_point = entry_point
-        extract_defines = lambda n: n.idents + [extract_defines(c) for c in n.contents if isinstance(c, BlockNode)]
-        self.defines = extract_defines(self.entry_point)
+        self.defines = Module.extract_defines(self.entry_point)
+
+    @staticmethod
+    def extract_defines(root: BlockNode)-> list:
+        # Walks nested blocks with an explicit stack so deeply nested modules don't hit the recursion limit
+        defines = {}
+        stack = [(root, False)]
+        while stack:
+            block, visited = stack.pop()
+            if visited:
+                defines[id(block)] = block.idents + [defines[id(c)] for c in block.contents if isinstance(c, BlockNode)]
+            else:
+                stack.append((block, True))
+                stack.extend((c, False) for c in block.contents if isinstance(c, BlockNode))
+        return defines[id(root)]
     def __repr__(self):
         return repr(self.entry_point)
     def __pretty_print__(self, printer):
@@ -96,29 +189,35 @@ class NumberNode(Node):
         self.value = val
     def __pretty_print__(self, printer):
         printer.append_ln(f'Number ({self.value})')
-    def data_type(self):
+    def infer_type(self):
         return DataType.INT
+    def structure(self)-> tuple:
+        return (self.value,)
 
 class StringNode(Node):
     def __init__(self, val: str):
         self.value = val
     def __pretty_print__(self, printer):
         printer.append_ln(f'String "{self.value}"')
-    def data_type(self):
+    def infer_type(self):
         return DataType.STRING
+    def structure(self)-> tuple:
+        return (self.value,)
 
 class ReferenceNode(Node):
     def __init__(self, name: str):
         self.name = name
     def __pretty_print__(self, printer):
         printer.append_ln(f'Reference to ${self.name}')
-    def data_type(self):
+    def infer_type(self):
         return CompoundType(PrimitiveType.REF, DataType.UNKNOWN)
+    def structure(self)-> tuple:
+        return (self.name,)
 
 class StructNode(Node):
     def __init__(self):
         pass
     def __pretty_print__(self, printer):
         pass
-    def data_type(self):
+    def infer_type(self):
         pass
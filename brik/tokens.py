@@ -1,7 +1,11 @@
+import codecs
+import re
+import sys
+from array import array
 from enum import Enum
-from typing import Any
+from typing import IO, Any, Callable, Iterable, Iterator
 
-from brik.debug import Debug
+from brik.debug import Debug, TraceLevel
 
 class TokenType(Enum):
     LEFT_BRACKET = 0
@@ -22,6 +26,7 @@ class TokenType(Enum):
     COLON = 14
 
 class Token:
+    __slots__ = ('type', 'pos', 'value')
     def __init__(self, tok_type: TokenType, pos: int, val: Any):
         self.type = tok_type
         self.pos = pos
@@ -33,6 +38,66 @@ class Token:
     def __repr__(self)-> str:
         return str(self)
 
+class TokenStream:
+    _types = list(TokenType)
+    _interned = (TokenType.IDENT, TokenType.KEYWORD)
+
+    def __init__(self):
+        # The first two slots are reserved for the [( that wrap_in_block may need,
+        # so wrapping never has to shift the columns
+        self.types = array('B', [TokenType.LEFT_BRACKET.value, TokenType.LEFT_PAREN.value])
+        self.positions = array('q', [-1, -1])
+        self.values: list[Any] = ['[', '(']
+        self.head = 2
+        self.wrapped = False
+
+    @staticmethod
+    def from_tokens(tokens: Iterable[Token])-> 'TokenStream':
+        stream = TokenStream()
+        for token in tokens:
+            stream.append(token.type, token.pos, token.value)
+        return stream
+
+    def append(self, tok_type: TokenType, pos: int, val: Any):
+        if self.wrapped: raise Exception('Cannot append to a wrapped token stream')
+        self.types.append(tok_type.value)
+        self.positions.append(pos)
+        self.values.append(sys.intern(val) if tok_type in TokenStream._interned else val)
+
+    def wrap(self):
+        if self.wrapped: return
+        self.append(TokenType.RIGHT_PAREN, -1, ')')
+        self.append(TokenType.RIGHT_BRACKET, -1, ']')
+        self.head = 0
+        self.wrapped = True
+
+    def __len__(self)-> int:
+        return len(self.types) - self.head
+    def available(self, index: int)-> bool:
+        return index + self.head < len(self.types)
+
+    def type_at(self, index: int)-> TokenType:
+        return TokenStream._types[self.types[index + self.head]]
+    def value_at(self, index: int)-> Any:
+        return self.values[index + self.head]
+    def pos_at(self, index: int)-> int:
+        return self.positions[index + self.head]
+
+    def __getitem__(self, index: int)-> Token:
+        if index < 0: index += len(self)
+        i = index + self.head
+        if index < 0 or i >= len(self.types): raise IndexError('Token index out of range')
+        return Token(TokenStream._types[self.types[i]], self.positions[i], self.values[i])
+    def __iter__(self)-> Iterator[Token]:
+        for i in range(0, len(self)):
+            yield self[i]
+    def __eq__(self, other)-> bool:
+        return list(self) == list(other)
+    def __str__(self)-> str:
+        return str(list(self))
+    def __repr__(self)-> str:
+        return str(self)
+
 class Tokenizer(Debug):
     _symbols = {
         '[': TokenType.LEFT_BRACKET,
@@ -56,6 +121,16 @@ class Tokenizer(Debug):
     _ident_start = 'abcdefghijklmnopqrstuvwxyz_+-*%^&|/'
     _ident = f'{_ident_start}{_number}'
 
+    _lexer = re.compile('|'.join([
+        f'(?P<whitespace>[{re.escape(_whitespace)}]+)',
+        f'(?P<symbol>[{re.escape("".join(_symbols))}])',
+        f'(?P<number>[{_number}]+)',
+        f'(?P<ident>[{re.escape(_ident_start)}][{re.escape(_ident)}]*)',
+        f'#(?P<keyword>[{re.escape(_ident)}]*)',
+        r'"(?P<string>(?:[^"\\]|\\+[^\\])*)"'
+    ]))
+    _escape = re.compile(r'\\+([^\\])')
+
     def __init__(self, source: str, debug: bool=False):
         super(Tokenizer, self).__init__(debug)
         self.source = source
@@ -63,91 +138,101 @@ class Tokenizer(Debug):
         self.start = 0
         self.tokens = []
 
-    def at_end(self)-> bool:
-        return self.pos >= len(self.source)
-
-    def peek(self)-> str:
-        if self.at_end(): raise Exception('Unexpected end of file')
-        return self.source[self.pos]
-    def next(self)-> str:
-        val = self.peek()
-        self.pos += 1 if val else 0
-        return val
-
-    def skip_whitespace(self):
-        while not self.at_end() and self.peek() in Tokenizer._whitespace:
-            self.next()
-
     def tokenize(self)-> list[Token]:
-        self.v_print(f'Starting tokenization, source is {len(self.source)} chars')
-        self.skip_whitespace()
-        while not self.at_end():
-            self.start = self.pos
-            self.tokens.append(self.tokenize_next())
-            self.v_print(f'Tokenized {self.start}-{self.pos} as {self.tokens[-1]}')
-            self.skip_whitespace()
-        self.v_print(f'Tokenized {len(self.tokens)} tokens')
+        self.v_print('Starting tokenization, source is {} chars', len(self.source))
+        self.tokens.extend(self.lex(self.source))
+        self.v_print('Tokenized {} tokens', len(self.tokens))
         return self.tokens
 
-    def tokenize_next(self)-> Token:
-        c = self.next()
-        if c is None:
-            raise Exception('Unexpected end of file')
-        elif c in Tokenizer._symbols:
-            return Token(Tokenizer._symbols[c], self.start, c)
-        elif c == '"':
-            return self.tokenize_string()
-        elif c == '#':
-            return self.tokenize_keyword()
-        elif Tokenizer.is_ident_start(c):
-            return self.tokenize_ident(c)
-        elif Tokenizer.is_number(c):
-            return self.tokenize_number(c)
-        else:
-            raise Exception(f'Unrecognized character {c}')
-
-    def tokenize_number(self, num: str)-> Token:
-        while not self.at_end() and Tokenizer.is_number(self.peek()):
-            num += self.next()
-        return Token(TokenType.NUMBER, self.start, int(num))
-
-    def tokenize_ident(self, ident: str)-> Token:
-        while not self.at_end() and Tokenizer.is_ident(self.peek()):
-            ident += self.next()
-        return Token(TokenType.IDENT, self.start, ident)
-
-    def tokenize_keyword(self)-> Token:
-        ident = ''
-        while not self.at_end() and Tokenizer.is_ident(self.peek()):
-            ident += self.next()
-        if ident not in Tokenizer._keywords:
-            raise Exception(f'Unrecognized keyword: {ident}')
-        return Token(TokenType.KEYWORD, self.start, ident)
-
-    def tokenize_string(self)-> Token:
-        is_escaped = False
-        string = ''
-        while not self.at_end() and (self.peek() != '"' or is_escaped):
-            c = self.next()
-            if c == '\\':
-                is_escaped = True
+    def tokenize_stream(self)-> TokenStream:
+        self.v_print('Starting tokenization, source is {} chars', len(self.source))
+        stream = TokenStream()
+        for _ in self.lex(self.source, make=stream.append):
+            pass
+        self.v_print('Tokenized {} tokens', len(stream))
+        return stream
+
+    @classmethod
+    def iter_tokens(cls, stream: IO, chunk_size: int = 65536, debug: bool = False)-> Iterator[Token]:
+        tokenizer = cls('', debug)
+        decoder = None
+        buffer = ''
+        parts: list[str] = []
+        read = 0
+        waiting = 0
+        offset = 0
+        carriage_return = ''
+        final = False
+        while not final:
+            chunk = stream.read(chunk_size)
+            final = len(chunk) == 0
+            if isinstance(chunk, bytes):
+                if decoder is None:
+                    decoder = codecs.getincrementaldecoder('utf-8')()
+                chunk = decoder.decode(chunk, final)
+            chunk = carriage_return + chunk
+            carriage_return = ''
+            if not final and chunk.endswith('\r'):
+                carriage_return = '\r'
+                chunk = chunk[:-1]
+            parts.append(Tokenizer.normalize_newlines(chunk))
+            read += len(parts[-1])
+            # An unfinished token is only rescanned once the buffer has doubled, keeping long tokens linear
+            if not final and read < waiting:
                 continue
-            elif is_escaped:
-                is_escaped = False
-            string += c
-
-        if self.at_end():
-            raise Exception('Found end of code while tokenizing string')
-
-        self.next()
-        return Token(TokenType.STRING, self.start, string)
+            buffer = buffer[tokenizer.pos:] + ''.join(parts)
+            parts = []
+            read = 0
+            offset += tokenizer.pos
+            tokenizer.pos = 0
+            yield from tokenizer.lex(buffer, offset, final)
+            waiting = len(buffer) - tokenizer.pos
+        tokenizer.v_print('Tokenized stream of {} chars', offset + tokenizer.pos)
+
+    def lex(self, source: str, offset: int = 0, final: bool = True, make: Callable = Token)-> Iterator[Token]:
+        end = len(source)
+        match = Tokenizer._lexer.match
+        symbols = Tokenizer._symbols
+        keywords = Tokenizer._keywords
+        trace = self.tracing(TraceLevel.TRACE)
+        while self.pos < end:
+            self.start = self.pos
+            m = match(source, self.pos)
+            if m is None:
+                c = source[self.pos]
+                if c == '"':
+                    if not final:
+                        return
+                    raise Exception('Found end of code while tokenizing string')
+                raise Exception(f'Unrecognized character {c}')
+            kind = m.lastgroup
+            if not final and m.end() == end and kind != 'symbol' and kind != 'string':
+                return
+            self.pos = m.end()
+            pos = offset + self.start
+            if kind == 'whitespace':
+                continue
+            elif kind == 'symbol':
+                val = m.group(kind)
+                tok_type = symbols[val]
+            elif kind == 'ident':
+                tok_type, val = TokenType.IDENT, m.group(kind)
+            elif kind == 'number':
+                tok_type, val = TokenType.NUMBER, int(m.group(kind))
+            elif kind == 'string':
+                val = m.group(kind)
+                if '\\' in val:
+                    val = Tokenizer._escape.sub('\\1', val)
+                tok_type = TokenType.STRING
+            else:
+                val = m.group(kind)
+                if val not in keywords:
+                    raise Exception(f'Unrecognized keyword: {val}')
+                tok_type = TokenType.KEYWORD
+            if trace:
+                self.v_print('Tokenized {}-{} as {}', pos, offset + self.pos, Token(tok_type, pos, val))
+            yield make(tok_type, pos, val)
 
     @staticmethod
-    def is_number(c: str)-> bool:
-        return c in Tokenizer._number
-    @staticmethod
-    def is_ident_start(c: str)-> bool:
-        return c in Tokenizer._ident_start
-    @staticmethod
-    def is_ident(c: str)-> bool:
-        return c in Tokenizer._ident
+    def normalize_newlines(text: str)-> str:
+        return text.replace('\r\n', '\n')
@@ -0,0 +1,85 @@
+from unittest import TestCase
+from brik.arena import AstArena, NodeKind
+from brik.asm.generation import AsmGenerator
+from brik.asm.platform import CompilerPlatform, get_platform
+from brik.asm.transpile import Transpiler
+from brik.parse import Parser
+from brik.syntax_tree import BlockNode
+from brik.tokens import Tokenizer
+
+class TestArena(TestCase):
+    source = '''[#def putchar <c:int> [( [#asm "mov %cx, {c}"] )]]
+    [#def greet [( [#def inner 99999999999999999999] [putchar 65] "hi" (1 x) )]]
+    [#def unset]
+    [putchar 66] [greet] [( [f] )]
+    '''
+
+    def parse(self, source: str):
+        return Parser(Tokenizer(source).tokenize_stream()).parse()
+
+    def test_round_trip(self):
+        module = self.parse(self.source)
+        arena = AstArena.from_module(module)
+        rebuilt = arena.to_module()
+        self.assertEqual(module.entry_point, rebuilt.entry_point)
+        self.assertEqual(len(module.defines), len(rebuilt.defines))
+        greet = rebuilt.entry_point.idents[1]
+        self.assertIs(rebuilt.entry_point, greet.body.parent)
+        nested = rebuilt.entry_point.contents[-1]
+        self.assertIsInstance(nested, BlockNode)
+        self.assertIs(rebuilt.entry_point, nested.parent)
+
+    def test_to_node_parent(self):
+        arena = AstArena.from_module(self.parse(self.source))
+        greet = arena.to_node(arena.idents(arena.root)[1])
+        scope = greet.body.parent
+        self.assertIsNotNone(scope)
+        self.assertIsNone(scope.parent)
+        self.assertEqual(['putchar', 'greet', 'unset'], [define.name for define in scope.idents])
+        self.assertEqual(['inner', 'putchar', 'greet', 'unset'], [define.name for define in greet.body.get_idents()])
+        self.assertIs(scope, arena.to_node(arena.idents(arena.root)[0]).body.parent)
+
+    def test_accessors(self):
+        arena = AstArena.from_module(self.parse(self.source))
+        root = arena.root
+        self.assertEqual(NodeKind.BLOCK, arena.kind(root))
+        self.assertEqual(3, len(arena.idents(root)))
+        putchar = arena.view(arena.idents(root)[0])
+        self.assertEqual(NodeKind.CALL_DEF, putchar.kind)
+        self.assertEqual('putchar', putchar.name)
+        self.assertEqual('c', putchar.pattern.args[0][0])
+        call = arena.view(arena.contents(root)[3])
+        self.assertEqual('putchar', call.name)
+        self.assertEqual([66], [op.value for op in call.children])
+        self.assertIs(arena.name(putchar.index), arena.name(call.index))
+
+    def test_transpile_arena(self):
+        source = '[#def putchar <c:int> [( [#asm "mov %cx, {c}"] )]] [#def greet [( [putchar 65] "hi" 3 )]] [putchar 66] [greet]'
+        platform = get_platform(CompilerPlatform.LINUX_X86_64)
+        module = self.parse(source)
+        expected = AsmGenerator(platform).generate_module(Transpiler(platform).transpile(module))
+        actual = AsmGenerator(platform).generate_module(Transpiler(platform).transpile_arena(AstArena.from_module(module)))
+        self.assertEqual(expected, actual)
+
+    def test_transpile_arena_inline(self):
+        source = '[#def id <x:int> [( [#asm "mov %ax, {x}"] )]] [#def answer [( [#asm "mov %ax, 42"] )]] [id 5] [answer] [id 6]'
+        platform = get_platform(CompilerPlatform.LINUX_X86_64)
+        module = self.parse(source)
+        transpiler = Transpiler(platform, inline_threshold=8)
+        expected = AsmGenerator(platform).generate_module(transpiler.transpile(module))
+        self.assertGreater(transpiler.inliner.inlined, 0)
+        transpiler = Transpiler(platform, inline_threshold=8)
+        actual = AsmGenerator(platform).generate_module(transpiler.transpile_arena(AstArena.from_module(module)))
+        self.assertGreater(transpiler.inliner.inlined, 0)
+        self.assertEqual(expected, actual)
+
+    def test_transpile_arena_converts_inlined_only(self):
+        asm = ' '.join(f'[#asm "mov %ax, {i}"]' for i in range(0, 10))
+        source = f'[#def id <x:int> [( [#asm "mov %ax, {{x}}"] )]] [#def big [( {asm} )]] [id 5] [big]'
+        platform = get_platform(CompilerPlatform.LINUX_X86_64)
+        module = self.parse(source)
+        expected = AsmGenerator(platform).generate_module(Transpiler(platform, inline_threshold=8).transpile(module))
+        transpiler = Transpiler(platform, inline_threshold=8)
+        actual = AsmGenerator(platform).generate_module(transpiler.transpile_arena(AstArena.from_module(module)))
+        self.assertEqual(expected, actual)
+        self.assertEqual(['id'], [define.name for define in transpiler.inline_defines.values()])
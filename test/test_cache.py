@@ -0,0 +1,107 @@
+import io
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, skipUnless
+import brik
+from brik import Brik, BrikOpts
+from brik.asm.platform import CompilerPlatform
+from brik.asm.syntax_tree import AsmModule
+from brik.cache import BuildCache
+from brik.syntax_tree import StringNode
+
+class TestBuildCache(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_key(self):
+        self.assertEqual(BuildCache.key('a', 1, b'x'), BuildCache.key('a', 1, b'x'))
+        self.assertNotEqual(BuildCache.key('a', 1), BuildCache.key('a', 2))
+        self.assertNotEqual(BuildCache.key('ab', 'c'), BuildCache.key('a', 'bc'))
+
+    def test_hits(self):
+        cache = BuildCache(self.dir.name)
+        self.assertIsNone(cache.get('object', 'k'))
+        cache.put('object', 'k', b'data')
+        self.assertEqual(b'data', cache.get('object', 'k'))
+        cache.store('asm', 'k', {'a': [1, 2]})
+        self.assertEqual({'a': [1, 2]}, cache.load('asm', 'k'))
+        self.assertEqual((1, 1), (cache.hits['object'], cache.misses['object']))
+        self.assertEqual(4 + os.path.getsize(cache.path('asm', 'k')), BuildCache(self.dir.name).size)
+
+    def test_eviction(self):
+        cache = BuildCache(self.dir.name, max_bytes=100)
+        for (i, key) in enumerate(['a', 'b', 'c']):
+            cache.put('object', key, bytes(40) if key != 'c' else bytes(20))
+            os.utime(cache.path('object', key), (1000 + i, 1000 + i))
+        cache.get('object', 'a')
+        cache.put('executable', 'd', bytes(30))
+        self.assertIsNotNone(cache.get('object', 'a'))
+        self.assertIsNone(cache.get('object', 'b'))
+        self.assertEqual(1, cache.evictions)
+        self.assertLessEqual(cache.size, 100)
+        cache.put('object', 'huge', bytes(200))
+        self.assertFalse(os.path.exists(cache.path('object', 'huge')))
+
+class TestCompileCache(TestCase):
+    source = '[#def answer [( [#asm "mov %ax, 42"] )]] [answer]'
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def compiler(self, **options)-> Brik:
+        return Brik(BrikOpts('test', CompilerPlatform.LINUX_X86_64, self.dir.name, cache=True, **options))
+
+    def test_executable(self):
+        self.assertIsNotNone(self.compiler().compile_all(self.source)[1])
+        compiler = self.compiler()
+        (tokens, module, _, _, _, path) = compiler.compile_all(self.source)
+        self.assertIsNone(tokens)
+        self.assertIsNone(module)
+        self.assertEqual((1, 0), (compiler.cache.hits['executable'], compiler.cache.misses['executable']))
+        self.assertEqual(os.path.join(self.dir.name, 'cache'), compiler.cache.root)
+        self.assertEqual(1, len(os.listdir(compiler.cache_path() + '/executable')))
+        compiler = self.compiler(inline_threshold=0)
+        compiler.compile_all(self.source)
+        self.assertEqual(1, compiler.cache.misses['executable'])
+
+    def test_stages(self):
+        stages = ('module', 'asm')
+        self.compiler(cache_stages=stages).compile(self.source)
+        compiler = self.compiler(cache_stages=stages)
+        (_, module, asm_mod, _, _, _) = compiler.compile_all(self.source)
+        self.assertIsNone(module)
+        self.assertIsInstance(asm_mod, AsmModule)
+        self.assertEqual(1, compiler.cache.hits['asm'])
+        compiler = self.compiler(cache_stages=stages, peephole=False)
+        (_, module, _, _, _, _) = compiler.compile_all(self.source)
+        self.assertIsNotNone(module)
+        self.assertEqual((1, 1), (compiler.cache.hits['module'], compiler.cache.misses['asm']))
+
+    def test_stream_newlines(self):
+        source = b'"a\r\nb" [#def answer [( [#asm "mov %ax, 42"] )]] [answer]'
+        (module, _, _, _, _) = self.compiler(cache_stages=('module',)).compile_stream(io.BytesIO(source))
+        (expected, _, _, _, _) = Brik(BrikOpts('test', CompilerPlatform.LINUX_X86_64, self.dir.name)).compile_stream(io.BytesIO(source))
+        self.assertEqual(['a\nb'], [node.value for node in module.entry_point.contents if isinstance(node, StringNode)])
+        self.assertEqual(expected.entry_point, module.entry_point)
+
+    def test_compiler_digest(self):
+        self.assertIn(BuildCache.source_digest(os.path.dirname(brik.__file__)), self.compiler().fingerprint)
+        for (i, body) in enumerate([b'a = 1', b'a = 2']):
+            root = os.path.join(self.dir.name, f'src{i}')
+            os.makedirs(os.path.join(root, 'asm'))
+            with open(os.path.join(root, 'asm', 'gen.py'), 'wb') as f:
+                f.write(body)
+        self.assertNotEqual(BuildCache.source_digest(os.path.join(self.dir.name, 'src0')), BuildCache.source_digest(os.path.join(self.dir.name, 'src1')))
+
+    @skipUnless(sys.platform.startswith('linux') and platform.machine() == 'x86_64', 'native binaries need x86-64 Linux')
+    def test_restored_binary_runs(self):
+        self.compiler().compile(self.source)
+        path = self.compiler().compile(self.source)
+        os.remove(path)
+        path = self.compiler().compile(self.source)
+        self.assertEqual(42, subprocess.run([path]).returncode)
@@ -0,0 +1,73 @@
+from unittest import TestCase
+from brik.asm.call_conventions import CdeclCallConvention, MicrosoftCallConvention, SystemVCallConvention
+from brik.asm.ir import InstructionList
+from brik.asm.syntax_tree import AsmCall, AsmExpr, AsmInt, AsmString
+from brik.datatypes import DataType
+
+class TestCallConventions(TestCase):
+    def call(self, convention, operands: list[AsmExpr], tail: bool = False)-> list[str]:
+        code = InstructionList()
+        def evaluate(op: AsmExpr):
+            code.append('call', op.target)
+        convention.generate_call(code, 'f', operands, evaluate, tail)
+        return str(code).splitlines()
+
+    def test_system_v(self):
+        convention = SystemVCallConvention(8, 'r')
+        self.assertEqual(['mov rdi, 1d', 'mov rsi, s', 'call f'], self.call(convention, [AsmInt(1), AsmString('s')]))
+        operands = [AsmInt(i) for i in range(0, 8)]
+        operands[1] = AsmCall('g', DataType.INT, [])
+        operands[7] = AsmCall('h', DataType.INT, [])
+        self.assertEqual([
+            'call g', 'mov %v0, rax',
+            'call h', 'mov %v1, rax',
+            'push %v1',
+            'mov rax, 6d', 'push rax',
+            'mov rdi, 0d', 'mov rsi, %v0', 'mov rdx, 2d', 'mov rcx, 3d', 'mov r8, 4d', 'mov r9, 5d',
+            'call f',
+            'add rsp, 16',
+        ], self.call(convention, operands))
+
+    def test_microsoft(self):
+        convention = MicrosoftCallConvention(8, 'r')
+        operands = [AsmInt(i) for i in range(0, 5)]
+        self.assertEqual([
+            'mov rax, 4d', 'push rax',
+            'mov rcx, 0d', 'mov rdx, 1d', 'mov r8, 2d', 'mov r9, 3d',
+            'sub rsp, 32',
+            'call f',
+            'add rsp, 40',
+        ], self.call(convention, operands))
+
+    def test_cdecl(self):
+        convention = CdeclCallConvention(4, 'e')
+        self.assertEqual([
+            'mov eax, 2d', 'push eax',
+            'mov eax, 1d', 'push eax',
+            'call f',
+            'add esp, 8',
+        ], self.call(convention, [AsmInt(1), AsmInt(2)]))
+        self.assertEqual(['call f'], self.call(convention, []))
+
+    def test_tail_call(self):
+        self.assertEqual(['mov rdi, 1d', 'jmp f'], self.call(SystemVCallConvention(8, 'r'), [AsmInt(1)], True))
+        self.assertEqual(['mov rcx, 1d', 'jmp f'], self.call(MicrosoftCallConvention(8, 'r'), [AsmInt(1)], True))
+        self.assertEqual(['jmp f'], self.call(CdeclCallConvention(4, 'e'), [], True))
+        self.assertEqual(['mov eax, 1d', 'push eax', 'call f', 'add esp, 4'], self.call(CdeclCallConvention(4, 'e'), [AsmInt(1)], True))
+
+    def test_frames(self):
+        code = InstructionList()
+        SystemVCallConvention(8, 'r').generate_func_open(code, 3, 2)
+        self.assertEqual([
+            'push rbp', 'mov rbp, rsp', 'sub rsp, 48',
+            'mov [rbp-8], rdi', 'mov [rbp-16], rsi', 'mov [rbp-24], rdx',
+        ], str(code).splitlines())
+        code = InstructionList()
+        MicrosoftCallConvention(8, 'r').generate_func_open(code, 1)
+        MicrosoftCallConvention(8, 'r').generate_func_close(code, 1)
+        self.assertEqual(['push rbp', 'mov rbp, rsp', 'mov [rbp+16], rcx', 'mov rsp, rbp', 'pop rbp', 'ret'], str(code).splitlines())
+
+    def test_slots(self):
+        self.assertEqual([-1, -6, 2, 3], [SystemVCallConvention(8, 'r').arg_slot(i) for i in [0, 5, 6, 7]])
+        self.assertEqual([2, 6], [MicrosoftCallConvention(8, 'r').arg_slot(i) for i in [0, 4]])
+        self.assertEqual([2, 3], [CdeclCallConvention(4, 'e').arg_slot(i) for i in [0, 1]])
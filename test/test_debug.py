@@ -0,0 +1,33 @@
+import contextlib
+import io
+from unittest import TestCase
+from brik.debug import Debug, TraceLevel
+
+class TestDebug(TestCase):
+    def output(self, debug: Debug, *args, **kwargs)-> str:
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            debug.v_print(*args, **kwargs)
+        return out.getvalue()
+
+    def test_levels(self):
+        self.assertEqual(TraceLevel.OFF, Debug().debug)
+        self.assertEqual(TraceLevel.INFO, Debug(True).debug)
+        self.assertEqual(TraceLevel.TRACE, Debug(5).debug)
+        self.assertTrue(Debug(TraceLevel.DUMP).tracing(TraceLevel.INFO))
+        self.assertFalse(Debug(TraceLevel.DUMP).tracing(TraceLevel.TRACE))
+
+    def test_format(self):
+        self.assertEqual('a 1 b\n', self.output(Debug(True), 'a {} {}', 1, 'b'))
+        self.assertEqual('{}\n', self.output(Debug(True), '{}'))
+        self.assertEqual('', self.output(Debug(True), 'a {}', 1, level=TraceLevel.TRACE))
+
+    def test_lazy(self):
+        calls = []
+        def dump():
+            calls.append(1)
+            return 'dump'
+        self.assertEqual('', self.output(Debug(TraceLevel.INFO), dump, level=TraceLevel.DUMP))
+        self.assertEqual([], calls)
+        self.assertEqual('dump\n', self.output(Debug(TraceLevel.DUMP), dump, level=TraceLevel.DUMP))
+        self.assertEqual([1], calls)
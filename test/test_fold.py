@@ -0,0 +1,66 @@
+from unittest import TestCase
+from brik.optimize.fold import ConstantFolder
+from brik.parse import Parser
+from brik.syntax_tree import *
+from brik.tokens import Tokenizer
+
+class TestConstantFolder(TestCase):
+    def fold(self, source: str, budget: int = 10000, word_size: int = 8)-> Module:
+        module = Parser(Tokenizer(source).tokenize()).parse()
+        return ConstantFolder(budget, word_size).fold(module)
+
+    def parse(self, source: str)-> Module:
+        return Parser(Tokenizer(source).tokenize()).parse()
+
+    def calls(self, module: Module)-> list[Node]:
+        return [node for node in module.entry_point.contents if not isinstance(node, ReferenceNode)]
+
+    def test_operators(self):
+        module = self.fold('[+ 2 3] [* [- 10 4] [/ [- 0 7] 2]] [% [- 0 7] 2] [^ 6 3] [& 6 3] [| 6 3]')
+        self.assertEqual([5, -18, -1, 5, 2, 7], [node.value for node in module.entry_point.contents])
+
+    def test_unfoldable(self):
+        source = '[/ 1 0] [+ 1 "a"] [+ 1 2 3] [f [+ 1 2]]'
+        module = self.fold(source)
+        self.assertEqual(self.parse('[/ 1 0] [+ 1 "a"] [+ 1 2 3] [f 3]').entry_point, module.entry_point)
+
+    def test_overflow(self):
+        module = self.fold('[* 65536 65536]', word_size=4)
+        self.assertIsInstance(module.entry_point.contents[0], CallNode)
+        module = self.fold('[* 65536 65536]')
+        self.assertEqual(NumberNode(1 << 32), module.entry_point.contents[0])
+
+    def test_user_operator(self):
+        module = self.fold('[#def + <a:int b:int> [( [#asm "mov %ax, {a}"] )]] [+ 2 3]')
+        self.assertIsInstance(self.calls(module)[0], CallNode)
+
+    def test_pure_definitions(self):
+        module = self.fold('[#def double <x:int> [( [* x 2] )]] [#def answer [( [+ [double 20] 2] )]] [answer] [double "s"]')
+        self.assertEqual(NumberNode(42), self.calls(module)[0])
+        self.assertIsInstance(self.calls(module)[1], CallNode)
+
+    def test_impure_definitions(self):
+        module = self.fold('[#def f [( [#asm "nop"] 1 )]] [#def g [( [f] )]] [f] [g]')
+        self.assertEqual(['f', 'g'], [node.name for node in self.calls(module)])
+
+    def test_budget(self):
+        source = '[#def loop [( [loop] )]] [#def f [( [+ [+ 1 2] [+ 3 4]] )]] [loop] [f]'
+        module = self.fold(source, budget=3)
+        self.assertIsInstance(self.calls(module)[0], CallNode)
+        self.assertIsInstance(self.calls(module)[1], CallNode)
+        module = self.fold(source, budget=4)
+        self.assertIsInstance(self.calls(module)[0], CallNode)
+        self.assertEqual(NumberNode(10), self.calls(module)[1])
+
+    def test_depth(self):
+        nested = '[+ n ' * 300 + 'n' + ']' * 300
+        source = f'[#def deep <n:int> [( {nested} )]] [#def count <n:int> [( [count [+ n 1]] )]] [deep 1] [count 0]'
+        folder = ConstantFolder(max_depth=400)
+        module = folder.fold(self.parse(source))
+        self.assertEqual(NumberNode(301), self.calls(module)[0])
+        self.assertIsInstance(self.calls(module)[1], CallNode)
+        self.assertEqual(1, folder.exhausted)
+        folder = ConstantFolder()
+        module = folder.fold(self.parse(source))
+        self.assertIsInstance(self.calls(module)[0], CallNode)
+        self.assertEqual(2, folder.exhausted)
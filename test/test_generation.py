@@ -0,0 +1,43 @@
+from unittest import TestCase
+from brik.asm.generation import AsmGenerator
+from brik.asm.platform import CompilerPlatform, get_platform
+from brik.asm.transpile import Transpiler
+from brik.parse import Parser
+from brik.tokens import Tokenizer
+
+class TestGeneration(TestCase):
+    def generate(self, source: str, platform: CompilerPlatform = CompilerPlatform.LINUX_X86_64)-> dict[str, list[str]]:
+        target = get_platform(platform)
+        module = Parser(Tokenizer(source).tokenize_stream()).parse()
+        asm = AsmGenerator(target).generate_module(Transpiler(target).transpile(module))
+        functions = {}
+        name = None
+        for line in asm.splitlines():
+            if line.endswith(':') and not line.startswith(' '):
+                name = line[:-1]
+                functions[name] = []
+            elif name is not None and len(line.strip()) > 0:
+                functions[name].append(line.strip())
+        return functions
+
+    def test_leaf(self):
+        functions = self.generate('[#def one [( [#asm "mov %ax, 1"] )]] [#def two <x:int> [( [#asm "mov %ax, {x}"] )]] [one] [two 2]')
+        self.assertEqual(['mov rax, 1', 'ret'], functions['one'])
+        self.assertEqual(['push rbp', 'mov rbp, rsp'], functions['two'][:2])
+
+    def test_tail_call(self):
+        functions = self.generate('[#def one [( [#asm "mov %ax, 1"] )]] [#def f [( [one] )]] [f]')
+        self.assertEqual(['jmp one'], functions['f'])
+        self.assertEqual(['jmp f'], functions['main'])
+
+    def test_intrinsics(self):
+        functions = self.generate('[#def one [( [#asm "mov %ax, 1"] )]] [#def f [( [+ 2 [* [one] 3]] )]] [#def g [( [% [one] [one]] )]] [f] [g]')
+        self.assertEqual(['push rbp', 'mov rbp, rsp', 'call one', 'imul rax, rax, 3d', 'add rax, 2d', 'mov rsp, rbp', 'pop rbp', 'ret'], functions['f'])
+        self.assertEqual(['cqo', 'idiv r10', 'mov rax, rdx'], functions['g'][-7:-4])
+        functions = self.generate('[#def f [( [/ 7 2] )]] [f]', CompilerPlatform.LINUX_X86_32)
+        self.assertEqual(['mov eax, 7d', 'mov ecx, 2d', 'cdq', 'idiv ecx', 'ret'], functions['f'])
+
+    def test_tail_call_stack_args(self):
+        functions = self.generate('[#def two <x:int> [( [#asm "mov %ax, {x}"] )]] [#def f [( [two 2] )]] [f]', CompilerPlatform.LINUX_X86_32)
+        self.assertEqual(['push ebp', 'mov ebp, esp', 'push 2d', 'call two', 'add esp, 4', 'mov esp, ebp', 'pop ebp', 'ret'], functions['f'])
+        self.assertEqual(['jmp f'], functions['main'])
@@ -0,0 +1,74 @@
+from unittest import TestCase
+from brik.incremental import IncrementalParser
+from brik.parse import Parser
+from brik.tokens import Tokenizer
+
+class TestIncrementalParser(TestCase):
+    source = '''[#def putchar <c:int> [(
+    [#asm "mov %cx, {c}"]
+)]]
+[#def greeting "hello"]
+[putchar 72]
+[#def twice <n:int> [( [putchar 1] [putchar 2] )]]
+[twice 5]
+'''
+
+    def assert_matches_full(self, parser: IncrementalParser):
+        expected = Parser(Tokenizer(parser.source).tokenize()).parse()
+        self.assertEqual(expected.entry_point, parser.module.entry_point)
+        self.assertEqual(len(expected.defines), len(parser.module.defines))
+
+    def test_edit_reuses_definitions(self):
+        parser = IncrementalParser(self.source)
+        putchar = parser.module.entry_point.idents[0]
+        twice = parser.module.entry_point.idents[2]
+        start = self.source.index('72')
+        parser.edit(start, start + 2, '101')
+        self.assert_matches_full(parser)
+        self.assertEqual(1, parser.reparsed)
+        self.assertIs(putchar, parser.module.entry_point.idents[0])
+        self.assertIs(twice, parser.module.entry_point.idents[2])
+
+    def test_edit_definition(self):
+        parser = IncrementalParser(self.source)
+        start = self.source.index('[putchar 2]')
+        parser.edit(start, start + len('[putchar 2]'), '[#def inner 3] [putchar inner]')
+        self.assert_matches_full(parser)
+        self.assertEqual('twice', parser.module.entry_point.idents[2].name)
+        self.assertEqual('inner', parser.module.entry_point.idents[2].body.idents[0].name)
+
+    def test_edit_falls_back(self):
+        parser = IncrementalParser(self.source)
+        start = self.source.index('<c:int>')
+        parser.edit(start, start + len('<c:int>'), '<ch:int>')
+        self.assert_matches_full(parser)
+        self.assertEqual(0, parser.reused)
+        start = parser.source.index('"hello"')
+        with self.assertRaises(Exception):
+            parser.edit(start, start + 1, '')
+
+    def test_failed_edit_keeps_state(self):
+        parser = IncrementalParser(self.source)
+        with self.assertRaises(Exception):
+            parser.edit(0, 0, '[( ')
+        self.assertIs(parser.entry, parser.module.entry_point)
+        self.assertFalse(parser.explicit)
+        start = parser.source.index('72')
+        parser.edit(start, start + 2, '101')
+        self.assert_matches_full(parser)
+        self.assertEqual(1, parser.reparsed)
+
+    def test_edit_sequence(self):
+        parser = IncrementalParser(f'[( {self.source} )]', verify=True)
+        edits = [
+            ('[putchar 72]', '[putchar 72][putchar 73]'),
+            ('"hello"', '"hello world"'),
+            ('[twice 5]', ''),
+            ('[putchar 73]', '[(1 2)]'),
+            ('<n:int>', '<n:int m:int>'),
+        ]
+        for (old, new) in edits:
+            start = parser.source.index(old)
+            parser.edit(start, start + len(old), new)
+            self.assert_matches_full(parser)
+        self.assertEqual(0, parser.mismatches)
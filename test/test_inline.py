@@ -0,0 +1,67 @@
+from unittest import TestCase
+from brik.asm.platform import CompilerPlatform, get_platform
+from brik.asm.syntax_tree import AsmCall, AsmInline, AsmLiteral, AsmModule
+from brik.asm.transpile import Transpiler
+from brik.definitions import CallDefinition
+from brik.parse import Parser
+from brik.tokens import Tokenizer
+
+class TestInline(TestCase):
+    putchar = '[#def putchar <c:int> [( [#asm "lea %si, {c}"] [#asm "mov %ax, 1"] [#asm "syscall"] )]] '
+
+    def transpile(self, source: str, threshold: int = 8, always: set = set(), never: set = set())-> AsmModule:
+        module = Parser(Tokenizer(source).tokenize_stream()).parse()
+        for define in module.defines:
+            if isinstance(define, CallDefinition):
+                if define.name in never: define.inline = False
+                elif define.name in always: define.inline = True
+        return Transpiler(get_platform(CompilerPlatform.LINUX_X86_64), inline_threshold=threshold).transpile(module)
+
+    def main(self, mod: AsmModule)-> list:
+        return mod.get_block('main')[0].contents
+
+    def test_inline(self):
+        mod = self.transpile(self.putchar + '[putchar 72] [putchar 105]')
+        (first, second) = self.main(mod)
+        self.assertIsInstance(first, AsmInline)
+        self.assertEqual('[rbp-8]', first.bindings[0][0])
+        self.assertEqual('[rbp-8]', second.bindings[0][0])
+        self.assertEqual('lea rsi, [rbp-8]', first.contents[0].asm)
+        self.assertEqual(1, mod.get_block('main')[0].locals)
+
+    def test_nested_slots(self):
+        mod = self.transpile('[#def id <x:int> [( [#asm "mov %ax, {x}"] )]] [#def pair <a b> [( [#asm "mov %ax, {a}"] [#asm "add %ax, {b}"] )]] [pair [id 1] [id 2]]')
+        inline = self.main(mod)[0]
+        self.assertEqual(['[rbp-8]', '[rbp-16]'], [slot for (slot, _) in inline.bindings])
+        self.assertEqual(['[rbp-24]', '[rbp-24]'], [value.bindings[0][0] for (_, value) in inline.bindings])
+        self.assertEqual(3, mod.get_block('main')[0].locals)
+
+    def test_threshold(self):
+        self.assertIsInstance(self.main(self.transpile(self.putchar + '[putchar 72]', 2))[0], AsmCall)
+        self.assertIsInstance(self.main(self.transpile(self.putchar + '[putchar 72]', 2, always={'putchar'}))[0], AsmInline)
+        self.assertIsInstance(self.main(self.transpile(self.putchar + '[putchar 72]', never={'putchar'}))[0], AsmCall)
+
+    def test_unsafe(self):
+        sources = [
+            '[#def f <x:int> [( [#asm "mov %ax, %di"] )]] [f 1]',
+            '[#def f [( [#asm "mov %ax, [%bp-8]"] )]] [f]',
+            '[#def f [( [#asm "l1: jmp l1"] )]] [f]',
+            '[#def f [( [f] )]] [f]',
+            '[#def f [( [g] )]] [#def g [( [f] )]] [f]',
+        ]
+        for source in sources:
+            self.assertIsInstance(self.main(self.transpile(source, always={'f', 'g'}))[0], AsmCall, source)
+
+    def test_argument_registers(self):
+        mod = self.transpile('[#def f <x:int> [( [#asm "mov %di, {x}"] )]] [f 1]')
+        self.assertIsInstance(self.main(mod)[0], AsmInline)
+        self.assertIsInstance(self.main(mod)[0].contents[0], AsmLiteral)
+
+    def test_inline_depth(self):
+        source = ' '.join(f'[#def f{i} [( [f{i + 1}] )]]' for i in range(0, 300)) + ' [#def f300 [( [#asm "mov %ax, 1"] )]] [f0]'
+        (call,) = self.main(self.transpile(source))
+        for _ in range(0, 32):
+            self.assertIsInstance(call, AsmInline)
+            (call,) = call.contents
+        self.assertIsInstance(call, AsmCall)
+        self.assertEqual('f32', call.target)
@@ -0,0 +1,88 @@
+import platform
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, skipUnless
+from brik import Brik, BrikOpts
+from brik.asm.encoder import EncodingError, X86Encoder
+from brik.asm.platform import CompilerPlatform
+
+class TestEncoder(TestCase):
+    def encode(self, *lines: str)-> str:
+        encoder = X86Encoder({'msg_len': 3})
+        for line in lines:
+            encoder.encode_line(line)
+        return encoder.link(0x401000, {'msg': 0x402000}).hex()
+
+    def test_generated(self):
+        self.assertEqual('b805000000', self.encode('mov rax, 5d'))
+        self.assertEqual('48c7c0f9ffffff', self.encode('mov rax, -7'))
+        self.assertEqual('4989da', self.encode('mov r10, rbx'))
+        self.assertEqual('48897df8', self.encode('mov qword [rbp-8], rdi'))
+        self.assertEqual('4989442408', self.encode('mov [r12+8], rax'))
+        self.assertEqual('48c745e848000000', self.encode('mov qword [rbp-24], 72d'))
+        self.assertEqual('4883ec10', self.encode('sub rsp, 16'))
+        self.assertEqual('486bc00a', self.encode('imul rax, rax, 10'))
+        self.assertEqual('489949f7fa', self.encode('cqo', 'idiv r10'))
+        self.assertEqual('6a05', self.encode('push 5d'))
+        self.assertEqual('554889e5', self.encode('push rbp', 'mov rbp, rsp'))
+
+    def test_asm_subset(self):
+        self.assertEqual('488b44cb10', self.encode('mov rax, [rbx+rcx*8+16]'))
+        self.assertEqual('40b603', self.encode('mov sil, 3'))
+        self.assertEqual('0fb606', self.encode('movzx eax, byte [rsi]'))
+        self.assertEqual('48d3fa', self.encode('sar rdx, cl ; shift'))
+        self.assertEqual('cd80', self.encode('int 0x80'))
+
+    def test_symbols(self):
+        self.assertEqual('48be0020400000000000ba03000000', self.encode('mov rsi, msg', 'mov rdx, msg_len'))
+        self.assertEqual('0f8400000000', self.encode('l1: jz l2', 'l2:'))
+        self.assertEqual('e9fbffffff', self.encode('l1: jmp l1'))
+        self.assertEqual('488b0500000000', self.encode('mov rax, [l1]', 'l1:'))
+
+    def test_unsupported(self):
+        for line in ['section .bss', 'mov ax, 1', 'mov [rax], 1', 'mov [rax], [rbx]', 'movaps xmm0, xmm1', 'mov rax']:
+            with self.assertRaises(EncodingError, msg=line):
+                self.encode(line)
+        with self.assertRaises(EncodingError):
+            self.encode('jmp nowhere')
+
+@skipUnless(sys.platform.startswith('linux') and platform.machine() == 'x86_64', 'native binaries need x86-64 Linux')
+class TestNative(TestCase):
+    putchar = '[#def putchar <c:int> [( [#asm "lea %si, {c}"] [#asm "mov %ax, 1"] [#asm "mov %di, 1"] [#asm "mov %dx, 1"] [#asm "syscall"] )]] '
+
+    def run_source(self, source: str)-> tuple[bytes, int]:
+        with tempfile.TemporaryDirectory() as out_dir:
+            compiler = Brik(BrikOpts('test', CompilerPlatform.LINUX_X86_64, out_dir))
+            (_, _, _, asm_path, obj_path, out_path) = compiler.compile_all(source)
+            self.assertIsNone(asm_path)
+            self.assertIsNone(obj_path)
+            result = subprocess.run([out_path], capture_output=True, timeout=10)
+            return (result.stdout, result.returncode)
+
+    def test_exit_code(self):
+        self.assertEqual((b'', 42), self.run_source('[#def answer [( [#asm "mov %ax, 42"] )]] [answer]'))
+
+    def test_output(self):
+        self.assertEqual((b'Hi\n', 1), self.run_source(self.putchar + '[putchar 72] [putchar 105] [putchar 10]'))
+
+    def test_arithmetic(self):
+        source = '[#def id <x:int> [( [#asm "mov %ax, {x}"] )]] [+ [* [id 6] [id 7]] [% [id 23] [id 5]]]'
+        self.assertEqual((b'', 45), self.run_source(source))
+
+    def test_strings(self):
+        source = '"hello" [#asm "mov %ax, 1"] [#asm "mov %di, 1"] [#asm "mov %si, auto_str_1"] [#asm "mov %dx, auto_str_1_len"] [#asm "syscall"]'
+        self.assertEqual((b'hello', 5), self.run_source(source))
+
+    def test_compile_many(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            compiler = Brik(BrikOpts('test', CompilerPlatform.LINUX_X86_64, out_dir))
+            paths = compiler.compile_many([(f'm{i}', f'[#def f [( [#asm "mov %ax, {i}"] )]] [f]') for i in range(3)])
+            self.assertEqual([f'{out_dir}/out/m{i}' for i in range(3)], paths)
+            self.assertEqual([0, 1, 2], [subprocess.run([path]).returncode for path in paths])
+
+    def test_fallback(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            compiler = Brik(BrikOpts('test', CompilerPlatform.LINUX_X86_64, out_dir))
+            module = compiler.parse(compiler.tokenize('[#def f [( [#asm "section .bss"] )]] [f]'))
+            self.assertIsNone(compiler.generate_native(compiler.transpile(compiler.optimize(module))))
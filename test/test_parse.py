@@ -1,7 +1,7 @@
 from unittest import TestCase
-from brik.tokens import Token, TokenType
+from brik.tokens import Token, Tokenizer, TokenType
 from brik.parse import ParseException, Parser
-from brik.syntax_tree import AsmMacroNode, BlockNode, CallNode, NumberNode, ReferenceNode
+from brik.syntax_tree import AsmMacroNode, BlockNode, CallNode, ListNode, NumberNode, ReferenceNode
 
 class TestParser(TestCase):
     def test_next_is(self):
@@ -120,3 +120,69 @@ class TestParser(TestCase):
         self.assertIsNotNone(module)
         self.assertIsNotNone(module.entry_point)
         self.assertEqual(0, len(module.entry_point.contents))
+
+    def test_parse_stream(self):
+        sources = [
+            '',
+            '123',
+            '[#def f <c:int> [( [#asm "mov %ax, {c}"] )]] [f 1] (2 [g])',
+            '[( [#def x 5] [f x] )]',
+            '[( [f] )] [g]'
+        ]
+        for source in sources:
+            tokens = Tokenizer(source).tokenize()
+            self.assertEqual(
+                Parser(list(tokens)).parse().entry_point,
+                Parser(iter(tokens)).parse().entry_point
+            )
+
+    def test_parse_iterative(self):
+        sources = [
+            '',
+            '123',
+            '[#def f <c:int> [( [#asm "mov %ax, {c}"] )]] [f 1] (2 [g] ("s" x))',
+            '[( [#def x 5] [#def y] [#def z [( [#def w (1)] [f x] )]] [f [( [g] )]] )]',
+            '[( [f] )] [g]'
+        ]
+        for source in sources:
+            tokens = Tokenizer(source).tokenize()
+            recursive = Parser(list(tokens)).parse()
+            iterative = Parser(list(tokens), iterative=True).parse()
+            self.assertEqual(recursive.entry_point, iterative.entry_point)
+            self.assertEqual(len(recursive.defines), len(iterative.defines))
+            self.assertIsNone(iterative.entry_point.parent)
+            for node in iterative.entry_point.contents:
+                if isinstance(node, BlockNode):
+                    self.assertIs(iterative.entry_point, node.parent)
+
+    def test_parse_iterative_throws(self):
+        sources = ['[f', '(1 2', '[#def x <a:int>', '[( [#def] )]', '[{]']
+        for source in sources:
+            tokens = Tokenizer(source).tokenize()
+            with self.assertRaises(Exception) as recursive:
+                Parser(list(tokens)).parse()
+            with self.assertRaises(Exception) as iterative:
+                Parser(list(tokens), iterative=True).parse()
+            self.assertEqual(str(recursive.exception), str(iterative.exception))
+
+    def test_parse_iterative_deep(self):
+        depth = 12000
+        sources = [
+            (BlockNode, '[( ' * depth + '1' + ' )]' * depth),
+            (CallNode, '[f ' * depth + '1' + ']' * depth),
+            (ListNode, '(' * depth + '1' + ')' * depth)
+        ]
+        for (node_type, source) in sources:
+            module = Parser(Tokenizer(source).tokenize_stream(), iterative=True).parse()
+            node = module.entry_point
+            levels = 0
+            while not isinstance(node, NumberNode):
+                children = node.operands if isinstance(node, CallNode) else node.contents
+                self.assertEqual(1, len(children))
+                if isinstance(children[0], BlockNode):
+                    self.assertIs(node, children[0].parent)
+                node = children[0]
+                levels += 1
+            self.assertGreaterEqual(levels, depth)
+        with self.assertRaises(RecursionError):
+            Parser(Tokenizer(sources[0][1]).tokenize_stream()).parse()
@@ -0,0 +1,48 @@
+from unittest import TestCase
+from brik.asm.call_conventions import SystemVCallConvention
+from brik.asm.ir import InstructionList
+from brik.asm.peephole import PeepholeOptimizer
+
+class TestPeephole(TestCase):
+    def setUp(self):
+        self.optimizer = PeepholeOptimizer(SystemVCallConvention(8, 'r'))
+
+    def optimize(self, *lines: str)-> list[str]:
+        code = InstructionList()
+        for line in lines:
+            code.append_ln(line)
+        return [str(inst) for inst in self.optimizer.optimize(code).instructions]
+
+    def test_push_literal(self):
+        self.assertEqual(['push 5d', 'mov rdi, rbx', 'call f'],
+            self.optimize('mov rax, 5d', 'push rax', 'mov rdi, rbx', 'call f'))
+        self.assertEqual(['mov rax, 5d', 'push rax', 'ret'],
+            self.optimize('mov rax, 5d', 'push rax', 'ret'))
+        self.assertEqual(1, self.optimizer.hits['push_literal'])
+
+    def test_push_pop(self):
+        self.assertEqual(['ret'], self.optimize('push rbx', 'pop rbx', 'ret'))
+        self.assertEqual(['mov rcx, rbx'], self.optimize('push rbx', 'pop rcx'))
+        self.assertEqual(2, self.optimizer.hits['push_pop'])
+
+    def test_move_chain(self):
+        self.assertEqual(['mov rdi, rbx', 'mov rsi, rax', 'call add'],
+            self.optimize('mov r10, rax', 'mov rdi, rbx', 'mov rsi, r10', 'call add'))
+        self.assertEqual(['mov r10, rax', 'mov rdi, r10', 'mov rsi, r10', 'call add'],
+            self.optimize('mov r10, rax', 'mov rdi, r10', 'mov rsi, r10', 'call add'))
+        self.assertEqual(['mov r10, rax', 'mov rax, 1', 'mov rsi, r10'],
+            self.optimize('mov r10, rax', 'mov rax, 1', 'mov rsi, r10'))
+
+    def test_empty_frame(self):
+        self.assertEqual(['f:', 'ret'],
+            self.optimize('f:', 'push rbp', 'mov rbp, rsp', 'sub rsp, 16', 'mov rsp, rbp', 'pop rbp', 'ret'))
+        self.assertEqual(1, self.optimizer.hits['empty_frame'])
+
+    def test_rule_table(self):
+        optimizer = PeepholeOptimizer(SystemVCallConvention(8, 'r'), {'self_move': PeepholeOptimizer.self_move})
+        code = InstructionList()
+        code.append_ln('mov rax, rax')
+        code.append_ln('push rbx')
+        code.append_ln('pop rbx')
+        self.assertEqual(['push rbx', 'pop rbx'], [str(inst) for inst in optimizer.optimize(code).instructions])
+        self.assertEqual({'self_move': 1}, optimizer.hits)
@@ -0,0 +1,35 @@
+import io
+from unittest import TestCase
+from brik.printer import Printer
+
+class TestPrinter(TestCase):
+    def write(self, p: Printer):
+        p.append_ln('a:')
+        p.right()
+        p.append('  ')
+        p.append_ln('mov rax, 1')
+        p.append('call ')
+        p.append_ln('f')
+        p.append_ln('first\nsecond')
+        p.append_ln()
+        p.left()
+        p.append('b')
+        p.append(' ')
+        p.append_ln()
+
+    def test_indent(self):
+        p = Printer('  ')
+        self.write(p)
+        self.assertEqual('a:\n  mov rax, 1\n  call f\n  first\n  second\n\nb \n', str(p))
+        p.clear()
+        self.assertEqual('', str(p))
+
+    def test_stream(self):
+        expected = Printer('  ')
+        self.write(expected)
+        stream = io.StringIO()
+        p = Printer('  ', stream, buffer_size=4)
+        for _ in range(0, 3):
+            self.write(p)
+        p.flush()
+        self.assertEqual(str(expected) * 3, stream.getvalue())
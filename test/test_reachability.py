@@ -0,0 +1,37 @@
+from unittest import TestCase
+from brik.definitions import CallDefinition
+from brik.optimize.reachability import ReachabilityPass
+from brik.parse import Parser
+from brik.syntax_tree import Module
+from brik.tokens import Tokenizer
+
+class TestReachability(TestCase):
+    def prune(self, source: str)-> tuple[list[str], list[str]]:
+        module = Parser(Tokenizer(source).tokenize()).parse()
+        pruner = ReachabilityPass()
+        module = pruner.prune(module)
+        return ([d.name for d in module.defines if isinstance(d, CallDefinition)], [d.name for d in pruner.removed])
+
+    def test_unused(self):
+        kept, removed = self.prune('[#def f [( 1 )]] [#def g [( 2 )]] [f]')
+        self.assertEqual(['f'], kept)
+        self.assertEqual(['g'], removed)
+
+    def test_transitive(self):
+        kept, removed = self.prune('[#def a [( [b] )]] [#def b [( [c 1] )]] [#def c <x:int> [( 1 )]] [#def d [( [a] )]] [a]')
+        self.assertEqual(['a', 'b', 'c'], kept)
+        self.assertEqual(['d'], removed)
+
+    def test_asm_references(self):
+        kept, removed = self.prune('[#def putchar [( 1 )]] [#def + [( 1 )]] [#def unused [( 1 )]] [#asm "call putchar"] [#asm "call add"]')
+        self.assertEqual(['putchar', '+'], kept)
+        self.assertEqual(['unused'], removed)
+
+    def test_nested_blocks(self):
+        kept, removed = self.prune('[#def f [( 1 )]] [#def g [( 2 )]] [( [f] )]')
+        self.assertEqual(['f'], kept)
+        self.assertEqual(['g'], removed)
+
+    def test_operand_references(self):
+        kept, _ = self.prune('[#def f [( 1 )]] [#def g [( 1 )]] [g f]')
+        self.assertEqual(['f', 'g'], kept)
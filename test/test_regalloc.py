@@ -0,0 +1,87 @@
+from unittest import TestCase
+from brik.asm.ir import Instruction, InstructionList
+from brik.asm.regalloc import LinearScanAllocator
+
+class TestLinearScan(TestCase):
+    def setUp(self):
+        self.allocator = LinearScanAllocator(['rbx', 'r12'], ['r10'])
+
+    def locations(self, code: InstructionList)-> list:
+        allocation = self.allocator.allocate(code)
+        return [interval.location for interval in sorted(allocation.intervals, key=lambda i: i.vreg)]
+
+    def test_scratch_and_callee_saved(self):
+        code = InstructionList()
+        a = code.vreg()
+        b = code.vreg()
+        code.append('mov', a, 'rax')
+        code.append('call', 'g')
+        code.append('mov', b, 'rax')
+        code.append('mov', 'rdi', a)
+        code.append('mov', 'rsi', b)
+        allocation = self.allocator.allocate(code)
+        self.assertEqual(['rbx', 'r10'], self.locations(code))
+        self.assertEqual(['rbx'], allocation.saved)
+        mapping = allocation.mapping(0, 8, 'qword', 'rbp')
+        self.assertEqual(['mov rbx, rax', 'call g', 'mov r10, rax', 'mov rdi, rbx', 'mov rsi, r10'],
+            [inst.render(mapping) for inst in code.instructions])
+
+    def test_spill(self):
+        code = InstructionList()
+        regs = [code.vreg() for _ in range(0, 4)]
+        for reg in regs:
+            code.append('mov', reg, 'rax')
+            code.append('call', 'g')
+        for reg in regs:
+            code.append('push', reg)
+        allocation = self.allocator.allocate(code)
+        self.assertEqual(2, allocation.spill_count)
+        mapping = allocation.mapping(1, 8, 'qword', 'rbp')
+        self.assertEqual({'rbx', 'r12', 'qword [rbp-32]', 'qword [rbp-40]'}, set(mapping.values()))
+
+    def test_reuse(self):
+        code = InstructionList()
+        for _ in range(0, 5):
+            reg = code.vreg()
+            code.append('mov', reg, 'rax')
+            code.append('mov', 'rdi', reg)
+        self.assertEqual(['r10'] * 5, self.locations(code))
+        self.assertEqual([], self.allocator.allocate(code).saved)
+
+    def test_asm_barrier(self):
+        code = InstructionList()
+        a = code.vreg()
+        code.append('mov', a, 'rax')
+        code.append_raw('mov bl, 1\nmov r12d, 2\nmov rax, r13')
+        code.append('mov', 'rdi', a)
+        allocation = self.allocator.allocate(code)
+        self.assertEqual([0], self.locations(code))
+        self.assertEqual(['rbx', 'r12'], allocation.saved)
+        self.assertEqual({'rsi', 'esi', 'si', 'sil'}, LinearScanAllocator.aliases('rsi'))
+
+    def test_spill_slots_disjoint(self):
+        allocator = LinearScanAllocator(['rbx', 'r12', 'r13', 'r14', 'r15'], ['r10', 'r11'])
+        code = InstructionList()
+        spilled = code.vreg()
+        code.append('mov', spilled, 'rax')
+        code.append_raw('nop')
+        regs = [code.vreg() for _ in range(0, 7)]
+        for reg in regs:
+            code.append('mov', reg, 'rax')
+        code.append('mov', 'rdi', spilled)
+        late = code.vreg()
+        code.append('mov', late, 'rax')
+        code.append('mov', 'rsi', late)
+        for reg in regs:
+            code.append('mov', 'rdi', reg)
+        intervals = [i for i in allocator.allocate(code).intervals if isinstance(i.location, int)]
+        for a in intervals:
+            for b in intervals:
+                if a is not b and a.location == b.location:
+                    self.assertFalse(a.start < b.end and b.start < a.end, f'v{a.vreg} and v{b.vreg} share slot {a.location}')
+
+    def test_parse(self):
+        inst = Instruction.parse('  mov rax, qword [rbp-8] ')
+        self.assertEqual('mov', inst.op)
+        self.assertEqual(['rax', 'qword [rbp-8]'], inst.operands)
+        self.assertTrue(Instruction.parse('main:').is_label())
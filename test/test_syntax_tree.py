@@ -0,0 +1,104 @@
+from unittest import TestCase
+from brik.datatypes import CompoundType, DataType, PrimitiveType, UserDefinedType
+from brik.definitions import CallDefinition, VarDefinition
+from brik.optimize.types import TypeInference
+from brik.parse import Parser
+from brik.patterns import Pattern
+from brik.syntax_tree import AsmMacroNode, BlockNode, CallNode, ListNode, Module, NumberNode, ReferenceNode, StringNode
+from brik.tokens import Tokenizer
+
+class TestSyntaxTree(TestCase):
+    def parse(self, source: str)-> BlockNode:
+        return Parser(Tokenizer(source).tokenize_stream(), iterative=True).parse().entry_point
+
+    def test_equality(self):
+        self.assertEqual(NumberNode(1), NumberNode(1))
+        self.assertNotEqual(NumberNode(1), NumberNode(2))
+        self.assertNotEqual(NumberNode(1), StringNode(1))
+        self.assertNotEqual(ListNode([NumberNode(1)]), BlockNode([NumberNode(1)]))
+        self.assertEqual(
+            CallNode('f', [ReferenceNode('x'), ListNode([StringNode('s')])]),
+            CallNode('f', [ReferenceNode('x'), ListNode([StringNode('s')])])
+        )
+        self.assertNotEqual(
+            CallNode('f', [ReferenceNode('x')]),
+            CallNode('f', [ReferenceNode('x'), ReferenceNode('y')])
+        )
+        self.assertNotEqual(AsmMacroNode('ret'), AsmMacroNode('syscall'))
+        self.assertNotEqual(NumberNode(1), 1)
+
+    def test_definition_equality(self):
+        body = BlockNode([NumberNode(1)])
+        self.assertEqual(
+            CallDefinition('f', body, Pattern([('c', DataType.INT)])),
+            CallDefinition('f', BlockNode([NumberNode(1)]), Pattern([('c', DataType.INT)]))
+        )
+        self.assertNotEqual(
+            CallDefinition('f', body, Pattern([('c', DataType.INT)])),
+            CallDefinition('f', body, Pattern([('c', DataType.STRING)]))
+        )
+        self.assertNotEqual(VarDefinition('x', None), VarDefinition('x', NumberNode(0)))
+        a = self.parse('[#def x 1] [f x]')
+        b = self.parse('[#def x 2] [f x]')
+        self.assertNotEqual(a, b)
+
+    def test_hash(self):
+        source = '[#def f <c:int> [( [#asm "mov %ax, {c}"] )]] [f 1] (2 [g] ("s" x))'
+        a = self.parse(source)
+        b = self.parse(source)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(hash(a), hash(self.parse(source.replace('2', '3'))))
+        memo = {a: 'module', a.contents[1]: 'call'}
+        self.assertEqual('module', memo[b])
+        self.assertEqual('call', memo[CallNode('f', [NumberNode(1)])])
+
+    def test_invalidate(self):
+        block = BlockNode([NumberNode(1)])
+        before = hash(block)
+        block.contents = [NumberNode(2)]
+        block.invalidate()
+        self.assertNotEqual(before, hash(block))
+        self.assertEqual(BlockNode([NumberNode(2)]), block)
+
+    def test_invalidate_subtree(self):
+        a = self.parse('[f [g 1]] 2')
+        b = self.parse('[f [g 3]] 2')
+        self.assertNotEqual(hash(a), hash(b))
+        inner = a.contents[0].operands[0]
+        inner.operands = [NumberNode(3)]
+        inner.invalidate()
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+
+    def test_interned_types(self):
+        self.assertIs(CompoundType(PrimitiveType.LIST, DataType.INT), CompoundType(PrimitiveType.LIST, DataType.INT))
+        self.assertIsNot(CompoundType(PrimitiveType.LIST, DataType.INT), CompoundType(PrimitiveType.LIST, DataType.STRING))
+        self.assertIs(DataType.INT, DataType(PrimitiveType.INT))
+        self.assertIs(UserDefinedType('point'), UserDefinedType('point'))
+        self.assertIs(ListNode([NumberNode(1)]).data_type(), ListNode([NumberNode(2)]).data_type())
+        self.assertIs(ReferenceNode('x').data_type(), VarDefinition('y', None).data_type())
+
+    def test_cached_types(self):
+        block = BlockNode([NumberNode(1)])
+        self.assertIs(DataType.INT, block.data_type())
+        block.contents = [StringNode('s')]
+        self.assertIs(DataType.INT, block.data_type())
+        block.invalidate()
+        self.assertIs(DataType.STRING, block.data_type())
+
+    def test_type_inference(self):
+        depth = 12000
+        root = self.parse('[( ' * depth + '(1 "s")' + ' )]' * depth)
+        inference = TypeInference()
+        inference.infer(Module(root))
+        self.assertGreater(inference.inferred, depth)
+        self.assertIs(CompoundType(PrimitiveType.LIST, DataType.STRING), root.data_type())
+
+    def test_deep_equality(self):
+        depth = 12000
+        source = '[( ' * depth + '[f (1 2)]' + ' )]' * depth
+        a = self.parse(source)
+        b = self.parse(source)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, self.parse(source.replace('2', '3')))
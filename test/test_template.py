@@ -0,0 +1,38 @@
+from unittest import TestCase
+from brik.asm.layout import StackLayout
+from brik.asm.platform import CompilerPlatform, get_platform
+from brik.asm.template import AsmTemplate, HoleKind
+from brik.datatypes import DataType
+from brik.patterns import Pattern
+
+class TestAsmTemplate(TestCase):
+    def test_compile(self):
+        template = AsmTemplate('  mov %ax, {a}\n\n  add %ax, %bx  \n')
+        self.assertEqual(['mov ', '', ', ', '', '\nadd ', '', ', ', '', ''], template.parts)
+        self.assertEqual([
+            (1, HoleKind.REGISTER, 'ax'),
+            (3, HoleKind.REFERENCE, 'a'),
+            (5, HoleKind.REGISTER, 'ax'),
+            (7, HoleKind.REGISTER, 'bx'),
+        ], template.holes)
+        self.assertEqual(['a'], template.references)
+
+    def test_cache(self):
+        self.assertIs(AsmTemplate.compile('mov %ax, 1'), AsmTemplate.compile('mov %ax, 1'))
+        self.assertIsNot(AsmTemplate.compile('mov %ax, 1'), AsmTemplate.compile('mov %ax, 2'))
+
+    def test_instantiate(self):
+        template = AsmTemplate.compile('mov %ax, {a}\nadd {b}, %ax')
+        pattern = Pattern([('a', DataType.INT), ('b', DataType.INT)])
+        for (platform, expected) in [
+            (CompilerPlatform.LINUX_X86_64, 'mov rax, [rbp-8]\nadd [rbp-16], rax'),
+            (CompilerPlatform.WINDOWS_X86_64, 'mov rax, [rbp+16]\nadd [rbp+24], rax'),
+            (CompilerPlatform.LINUX_X86_32, 'mov eax, [ebp+8]\nadd [ebp+12], eax'),
+        ]:
+            p = get_platform(platform)
+            self.assertEqual(expected, template.instantiate(p, StackLayout.resolve('f', pattern, template.references, p)))
+
+    def test_bad_register(self):
+        p = get_platform(CompilerPlatform.LINUX_X86_64)
+        with self.assertRaises(Exception):
+            AsmTemplate.compile('mov %zz, 1').instantiate(p, StackLayout('f', {}, p))
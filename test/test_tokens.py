@@ -1,5 +1,7 @@
+import io
 from unittest import TestCase
-from brik.tokens import Token, Tokenizer, TokenType
+from bench.tokens import CharTokenizer
+from brik.tokens import Token, Tokenizer, TokenStream, TokenType
 
 class TestTokenizer(TestCase):
     def test_empty_tokens(self):
@@ -61,4 +63,94 @@ class TestTokenizer(TestCase):
                 Token(TokenType.CHAIN, 26, '$')
             ],
             Tokenizer('   [\t ] \r {  }  (     ) \n $ ').tokenize()
-        )
\ No newline at end of file
+        )
+
+    def test_keywords(self):
+        self.assertListEqual(
+            [
+                Token(TokenType.LEFT_BRACKET, 0, '['),
+                Token(TokenType.KEYWORD, 1, 'def'),
+                Token(TokenType.IDENT, 6, 'x'),
+                Token(TokenType.RIGHT_BRACKET, 7, ']')
+            ],
+            Tokenizer('[#def x]').tokenize()
+        )
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, 'Unrecognized character A'):
+            Tokenizer('[A]').tokenize()
+        with self.assertRaisesRegex(Exception, 'Unrecognized keyword: foo'):
+            Tokenizer('[#foo]').tokenize()
+        with self.assertRaisesRegex(Exception, 'Found end of code while tokenizing string'):
+            Tokenizer('"unterminated').tokenize()
+        with self.assertRaisesRegex(Exception, 'Found end of code while tokenizing string'):
+            Tokenizer('"escaped end\\"').tokenize()
+
+    def test_matches_char_tokenizer(self):
+        source = '''
+        [#def putchar <c:int> [(
+            [#asm "
+                mov %si, %bp
+                mov %cx, {c}
+            "]
+        )]]
+        [#def msg "a \\\\"quoted\\\\\\\\" \\\\n string"]
+        [putchar 0072] [+ 1 [- x2 3]] ($ a, b: c)
+        '''
+        self.assertListEqual(
+            CharTokenizer(source).tokenize_by_char(),
+            Tokenizer(source).tokenize()
+        )
+
+    def test_iter_tokens(self):
+        source = '[#def msg "split \\"string\\" across\r\nchunks"]\r\n[print_all msg 12345]\r\n'
+        expected = Tokenizer(source.replace('\r\n', '\n')).tokenize()
+        for chunk_size in [1, 2, 3, 7, 64]:
+            self.assertListEqual(
+                expected,
+                list(Tokenizer.iter_tokens(io.StringIO(source, newline=''), chunk_size))
+            )
+            self.assertListEqual(
+                expected,
+                list(Tokenizer.iter_tokens(io.BytesIO(source.encode()), chunk_size))
+            )
+
+    def test_iter_tokens_linear(self):
+        scanned = []
+        class CountingTokenizer(Tokenizer):
+            def lex(self, source, offset=0, final=True, make=Token):
+                scanned.append(len(source) - self.pos)
+                return super().lex(source, offset, final, make)
+        source = '[print "' + 'x' * 100000 + '" ' + 'word ' * 20000 + ']'
+        tokens = list(CountingTokenizer.iter_tokens(io.StringIO(source), 16))
+        self.assertListEqual(Tokenizer(source).tokenize(), tokens)
+        self.assertLess(sum(scanned), 4 * len(source))
+
+    def test_iter_tokens_errors(self):
+        with self.assertRaisesRegex(Exception, 'Found end of code while tokenizing string'):
+            list(Tokenizer.iter_tokens(io.StringIO('[a "never closed'), 4))
+        with self.assertRaisesRegex(Exception, 'Unrecognized keyword: foo'):
+            list(Tokenizer.iter_tokens(io.StringIO('[#foo]'), 2))
+
+    def test_token_stream(self):
+        source = '[#def name "x"] [name name 12]'
+        stream = Tokenizer(source).tokenize_stream()
+        self.assertListEqual(Tokenizer(source).tokenize(), list(stream))
+        self.assertEqual(TokenType.NUMBER, stream.type_at(8))
+        self.assertEqual(12, stream.value_at(8))
+        self.assertIs(stream.value_at(6), stream.value_at(7))
+
+    def test_token_stream_wrap(self):
+        stream = TokenStream.from_tokens([Token(TokenType.NUMBER, 0, 5)])
+        stream.wrap()
+        self.assertListEqual(
+            [
+                Token(TokenType.LEFT_BRACKET, -1, '['),
+                Token(TokenType.LEFT_PAREN, -1, '('),
+                Token(TokenType.NUMBER, 0, 5),
+                Token(TokenType.RIGHT_PAREN, -1, ')'),
+                Token(TokenType.RIGHT_BRACKET, -1, ']')
+            ],
+            list(stream)
+        )
+        self.assertEqual(Token(TokenType.RIGHT_BRACKET, -1, ']'), stream[-1])
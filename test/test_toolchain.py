@@ -0,0 +1,62 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, skipUnless
+from brik import Brik, BrikOpts
+from brik.asm.platform import CompilerPlatform, PlatformLinux64, get_platform
+from brik.asm.toolchain import BuildJob, Toolchain, ToolchainError
+
+class CopyPlatform(PlatformLinux64):
+    def assembler_command(self, asm_path: str, obj_path: str)-> list[str]:
+        return [sys.executable, '-c', 'import shutil, sys; shutil.copy(sys.argv[1], sys.argv[2])', asm_path, obj_path]
+    def linker_command(self, obj_paths: list[str], out_path: str)-> list[str]:
+        return [sys.executable, '-c', 'import shutil, sys; shutil.copy(sys.argv[1], sys.argv[2]); print("linked", sys.argv[2])', obj_paths[0], out_path]
+
+class TestToolchain(TestCase):
+    def test_commands(self):
+        self.assertEqual(['nasm', '-f', 'elf64', '-o', 'a.o', 'a.asm'], get_platform(CompilerPlatform.LINUX_X86_64).assembler_command('a.asm', 'a.o'))
+        self.assertEqual(['ld', '-e', '_start', '-o', 'a', 'a.o'], get_platform(CompilerPlatform.LINUX_X86_64).linker_command(['a.o'], 'a'))
+        self.assertEqual(['ld', '-m', 'elf_i386', '-e', '_start', '-o', 'a', 'a.o'], get_platform(CompilerPlatform.LINUX_X86_32).linker_command(['a.o'], 'a'))
+        self.assertEqual('link', get_platform(CompilerPlatform.WINDOWS_X86_64).linker_command(['a.obj'], 'a.exe')[0])
+        self.assertEqual('.exe', get_platform(CompilerPlatform.WINDOWS_X86_32).executable_suffix())
+
+    def test_errors(self):
+        toolchain = Toolchain(1)
+        with self.assertRaises(ToolchainError) as context:
+            toolchain.run([sys.executable, '-c', 'import sys; sys.stderr.write("a.asm:3: error: bad"); sys.exit(2)'])
+        self.assertEqual(2, context.exception.returncode)
+        self.assertEqual('a.asm:3: error: bad', context.exception.output)
+        with self.assertRaises(ToolchainError) as context:
+            toolchain.run(['brik-missing-tool'])
+        self.assertIsNone(context.exception.returncode)
+        self.assertEqual('warning', toolchain.run([sys.executable, '-c', 'print("warning")']))
+        self.assertEqual(['warning'], toolchain.diagnostics)
+
+    def test_build(self):
+        platform = CopyPlatform()
+        with tempfile.TemporaryDirectory() as out_dir:
+            jobs = []
+            for i in range(6):
+                asm_path = os.path.join(out_dir, f'{i}.asm')
+                with open(asm_path, 'w') as f:
+                    f.write(str(i))
+                jobs.append(BuildJob(platform, asm_path, os.path.join(out_dir, f'{i}.o'), os.path.join(out_dir, f'{i}.out')))
+            toolchain = Toolchain(3)
+            paths = toolchain.build(jobs)
+            self.assertEqual([job.out_path for job in jobs], paths)
+            for (i, path) in enumerate(paths):
+                with open(path) as f:
+                    self.assertEqual(str(i), f.read())
+            self.assertEqual(6, len(toolchain.diagnostics))
+            os.remove(jobs[2].asm_path)
+            with self.assertRaises(ToolchainError):
+                toolchain.build(jobs)
+
+    @skipUnless(shutil.which('nasm') is not None and shutil.which('ld') is not None and sys.platform.startswith('linux'), 'needs nasm and ld')
+    def test_compile_many(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            compiler = Brik(BrikOpts('test', CompilerPlatform.LINUX_X86_64, out_dir, native=False, jobs=2))
+            paths = compiler.compile_many([(f'm{i}', f'[#def f [( [#asm "mov %ax, {i}"] )]] [f]') for i in range(4)])
+            self.assertEqual([0, 1, 2, 3], [subprocess.run([path]).returncode for path in paths])
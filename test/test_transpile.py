@@ -0,0 +1,117 @@
+from unittest import TestCase
+from brik.arena import AstArena
+from brik.asm.generation import AsmGenerator
+from brik.asm.layout import StackLayout
+from brik.asm.platform import CompilerPlatform, get_platform
+from brik.asm.syntax_tree import AsmCall, AsmIntrinsic, AsmLiteral, AsmModule, DataSection
+from brik.asm.transpile import Transpiler
+from brik.datatypes import DataType
+from brik.definitions import CallDefinition
+from brik.parse import Parser
+from brik.syntax_tree import BlockNode
+from brik.tokens import Tokenizer
+
+class TestTranspiler(TestCase):
+    def transpile(self, source: str)-> AsmModule:
+        module = Parser(Tokenizer(source).tokenize()).parse()
+        return Transpiler(get_platform(CompilerPlatform.LINUX_X86_64)).transpile(module)
+
+    def test_forward_reference(self):
+        mod = self.transpile('[#def g [( [f] )]] [#def f [( 1 )]] [g]')
+        self.assertEqual(['g', 'f', 'main'], [block.label for (block, _) in mod.text])
+        call = mod.get_block('g')[0].contents[0]
+        self.assertIsInstance(call, AsmCall)
+        self.assertEqual('f', call.target)
+        self.assertEqual(DataType.INT, call.data_type())
+
+    def test_recursive_reference(self):
+        mod = self.transpile('[#def f [( [f] )]] [f]')
+        self.assertEqual(DataType.UNKNOWN, mod.get_block('f')[0].contents[0].data_type())
+
+    def test_forward_chain(self):
+        source = ' '.join(f'[#def f{i} [( [f{i + 1}] )]]' for i in range(0, 1000)) + ' [#def f1000 [( 1 )]] [f0]'
+        module = Parser(Tokenizer(source).tokenize()).parse()
+        mod = Transpiler(get_platform(CompilerPlatform.LINUX_X86_64)).transpile(module)
+        self.assertEqual(DataType.INT, mod.get_block('f0')[0].contents[0].data_type())
+        mod = Transpiler(get_platform(CompilerPlatform.LINUX_X86_64)).transpile_arena(AstArena.from_module(module))
+        self.assertEqual(DataType.INT, mod.get_block('f0')[0].contents[0].data_type())
+
+    def test_mutual_recursion(self):
+        mod = self.transpile('[#def f [( [g] )]] [#def g [( [f] 1 )]] [f]')
+        self.assertEqual(DataType.UNKNOWN, mod.get_block('g')[0].contents[0].data_type())
+        self.assertEqual(DataType.INT, mod.get_block('f')[0].contents[0].data_type())
+
+    def test_arena_forward_reference(self):
+        module = Parser(Tokenizer('[#def g [( [f] )]] [#def f [( 1 )]] [g]').tokenize()).parse()
+        mod = Transpiler(get_platform(CompilerPlatform.LINUX_X86_64)).transpile_arena(AstArena.from_module(module))
+        self.assertEqual(DataType.INT, mod.get_block('g')[0].contents[0].data_type())
+
+    def test_symbol_index(self):
+        mod = AsmModule()
+        first = mod.declare(CallDefinition('f', BlockNode([])))
+        self.assertEqual(first, mod.lookup('f'))
+        self.assertEqual(first, mod.lookup('f', 0))
+        self.assertEqual(first, mod.lookup('f', 2))
+        self.assertIsNone(mod.lookup('g'))
+        self.assertEqual((None, mod.text[first][1]), mod.get_block('f'))
+
+    def test_arity_lookup(self):
+        mod = self.transpile('[#def f [( 1 )]] [#def f <c:int> [( "s" )]] [f 2]')
+        self.assertEqual(1, mod.lookup('f', 1))
+        self.assertEqual(0, mod.lookup('f', 3))
+        self.assertEqual(DataType.STRING, mod.get_block('main')[0].contents[0].data_type())
+
+    def test_overload_labels(self):
+        mod = self.transpile('[#def f [( 1 )]] [#def f <c:int> [( "s" )]] [f] [f 2]')
+        self.assertEqual(['f', 'f@1', 'main'], [block.label for (block, _) in mod.text])
+        self.assertEqual(['f', 'f@1'], [call.target for call in mod.get_block('main')[0].contents])
+        asm = AsmGenerator(get_platform(CompilerPlatform.LINUX_X86_64)).generate_module(mod)
+        self.assertEqual(1, asm.count('\nf:'))
+        self.assertEqual(1, asm.count('\nf@1:'))
+        with self.assertRaises(Exception):
+            self.transpile('[#def f <c:int> [( 1 )]] [#def f <d:int> [( 2 )]] [f 1]')
+
+    def test_stack_layout(self):
+        transpiler = Transpiler(get_platform(CompilerPlatform.LINUX_X86_64))
+        module = Parser(Tokenizer('[#def f <a:int b:int> [( [#asm "mov %ax, {a}\nadd %ax, {b}\nadd {a}, {b}"] )]] [f 1 2]').tokenize()).parse()
+        mod = transpiler.transpile(module)
+        asm = mod.get_block('f')[0].contents[0]
+        self.assertIsInstance(asm, AsmLiteral)
+        self.assertEqual('mov rax, [rbp-8]\nadd rax, [rbp-16]\nadd [rbp-8], [rbp-16]', asm.asm)
+        layout = transpiler.layouts['f']
+        self.assertEqual({'a': -1, 'b': -2}, layout.slots)
+        self.assertEqual({'a', 'b'}, layout.references)
+        self.assertEqual({}, transpiler.layouts['main'].slots)
+
+    def test_intrinsics(self):
+        mod = self.transpile('[#def one [( [#asm "mov %ax, 1"] )]] [+ [one] [* 2 3]]')
+        node = mod.get_block('main')[0].contents[0]
+        self.assertIsInstance(node, AsmIntrinsic)
+        self.assertEqual(['+', '*'], [node.operator, node.operands[1].operator])
+        self.assertEqual(DataType.INT, node.data_type())
+        self.assertIsInstance(self.transpile('[#def + <a:int b:int> [( 1 )]] [+ 1 2]').get_block('main')[0].contents[0], AsmCall)
+        with self.assertRaises(Exception):
+            self.transpile('[- "s" 1]')
+
+    def test_string_pool(self):
+        mod = self.transpile('"hi" "there" "hi"')
+        self.assertEqual(['auto_str_1', 'auto_str_2', 'auto_str_1'], [node.value for node in mod.get_block('main')[0].contents])
+        self.assertEqual([
+            'section .rodata',
+            'auto_str_1:\tdb "hi",0',
+            'auto_str_1_len\tequ 2',
+            'auto_str_2:\tdb "there",0',
+            'auto_str_2_len\tequ 5',
+        ], str(mod.data).splitlines())
+
+    def test_string_escape(self):
+        self.assertEqual('"a",34,"b\\",10,0', DataSection.escape('a"b\\\n'.encode('utf-8')))
+        self.assertEqual('195,169,0', DataSection.escape('é'.encode('utf-8')))
+        self.assertEqual('0', DataSection.escape(b''))
+        self.assertEqual('section .rdata', str(Transpiler(get_platform(CompilerPlatform.WINDOWS_X86_64)).transpile(Parser(Tokenizer('1').tokenize()).parse()).data).splitlines()[0])
+
+    def test_unknown_reference(self):
+        with self.assertRaises(Exception):
+            self.transpile('[#def f <a:int> [( [#asm "mov %ax, {b}"] )]] [f 1]')
+        with self.assertRaises(Exception):
+            StackLayout('f', {}, get_platform(CompilerPlatform.LINUX_X86_32)).operand('a')